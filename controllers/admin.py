@@ -0,0 +1,143 @@
+from hmac import compare_digest
+from math import isfinite
+from os import getpid
+from pstats import SortKey
+
+from sanic import Blueprint, HTTPResponse, Request, json
+from sanic.exceptions import InvalidUsage, NotFound, SanicException, Unauthorized
+from sanic.response import text
+
+from utils.profiler import ProfilerBusy, profile, sample, slow_callbacks
+from utils.reload import reload_settings
+
+AdminBP = Blueprint("admin", url_prefix="/admin")
+
+
+@AdminBP.middleware("request")
+async def authorize(request: Request) -> None:
+    # the admin endpoints do not exist unless `ADMIN_TOKEN` is set
+    token = request.app.ctx.settings.ADMIN_TOKEN
+    if token is None:
+        raise NotFound(f"Requested URL {request.path} not found")
+    if not compare_digest(request.token or "", token.get_secret_value()):
+        raise Unauthorized("Invalid admin token", scheme="Bearer")
+
+
+# the keys `pstats` sorts by
+SORT_KEYS = frozenset(key.value for key in SortKey)
+
+
+def _float(request: Request, name: str, default: float) -> float:
+    try:
+        value = float(request.args.get(name, default))
+    except ValueError:
+        raise InvalidUsage(f"{name} must be a number")
+    if not isfinite(value) or value <= 0:
+        raise InvalidUsage(f"{name} must be a positive number")
+    return value
+
+
+@AdminBP.get("/profile")
+async def profile_endpoint(request: Request) -> HTTPResponse:
+    """profile endpoint
+
+    Profile the worker serving the request for `seconds`.
+    `format=collapsed` samples the stacks of every thread every `interval` seconds, for flamegraph tools,
+    `format=pstats` traces the calls made on the event loop.
+
+    openapi:
+    ---
+    operationId: profile
+    tags:
+      - admin
+    responses:
+      '200':
+        description: Collapsed stacks or pstats report
+      '409':
+        description: A profile is already running in this worker
+    """
+    conf = request.app.ctx.settings
+    seconds = min(_float(request, "seconds", 5), conf.PROFILE_MAX_SECONDS)
+    format = request.args.get("format", "collapsed")
+    try:
+        if format == "collapsed":
+            body = await sample(seconds, max(_float(request, "interval", 0.005), 0.001))
+        elif format == "pstats":
+            sort = request.args.get("sort", "cumulative")
+            if sort not in SORT_KEYS:
+                raise InvalidUsage(f"sort must be one of {', '.join(sorted(SORT_KEYS))}")
+            body = await profile(seconds, sort, max(int(_float(request, "limit", 50)), 1))
+        else:
+            raise InvalidUsage("format must be collapsed or pstats")
+    except ProfilerBusy as e:
+        raise SanicException(str(e), status_code=409)
+    return text(body, headers={"x-worker-pid": str(getpid())})
+
+
+@AdminBP.get("/slow-callbacks")
+async def slow_callbacks_status(request: Request) -> HTTPResponse:
+    """slow callbacks status
+
+    openapi:
+    ---
+    operationId: slowCallbacksStatus
+    tags:
+      - admin
+    """
+    threshold = slow_callbacks.threshold if slow_callbacks.enabled else None
+    return json({"enabled": slow_callbacks.enabled, "threshold_ms": threshold and threshold * 1000, "pid": getpid()})
+
+
+@AdminBP.post("/slow-callbacks")
+async def enable_slow_callbacks(request: Request) -> HTTPResponse:
+    """enable slow callbacks detection
+
+    Log every event loop step of this worker longer than `threshold_ms`, with the route it ran for.
+
+    openapi:
+    ---
+    operationId: enableSlowCallbacks
+    tags:
+      - admin
+    """
+    default = request.app.ctx.settings.SLOW_CALLBACK_THRESHOLD_MS or 100
+    slow_callbacks.enable(_float(request, "threshold_ms", default) / 1000)
+    return await slow_callbacks_status(request)
+
+
+@AdminBP.delete("/slow-callbacks")
+async def disable_slow_callbacks(request: Request) -> HTTPResponse:
+    """disable slow callbacks detection
+
+    openapi:
+    ---
+    operationId: disableSlowCallbacks
+    tags:
+      - admin
+    """
+    slow_callbacks.disable()
+    return await slow_callbacks_status(request)
+
+
+@AdminBP.post("/settings/reload")
+async def reload_settings_endpoint(request: Request) -> HTTPResponse:
+    """reload settings
+
+    Read the settings of this worker again, and apply the fields which can change without a restart.
+
+    openapi:
+    ---
+    operationId: reloadSettings
+    tags:
+      - admin
+    responses:
+      '200':
+        description: The fields applied, and the changed ones which need a restart
+      '422':
+        description: The new settings are invalid, nothing is applied
+    """
+    try:
+        applied, restart = reload_settings(request.app)
+    except ValueError as e:
+        raise SanicException(str(e), status_code=422)
+    return json({"applied": applied, "restart": restart, "pid": getpid()})
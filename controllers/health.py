@@ -1,6 +1,7 @@
-from sanic import Blueprint, HTTPResponse, Request, json
+from sanic import Blueprint, HTTPResponse, Request
+from sanic.response import raw
 
-from services.health import health
+from services.health import health, readiness
 
 HealthBP = Blueprint("health")
 
@@ -11,7 +12,7 @@ async def health_endpoint(request: Request) -> HTTPResponse:
 
     Provides health information about the service.
 
-    such as the version of the service, the version of the dependencies, connections etc.
+    such as the version of the service and the version of the dependencies.
 
     openapi:
     ---
@@ -22,4 +23,25 @@ async def health_endpoint(request: Request) -> HTTPResponse:
       '200':
         description: Health information about the service
     """
-    return json(await health(request))
+    return raw(health(), content_type="application/json")
+
+
+@HealthBP.route("/ready")
+async def readiness_endpoint(request: Request) -> HTTPResponse:
+    """readiness endpoint
+
+    Probes redis, the databases and rabbitmq, each probe is bounded by a timeout.
+
+    openapi:
+    ---
+    operationId: readiness
+    tags:
+      - health
+    responses:
+      '200':
+        description: All the dependencies are reachable
+      '503':
+        description: At least one dependency is unreachable
+    """
+    ready, body = await readiness(request.app)
+    return raw(body, status=200 if ready else 503, content_type="application/json")
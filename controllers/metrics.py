@@ -0,0 +1,31 @@
+from sanic import Blueprint, HTTPResponse, Request
+from sanic.exceptions import NotFound
+from sanic.response import text
+
+from utils.metrics import render
+
+MetricsBP = Blueprint("metrics")
+
+
+@MetricsBP.route("/metrics")
+async def metrics_endpoint(request: Request) -> HTTPResponse:
+    """metrics endpoint
+
+    Request counts and latencies per route, and the usage of the redis, database and rabbitmq pools,
+    summed over the workers, in the prometheus text format.
+
+    openapi:
+    ---
+    operationId: metrics
+    tags:
+      - metrics
+    responses:
+      '200':
+        description: Metrics in the prometheus text format
+    """
+    registry = getattr(request.app.ctx, "metrics", None)
+    if registry is None:
+        raise NotFound("metrics are disabled")
+    # the snapshot of a worker is rewritten every sync interval, older ones are of workers which died
+    snapshot = registry.collect(request.app.ctx.metrics_dir, max_age=3 * request.app.ctx.settings.METRICS_SYNC_INTERVAL)
+    return text(render(snapshot), content_type="text/plain; version=0.0.4; charset=utf-8")
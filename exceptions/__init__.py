@@ -1,6 +1,11 @@
+from .admission import Overloaded, TooManyRequests
 from .example import ExampleException
+from .validation import ValidationFailed
 
 
 __all__ = [
     "ExampleException",
+    "Overloaded",
+    "TooManyRequests",
+    "ValidationFailed",
 ]
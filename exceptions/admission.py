@@ -0,0 +1,28 @@
+from math import ceil
+
+from sanic.exceptions import SanicException, ServiceUnavailable
+
+
+class TooManyRequests(SanicException):
+    """
+    **Status**: 429 Too Many Requests
+    """
+
+    status_code = 429
+    quiet = True
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.headers = {"Retry-After": str(max(1, ceil(retry_after)))}
+
+
+class Overloaded(ServiceUnavailable):
+    """
+    **Status**: 503 Service Unavailable, the worker has too many requests in flight
+    """
+
+    quiet = True
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.headers = {"Retry-After": str(max(1, ceil(retry_after)))}
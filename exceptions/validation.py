@@ -0,0 +1,15 @@
+from typing import Any
+
+from sanic.exceptions import SanicException
+
+
+class ValidationFailed(SanicException):
+    """
+    **Status**: 422 Unprocessable Entity, the errors are in the context of the response
+    """
+
+    status_code = 422
+    quiet = True
+
+    def __init__(self, message: str, errors: list[dict[str, Any]]) -> None:
+        super().__init__(message, context={"errors": errors})
@@ -0,0 +1,275 @@
+import asyncio
+from dataclasses import dataclass
+from functools import wraps
+from hashlib import blake2b
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
+
+try:
+    from orjson import dumps, loads
+except ImportError:
+    from json import dumps as json_dumps
+    from json import loads
+
+    def dumps(__obj: Any) -> bytes:  # type: ignore[misc]
+        return json_dumps(__obj).encode("utf-8")
+
+
+try:
+    from redis.asyncio import ConnectionPool, Redis
+
+    from utils.redis import TAG_SCRIPT
+except ImportError:
+    pass
+from sanic import HTTPResponse, Request
+from sanic.log import logger
+
+from utils.lru import LRUCache
+
+Handler = TypeVar("Handler", bound=Callable[..., Awaitable[HTTPResponse]])
+Tags = Union[Iterable[str], Callable[[Request], Iterable[str]]]
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    content_type: Optional[str]
+    headers: list[tuple[str, str]]
+    body: bytes
+    etag: str
+    tags: tuple[str, ...] = ()
+
+    def dump(self) -> bytes:
+        # the metadata never contains a raw newline, the body follows the first one
+        meta = dumps([self.status, self.content_type, self.headers, self.etag, self.tags])
+        return meta + b"\n" + self.body
+
+    @classmethod
+    def load(cls, data: bytes) -> "CachedResponse":
+        meta, body = data.split(b"\n", 1)
+        # entries written before the tags were stored have none
+        status, content_type, headers, etag, *tags = loads(meta)
+        return cls(
+            status, content_type, [tuple(header) for header in headers], body, etag, tuple(tags[0] if tags else ())
+        )
+
+    def response(self, cache_status: str) -> HTTPResponse:
+        response = HTTPResponse(self.body, status=self.status, content_type=self.content_type)
+        for name, value in self.headers:
+            response.headers.add(name, value)
+        response.headers["etag"] = self.etag
+        response.headers["x-cache"] = cache_status
+        return response
+
+
+class ResponseCache:
+    """
+    `ResponseCache` two tier cache of serialized responses
+
+    the first tier is a LRU in the worker, the second one is shared through redis.
+    Invalidations are published on `channel`, every worker subscribed drops its local entries of the tags.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        local_ttl: Optional[float] = None,
+        redis: Optional["ConnectionPool"] = None,
+        prefix: str = "response:",
+        channel: Optional[str] = None,
+    ) -> None:
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local: LRUCache[CachedResponse] = LRUCache(max_entries, max_bytes)
+        self.redis = Redis(connection_pool=redis) if redis else None
+        self.tag_script = self.redis.register_script(TAG_SCRIPT) if self.redis else None
+        self.prefix = prefix
+        self.channel = channel or f"{prefix}invalidate"
+        # invalidations this worker published are already applied
+        self.origin = uuid4().hex
+        self._subscriber: Optional[asyncio.Task[None]] = None
+
+    def key(self, request: Request, query: bool = True, headers: Sequence[str] = ()) -> str:
+        """
+        `key` cache key of a request, made of its method, path, and optionally its query string and some headers
+        """
+        parts = [request.method, request.path]
+        if query:
+            parts.append("&".join(sorted(request.query_string.split("&"))))
+        parts.extend(request.headers.get(header, "") for header in headers)
+        return blake2b("\0".join(parts).encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def entry(response: HTTPResponse) -> Optional[CachedResponse]:
+        """
+        `entry` the cacheable part of a response, `None` if it should not be cached
+        """
+        if response.status != 200 or response.body is None or "set-cookie" in response.headers:
+            return None
+        headers = [
+            (name, value)
+            for name, value in response.headers.items()
+            if name.lower() not in ("content-length", "content-type", "etag", "x-cache")
+        ]
+        etag = f'"{blake2b(response.body, digest_size=16).hexdigest()}"'
+        return CachedResponse(response.status, response.content_type, headers, response.body, etag)
+
+    async def get(self, key: str) -> Optional[tuple[CachedResponse, str]]:
+        """
+        `get` the cached response and the tier it was found in
+        """
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry, "HIT-LOCAL"
+        if self.redis is None:
+            return None
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self.prefix + key)
+                pipe.pttl(self.prefix + key)
+                data, pttl = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"response cache unavailable: {e!r}")
+            return None
+        if data is None:
+            return None
+        entry = CachedResponse.load(data)
+        # keep the local copy no longer than the shared one
+        self._set_local(key, entry, max(pttl, 1) / 1000, entry.tags)
+        return entry, "HIT"
+
+    def _set_local(self, key: str, entry: CachedResponse, ttl: float, tags: Iterable[str]) -> None:
+        ttl = min(ttl, self.local_ttl) if self.local_ttl is not None else ttl
+        self.local.set(key, entry, ttl, size=len(entry.body), tags=tags)
+
+    async def set(self, key: str, entry: CachedResponse, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        ttl = ttl or self.ttl
+        tags = entry.tags = tuple(tags)
+        self._set_local(key, entry, ttl, tags)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.prefix + key, entry.dump(), px=int(ttl * 1000))
+                if tags:
+                    tag_keys = [f"{self.prefix}tag:{tag}" for tag in tags]
+                    await self.tag_script(keys=tag_keys, args=[key, int(ttl * 1000) + 1000], client=pipe)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"response cache unavailable: {e!r}")
+
+    async def invalidate(self, *tags: str) -> None:
+        """
+        `invalidate` drop the responses cached with one of `tags`, in redis and in every worker
+        """
+        self.local.invalidate(*tags)
+        if self.redis is None or not tags:
+            return
+        tag_keys = [f"{self.prefix}tag:{tag}" for tag in tags]
+        try:
+            keys = await self.redis.sunion(tag_keys)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                if keys:
+                    pipe.delete(*(self.prefix + key.decode() for key in keys))
+                pipe.delete(*tag_keys)
+                pipe.publish(self.channel, dumps({"origin": self.origin, "tags": list(tags)}))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"response cache unavailable: {e!r}")
+
+    def start(self) -> None:
+        if self.redis is not None and self._subscriber is None:
+            self._subscriber = asyncio.create_task(self._subscribe(), name="response-cache-invalidations")
+
+    async def stop(self) -> None:
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            await asyncio.gather(self._subscriber, return_exceptions=True)
+            self._subscriber = None
+
+    def _on_invalidation(self, data: bytes) -> None:
+        invalidation = loads(data)
+        if invalidation["origin"] != self.origin:
+            self.local.invalidate(*invalidation["tags"])
+
+    async def _subscribe(self) -> None:
+        assert self.redis is not None
+        while True:
+            try:
+                async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # the local entries may have missed invalidations while disconnected
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        self._on_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"response cache invalidations unavailable: {e!r}")
+                self.local.clear()
+                await asyncio.sleep(1)
+
+
+def cache_response(
+    ttl: Optional[float] = None,
+    *,
+    query: bool = True,
+    headers: Sequence[str] = (),
+    tags: Tags = (),
+    key: Optional[Callable[[Request], str]] = None,
+) -> Callable[[Handler], Handler]:
+    """
+    `cache_response` cache the successful responses of a GET handler in `app.ctx.response_cache`
+
+    responses carry an ETag, a request with a matching `If-None-Match` gets a 304.
+    A cached response is served without calling the handler, so the handler never opens a database session.
+
+    ```python
+    @bp.get("/items/<id>")
+    @cache_response(30, tags=lambda request: ["items", f"item:{request.match_info['id']}"])
+    async def item(request: Request, id: str) -> HTTPResponse:
+        ...
+
+    await request.app.ctx.response_cache.invalidate("item:42")
+    ```
+    """
+
+    def decorator(handler: Handler) -> Handler:
+        @wraps(handler)
+        async def wrapper(request: Request, *args: Any, **kwargs: Any) -> HTTPResponse:
+            cache: Optional[ResponseCache] = getattr(request.app.ctx, "response_cache", None)
+            if cache is None or request.method not in ("GET", "HEAD"):
+                return await handler(request, *args, **kwargs)
+
+            cache_key = key(request) if key else cache.key(request, query, headers)
+            cached = await cache.get(cache_key)
+            if cached is None:
+                response = await handler(request, *args, **kwargs)
+                entry = cache.entry(response)
+                if entry is None:
+                    return response
+                await cache.set(cache_key, entry, ttl, tags(request) if callable(tags) else tags)
+                cached = entry, "MISS"
+
+            entry, cache_status = cached
+            # weak comparison, the etag is weakened when the response is compressed, the client keeps it as sent
+            for etag in request.headers.get("if-none-match", "").split(","):
+                etag = etag.strip()
+                if etag.removeprefix("W/") == entry.etag:
+                    return HTTPResponse(status=304, headers={"etag": etag, "x-cache": cache_status})
+            return entry.response(cache_status)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,163 @@
+import gzip
+import zlib
+from typing import Callable, Iterable, Mapping, Optional
+
+from sanic import Request
+from sanic.response import BaseHTTPResponse
+
+from utils.executor import __offloaders__
+
+Encoder = Callable[[bytes, int], bytes]
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    # no timestamp, so a body always compresses to the same bytes
+    return gzip.compress(body, level, mtime=0)
+
+
+def _deflate(body: bytes, level: int) -> bytes:
+    # http `deflate` is the zlib format
+    return zlib.compress(body, level)
+
+
+# encodings in order of preference when a client accepts several equally
+ENCODERS: dict[str, Encoder] = {"gzip": _gzip, "deflate": _deflate}
+
+try:
+    import zstandard
+except ImportError:
+    pass
+else:
+
+    def _zstd(body: bytes, level: int) -> bytes:
+        return zstandard.ZstdCompressor(level=level).compress(body)
+
+    ENCODERS = {"zstd": _zstd, **ENCODERS}
+
+try:
+    import brotli
+except ImportError:
+    pass
+else:
+
+    def _brotli(body: bytes, level: int) -> bytes:
+        return brotli.compress(body, quality=level)
+
+    ENCODERS = {"br": _brotli, **ENCODERS}
+
+# the extensions of the precompressed variants, see `scripts/precompress.py`
+EXTENSIONS = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/xml",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/wasm",
+    "image/svg+xml",
+)
+
+
+def negotiate(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """
+    `negotiate` the encoding of `available` the client prefers, by `q` value then by order of `available`
+
+    `None` means the response should not be encoded
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.strip()] = weight
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def weaken(etag: str) -> str:
+    # a strong etag identifies the exact bytes, which differ once encoded
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class Compressor:
+    """
+    `Compressor` compress the responses of the types of `types` with a body of at least `min_size` bytes
+
+    `level` applies to every encoding, `levels` overrides it per content type.
+    Bodies of at least `offload_size` bytes are compressed on the thread pool, off the event loop.
+    """
+
+    def __init__(
+        self,
+        min_size: int = 1024,
+        types: Optional[Iterable[str]] = None,
+        level: int = 6,
+        levels: Optional[Mapping[str, int]] = None,
+        offload_size: Optional[int] = 256 * 1024,
+        encoders: Optional[Mapping[str, Encoder]] = None,
+    ) -> None:
+        self.min_size = min_size
+        self.types = frozenset(COMPRESSIBLE_TYPES if types is None else types)
+        self.level = level
+        self.levels = dict(levels or {})
+        self.offload_size = offload_size
+        self.encoders = dict(encoders or ENCODERS)
+
+    async def compress(self, request: Request, response: BaseHTTPResponse) -> None:
+        # streamed responses have no body to compress
+        body = getattr(response, "body", None)
+        if body is None or response.status in (204, 206, 304) or response.status < 200:
+            return
+        content_type = (response.content_type or "").split(";", 1)[0].strip().lower()
+        if content_type not in self.types or "content-encoding" in response.headers:
+            return
+        if "no-transform" in response.headers.get("cache-control", ""):
+            return
+        # caches must keep a copy per encoding, even of the responses too small to be compressed
+        vary = response.headers.get("vary")
+        if vary is None:
+            response.headers["vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower() and vary != "*":
+            response.headers["vary"] = f"{vary}, Accept-Encoding"
+        if len(body) < self.min_size:
+            return
+        encoding = negotiate(request.headers.get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            return
+        encoder = self.encoders[encoding]
+        level = self.levels.get(content_type, self.level)
+        offloader = __offloaders__.get("thread")
+        if offloader is not None and self.offload_size is not None and len(body) >= self.offload_size:
+            compressed = await offloader.run(encoder, body, level)
+        else:
+            compressed = encoder(body, level)
+        if len(compressed) >= len(body):
+            return
+        response.body = compressed
+        response.headers["content-encoding"] = encoding
+        response.headers.pop("content-length", None)
+        etag = response.headers.get("etag")
+        if etag:
+            response.headers["etag"] = weaken(etag)
+
+
+async def compress_response(request: Request, response: BaseHTTPResponse) -> None:
+    compressor: Optional[Compressor] = getattr(request.app.ctx, "compressor", None)
+    if compressor is not None:
+        await compressor.compress(request, response)
@@ -0,0 +1,91 @@
+from time import perf_counter
+from typing import Any
+
+from sanic import Request, Sanic
+from sanic.response import BaseHTTPResponse
+
+from utils.metrics import REGISTRY, REQUEST_LATENCY, REQUESTS
+
+REDIS_CONNECTIONS = REGISTRY.gauge("redis_pool_connections", "Redis pool connections", ("state",))
+REDIS_WAITING = REGISTRY.gauge("redis_pool_waiting", "Callers waiting for a redis connection")
+REDIS_ACQUIRED = REGISTRY.counter("redis_pool_acquired_total", "Redis connections checked out of the pool")
+REDIS_WAIT = REGISTRY.counter("redis_pool_wait_seconds_total", "Time spent waiting for a redis connection")
+DATABASE_CONNECTIONS = REGISTRY.gauge("database_pool_connections", "Database pool connections", ("engine", "state"))
+CONSUMER_IN_FLIGHT = REGISTRY.gauge(
+    "rabbitmq_consumer_in_flight", "Messages being processed by a consumer", ("consumer",)
+)
+PUBLISHER_IN_FLIGHT = REGISTRY.gauge("rabbitmq_publisher_in_flight", "Publishes waiting for their confirm")
+PUBLISHED = REGISTRY.counter("rabbitmq_published_total", "Messages published", ("result",))
+TASKS = REGISTRY.gauge("task_queue_tasks", "Tasks of the task queues", ("queue", "state"))
+ADMISSION = REGISTRY.gauge(
+    "admission_requests", "Requests holding or waiting for a slot of the load shedder", ("state",)
+)
+
+
+async def start_timer(request: Request) -> None:
+    request.ctx.metrics_start = perf_counter()
+
+
+async def record_response(request: Request, response: BaseHTTPResponse) -> None:
+    start = getattr(request.ctx, "metrics_start", None)
+    if start is None:
+        return
+    # label by route name, not path, to bound the number of series
+    route = request.route.name if request.route else "unmatched"
+    REQUESTS.inc(request.method, route, str(response.status))
+    REQUEST_LATENCY.observe(request.method, route, value=perf_counter() - start)
+
+
+def pool_collector(app: Sanic) -> None:
+    """
+    `pool_collector` sample the redis, database and rabbitmq pools of `app` into the registry
+    """
+    ctx: Any = app.ctx
+
+    redis = getattr(ctx, "redis", None)
+    if redis is not None and hasattr(redis, "stats"):
+        stats = redis.stats()
+        REDIS_CONNECTIONS.set("in_use", value=stats["in_use"])
+        REDIS_CONNECTIONS.set("idle", value=stats["idle"])
+        REDIS_WAITING.set(value=stats["waiting"])
+        REDIS_ACQUIRED.set(value=stats["acquired"])
+        REDIS_WAIT.set(value=stats["wait_time"])
+
+    engines = {}
+    if getattr(ctx, "db_engine", None) is not None:
+        engines["master"] = ctx.db_engine
+    for index, reader in enumerate(getattr(ctx, "db_readers", None) or ()):
+        engines[f"reader{index}"] = reader
+    for name, engine in engines.items():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue
+        DATABASE_CONNECTIONS.set(name, "checked_out", value=pool.checkedout())
+        DATABASE_CONNECTIONS.set(name, "idle", value=pool.checkedin())
+        DATABASE_CONNECTIONS.set(name, "overflow", value=max(0, pool.overflow()))
+
+    try:
+        from rabbitmq.consumers import __running__
+    except ImportError:
+        pass
+    else:
+        for consumer in list(__running__):
+            CONSUMER_IN_FLIGHT.set(consumer.name, value=consumer.in_flight)
+
+    publisher = getattr(ctx, "rabbitmq_publisher", None)
+    if publisher is not None:
+        stats = publisher.stats()
+        PUBLISHER_IN_FLIGHT.set(value=stats["in_flight"])
+        PUBLISHED.set("ok", value=stats["published"])
+        PUBLISHED.set("failed", value=stats["failed"])
+
+    shedder = getattr(ctx, "load_shedder", None)
+    if shedder is not None:
+        for state, value in shedder.stats().items():
+            ADMISSION.set(state, value=value)
+
+    from tasks.scheduler import __queues__
+
+    for name, queue in __queues__.items():
+        for state, value in queue.stats().items():
+            TASKS.set(name, state, value=value)
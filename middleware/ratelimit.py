@@ -0,0 +1,285 @@
+try:
+    from redis.asyncio import ConnectionPool, Redis
+except ImportError:
+    pass
+import asyncio
+from dataclasses import dataclass
+from functools import partial
+from time import monotonic
+from typing import Callable, Optional
+
+from sanic import Request
+from sanic.log import logger
+from sanic.response import BaseHTTPResponse
+
+from exceptions import Overloaded, TooManyRequests
+from utils.metrics import REGISTRY
+from utils.singleflight import SingleFlight
+
+REJECTED = REGISTRY.counter("requests_rejected_total", "Requests rejected by the admission control", ("reason",))
+
+# take up to ARGV[3] tokens of the bucket KEYS[1] refilled with ARGV[1] tokens per second up to ARGV[2],
+# return the tokens granted and the milliseconds until the next one when none is
+RATE_LIMIT_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(tonumber(ARGV[3]), math.floor(tokens))
+tokens = tokens - granted
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if granted > 0 then
+    return {granted, 0}
+end
+return {0, math.ceil((1 - tokens) / rate * 1000)}
+"""
+
+# give ARGV[1] unused tokens back to the bucket KEYS[1], up to ARGV[2]
+RETURN_SCRIPT = """
+local tokens = tonumber(redis.call("HGET", KEYS[1], "tokens"))
+if tokens then
+    redis.call("HSET", KEYS[1], "tokens", math.min(tonumber(ARGV[2]), tokens + tonumber(ARGV[1])))
+end
+"""
+
+# local entries are pruned once there are that many, so a flood of clients does not grow the worker memory
+MAX_LOCAL_KEYS = 10000
+
+
+@dataclass(frozen=True)
+class Limit:
+    """
+    `Limit` `rate` requests per second with bursts of `burst`, per client unless `key` tells otherwise
+
+    set it on a route with `ctx_rate_limit`, the bucket is shared by every worker through redis
+
+    ```python
+    @bp.post("/login", ctx_rate_limit=Limit(1, burst=5))
+    ```
+    """
+
+    rate: float
+    burst: Optional[int] = None
+    key: Optional[Callable[[Request], str]] = None
+
+    def __post_init__(self) -> None:
+        if self.rate <= 0:
+            raise ValueError("rate limits should be positive")
+
+
+def client_key(request: Request) -> str:
+    # `remote_addr` is only set behind a proxy configured with `FORWARDED_SECRET`, `REAL_IP_HEADER` or `PROXIES_COUNT`
+    return request.remote_addr or request.ip
+
+
+class RateLimiter:
+    """
+    `RateLimiter` token buckets shared through redis
+
+    each worker borrows up to `batch` tokens at once and hands them out locally for `lease` seconds,
+    so most requests do not wait for redis. No more requests are granted than the bucket allows, but a client
+    may be refused while the other workers hold up to `batch` of its tokens, at most `lease` seconds:
+    the tokens a worker did not hand out are given back when the lease ends.
+    Without redis, the buckets are local to the worker.
+    """
+
+    def __init__(
+        self,
+        redis: Optional["ConnectionPool"] = None,
+        prefix: str = "ratelimit:",
+        batch: int = 10,
+        lease: float = 1.0,
+    ) -> None:
+        self.redis = Redis(connection_pool=redis) if redis else None
+        self.script = self.redis.register_script(RATE_LIMIT_SCRIPT) if self.redis else None
+        self.return_script = self.redis.register_script(RETURN_SCRIPT) if self.redis else None
+        self.prefix = prefix
+        self.batch = batch
+        self.lease = lease
+        # key: [tokens borrowed, lease expiry]
+        self._borrowed: dict[str, list[float]] = {}
+        # key: [tokens, last refill], the buckets of the worker without redis
+        self._buckets: dict[str, list[float]] = {}
+        self._flight: SingleFlight[float] = SingleFlight()
+        self._returns: set[asyncio.Task[None]] = set()
+
+    async def acquire(self, key: str, rate: float, burst: Optional[int] = None) -> float:
+        """
+        `acquire` a token of the bucket `key`, return 0 if granted, otherwise the seconds until one is available
+        """
+        burst = burst or max(1, int(rate))
+        while True:
+            if self._take(key):
+                return 0.0
+            # concurrent requests of the key share the borrow, then take its tokens one by one,
+            # the ones left without a token borrow again until the bucket is empty
+            retry_after = await self._flight.do(key, partial(self._borrow, key, rate, burst))
+            if retry_after:
+                return retry_after
+
+    def _take(self, key: str) -> bool:
+        borrowed = self._borrowed.get(key)
+        if borrowed is None or borrowed[0] < 1 or borrowed[1] <= monotonic():
+            return False
+        borrowed[0] -= 1
+        return True
+
+    async def _borrow(self, key: str, rate: float, burst: int) -> float:
+        wanted = max(1, min(self.batch, burst))
+        from_bucket = True
+        if self.script is None:
+            granted, retry_after = self._refill(key, rate, burst, wanted)
+        else:
+            try:
+                granted, retry_ms = await self.script(keys=[self.prefix + key], args=[rate, burst, wanted])
+            except Exception as e:
+                # better to serve without limits than not at all
+                logger.warning(f"rate limiter unavailable: {e!r}")
+                granted, retry_ms, from_bucket = wanted, 0, False
+            retry_after = retry_ms / 1000
+        if len(self._borrowed) >= MAX_LOCAL_KEYS:
+            now = monotonic()
+            self._borrowed = {k: v for k, v in self._borrowed.items() if v[1] > now and v[0] >= 1}
+        lease = self._borrowed[key] = [granted, monotonic() + self.lease]
+        if granted > 1 and from_bucket:
+            asyncio.get_running_loop().call_later(self.lease, self._expire, key, lease, burst)
+        return retry_after
+
+    def _expire(self, key: str, lease: list[float], burst: int) -> None:
+        # the tokens left are no longer handed out by `_take`, they go back to the bucket for the other workers
+        unused = int(lease[0])
+        lease[0] = 0
+        if self._borrowed.get(key) is lease:
+            del self._borrowed[key]
+        if unused < 1:
+            return
+        if self.return_script is None:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(burst, bucket[0] + unused)
+            return
+        task = asyncio.create_task(self._give_back(key, unused, burst))
+        self._returns.add(task)
+        task.add_done_callback(self._returns.discard)
+
+    async def _give_back(self, key: str, unused: int, burst: int) -> None:
+        assert self.return_script is not None
+        try:
+            await self.return_script(keys=[self.prefix + key], args=[unused, burst])
+        except Exception as e:
+            logger.warning(f"rate limiter unavailable: {e!r}")
+
+    def _refill(self, key: str, rate: float, burst: int, wanted: int) -> tuple[int, float]:
+        now = monotonic()
+        if len(self._buckets) >= MAX_LOCAL_KEYS:
+            # a bucket full again is the same as no bucket
+            self._buckets = {k: v for k, v in self._buckets.items() if v[0] + (now - v[1]) * rate < burst}
+        tokens, ts = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - ts) * rate)
+        granted = min(wanted, int(tokens))
+        self._buckets[key] = [tokens - granted, now]
+        return granted, 0 if granted else (1 - (tokens - granted)) / rate
+
+
+class Slot:
+    """
+    `Slot` a request slot of a `LoadShedder`, given back when released or garbage collected
+    """
+
+    def __init__(self, shedder: "LoadShedder") -> None:
+        self._shedder: Optional[LoadShedder] = shedder
+
+    def release(self) -> None:
+        if self._shedder is not None:
+            self._shedder.in_flight -= 1
+            self._shedder._slots.release()
+            self._shedder = None
+
+    # a request cancelled before its response middleware runs still gives its slot back
+    __del__ = release
+
+
+class LoadShedder:
+    """
+    `LoadShedder` handle at most `max_in_flight` requests at once
+
+    a request waits for a slot at most `queue_timeout` seconds, and is rejected right away
+    when `max_queued` requests are already waiting. Rejected clients are told to retry after `retry_after` seconds.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queued: Optional[int] = None,
+        queue_timeout: float = 1.0,
+        retry_after: float = 1.0,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_in_flight if max_queued is None else max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+
+    async def acquire(self) -> Slot:
+        """
+        `acquire` a slot, raise `Overloaded` if none is available in time
+        """
+        if self._slots.locked():
+            if self.queued >= self.max_queued:
+                REJECTED.inc("queue_full")
+                raise Overloaded("Too many requests in flight", self.retry_after)
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                REJECTED.inc("queue_timeout")
+                raise Overloaded("Too many requests in flight", self.retry_after)
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        return Slot(self)
+
+    def stats(self) -> dict[str, int]:
+        return {"in_flight": self.in_flight, "queued": self.queued}
+
+
+async def admit(request: Request) -> None:
+    """
+    `admit` reject the requests over their rate limit with a 429, then the ones a busy worker cannot take in time
+    with a 503, both before the handler opens a database session
+    """
+    conf = request.app.ctx.settings
+    limiter: Optional[RateLimiter] = getattr(request.app.ctx, "rate_limiter", None)
+    limit: Optional[Limit] = getattr(request.route.ctx, "rate_limit", None) if request.route else None
+    if limiter is not None and limit is not None:
+        key = f"{request.route.name}:{(limit.key or client_key)(request)}"
+        retry_after = await limiter.acquire(key, limit.rate, limit.burst)
+        if retry_after:
+            REJECTED.inc("route_rate_limit")
+            raise TooManyRequests("Rate limit exceeded", retry_after)
+    if limiter is not None and conf.RATE_LIMIT_RATE:
+        retry_after = await limiter.acquire(
+            f"client:{client_key(request)}", conf.RATE_LIMIT_RATE, conf.RATE_LIMIT_BURST
+        )
+        if retry_after:
+            REJECTED.inc("rate_limit")
+            raise TooManyRequests("Rate limit exceeded", retry_after)
+
+    shedder: Optional[LoadShedder] = getattr(request.app.ctx, "load_shedder", None)
+    if shedder is not None:
+        request.ctx.admission_slot = await shedder.acquire()
+
+
+async def release(request: Request, response: BaseHTTPResponse) -> None:
+    slot: Optional[Slot] = getattr(request.ctx, "admission_slot", None)
+    if slot is not None:
+        slot.release()
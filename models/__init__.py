@@ -0,0 +1,6 @@
+try:
+    from .bulk import bulk_insert, bulk_upsert
+except ImportError:
+    pass
+
+__all__ = ["bulk_insert", "bulk_upsert"]
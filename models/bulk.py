@@ -0,0 +1,214 @@
+try:
+    from sqlalchemy import Table
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+    from utils.query_cache import mark_written
+except ImportError:
+    pass
+else:
+    from contextlib import asynccontextmanager
+    from hashlib import sha1
+    from itertools import islice
+    from typing import (
+        Any,
+        AsyncIterable,
+        AsyncIterator,
+        Iterable,
+        Mapping,
+        Optional,
+        Sequence,
+        Union,
+    )
+
+    Row = Union[Mapping[str, Any], Sequence[Any]]
+    Rows = Union[Iterable[Row], AsyncIterable[Row]]
+    Target = Union[AsyncSession, AsyncConnection, AsyncEngine]
+
+    _preparer = postgresql.dialect().identifier_preparer
+
+    def _table(model: Any) -> Table:
+        return model if isinstance(model, Table) else model.__table__
+
+    def _columns(columns: Sequence[str]) -> str:
+        return ", ".join(_preparer.quote(column) for column in columns)
+
+    def staging_name(table: Table, columns: Sequence[str]) -> str:
+        """
+        `staging_name` the temporary table a chunk of `table` rows is copied into before the merge
+
+        the name depends on the table and the columns only, so the statements of the merge are prepared once
+        per connection, the tables of the same name in other schemas get their own
+        """
+        digest = sha1(f"{table.fullname}\0{','.join(columns)}".encode()).hexdigest()[:8]
+        # identifiers are at most 63 bytes
+        return f"_bulk_{table.name[:40]}_{digest}"
+
+    def staging_sql(table: Table, staging: str, columns: Sequence[str]) -> str:
+        # the staging table has the column types and none of the constraints, and goes away with the transaction
+        return (
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {_preparer.quote(staging)} ON COMMIT DROP AS "
+            f"SELECT {_columns(columns)} FROM {_preparer.format_table(table)} WITH NO DATA"
+        )
+
+    def upsert_sql(
+        table: Table,
+        staging: str,
+        columns: Sequence[str],
+        conflict: Sequence[str],
+        update: Sequence[str],
+    ) -> str:
+        """
+        `upsert_sql` the statement merging the staging table into `table`
+
+        rows conflicting on `conflict` update the `update` columns, or are skipped if there is none.
+        When a chunk holds the same key twice, the last row wins.
+        """
+        select = f"SELECT {_columns(columns)} FROM {_preparer.quote(staging)}"
+        if update:
+            # a single statement cannot update a row twice
+            keys = _columns(conflict)
+            select = f"SELECT DISTINCT ON ({keys}) {_columns(columns)} FROM {_preparer.quote(staging)}"
+            select += f" ORDER BY {keys}, ctid DESC"
+            assignments = ", ".join(f"{_preparer.quote(c)} = EXCLUDED.{_preparer.quote(c)}" for c in update)
+            action = f"DO UPDATE SET {assignments}"
+        else:
+            action = "DO NOTHING"
+        target = f" ({_columns(conflict)})" if conflict else ""
+        return (
+            f"INSERT INTO {_preparer.format_table(table)} ({_columns(columns)}) {select} "
+            f"ON CONFLICT{target} {action}"
+        )
+
+    async def chunks(rows: Rows, size: int) -> AsyncIterator[list[Row]]:
+        """
+        `chunks` lists of at most `size` rows of an iterable or async iterable
+        """
+        if size < 1:
+            raise ValueError("chunk size should be positive")
+        if hasattr(rows, "__aiter__"):
+            chunk: list[Row] = []
+            async for row in rows:  # type: ignore[union-attr]
+                chunk.append(row)
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+            return
+        iterator = iter(rows)  # type: ignore[arg-type]
+        while chunk := list(islice(iterator, size)):
+            yield chunk
+
+    def records(chunk: Sequence[Row], columns: Sequence[str]) -> list[tuple[Any, ...]]:
+        """
+        `records` the tuples copied for `chunk`, mappings are read in the order of `columns`
+        """
+        return [tuple(row[column] for column in columns) if isinstance(row, Mapping) else tuple(row) for row in chunk]
+
+    def _resolve(table: Table, columns: Optional[Sequence[str]], first: Row) -> list[str]:
+        if columns is not None:
+            return list(columns)
+        if isinstance(first, Mapping):
+            return [column.name for column in table.columns if column.name in first]
+        return [column.name for column in table.columns]
+
+    @asynccontextmanager
+    async def _connection(target: Target, table: Table) -> AsyncIterator[AsyncConnection]:
+        if isinstance(target, AsyncEngine):
+            async with target.begin() as connection:
+                yield connection
+        elif isinstance(target, AsyncSession):
+            # the session transaction, on the master with read replicas
+            yield await target.connection()
+            # the cached reads of the table are invalidated once the session is committed
+            mark_written(target, str(table.fullname))
+        else:
+            yield target
+
+    async def _driver(connection: AsyncConnection) -> Any:
+        raw = await connection.get_raw_connection()
+        return raw.driver_connection
+
+    async def _copy(driver: Any, name: str, schema: Optional[str], chunk: list[Any], columns: Sequence[str]) -> int:
+        status = await driver.copy_records_to_table(name, records=chunk, columns=columns, schema_name=schema)
+        return int(status.split()[-1])
+
+    async def bulk_insert(
+        target: Target,
+        model: Any,
+        rows: Rows,
+        *,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 10000,
+    ) -> int:
+        """
+        `bulk_insert` copy `rows` into the table of `model` with the binary `COPY` of asyncpg, return the row count
+
+        `target` is an `AsyncSession` (the rows are written in its transaction), an `AsyncConnection`, or an
+        `AsyncEngine` (the rows are written in a transaction of their own). `rows` are mappings or tuples in the
+        order of `columns`, which defaults to the keys of the first mapping, or every column of the table.
+        The rows are read and sent `chunk_size` at a time, so an iterable of any size can be copied.
+        Values should have the python type of their column, asyncpg encodes them in binary.
+
+        the rows do not go through the ORM, the objects of a session do not see them until they are loaded again
+        """
+        table = _table(model)
+        total = 0
+        async with _connection(target, table) as connection:
+            driver = None
+            async for chunk in chunks(rows, chunk_size):
+                if driver is None:
+                    columns = _resolve(table, columns, chunk[0])
+                    # the adapter begins its transaction on the first statement it runs, `COPY` goes around it
+                    await connection.exec_driver_sql("SELECT 1")
+                    driver = await _driver(connection)
+                total += await _copy(driver, table.name, table.schema, records(chunk, columns), columns)
+        return total
+
+    async def bulk_upsert(
+        target: Target,
+        model: Any,
+        rows: Rows,
+        *,
+        columns: Optional[Sequence[str]] = None,
+        conflict: Optional[Sequence[str]] = None,
+        update: Optional[Sequence[str]] = None,
+        chunk_size: int = 10000,
+    ) -> int:
+        """
+        `bulk_upsert` insert or update `rows` in the table of `model`, return the number of rows written
+
+        each chunk is copied into a temporary staging table then merged with `INSERT ... ON CONFLICT`.
+        `conflict` defaults to the primary key, `update` to the copied columns outside of it,
+        pass `update=()` to skip the conflicting rows, on any constraint if `conflict` is empty.
+        See `bulk_insert` for the other arguments.
+
+        ```python
+        async with app.ctx.db_sessionmaker() as session, session.begin():
+            await bulk_upsert(session, Item, ({"id": item["id"], "name": item["name"]} for item in body))
+        ```
+        """
+        table = _table(model)
+        if conflict is None:
+            conflict = [column.name for column in table.primary_key.columns]
+        if not conflict and update != ():
+            # only skipping the rows which conflict on any constraint needs no conflict target
+            raise ValueError(f"table {table.name} has no primary key, pass `conflict`, or `update=()`")
+        total = 0
+        async with _connection(target, table) as connection:
+            driver = None
+            async for chunk in chunks(rows, chunk_size):
+                if driver is None:
+                    columns = _resolve(table, columns, chunk[0])
+                    if update is None:
+                        update = [column for column in columns if column not in conflict]
+                    staging = staging_name(table, columns)
+                    merge = upsert_sql(table, staging, columns, conflict, update)
+                    await connection.exec_driver_sql(staging_sql(table, staging, columns))
+                    driver = await _driver(connection)
+                await _copy(driver, staging, None, records(chunk, columns), columns)
+                result = await connection.exec_driver_sql(merge)
+                total += max(result.rowcount, 0)
+                await connection.exec_driver_sql(f"TRUNCATE {_preparer.quote(staging)}")
+        return total
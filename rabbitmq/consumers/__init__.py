@@ -3,14 +3,19 @@ try:
         AbstractChannel,
         AbstractConnection,
         AbstractIncomingMessage,
+        AbstractQueue,
         ConsumerTag,
     )
 except ImportError:
     pass
 else:
+    import asyncio
     from abc import ABC, abstractmethod
     from dataclasses import MISSING, dataclass, fields
-    from typing import Sequence
+    from typing import Optional, Sequence
+    from weakref import WeakSet
+
+    from sanic.log import logger
 
     from settings import Settings
 
@@ -20,7 +25,10 @@ else:
         queue_name: str
         exchange_name: str
         routing_key: str
-        no_ack: bool = True  # default auto ack
+        no_ack: bool = False  # default ack once `on_message` succeeded
+        prefetch_count: int = 20  # unacked messages the broker may push to this consumer
+        max_concurrency: int = 10  # `on_message` running at the same time
+        requeue: bool = True  # requeue messages `on_message` failed on
 
     class AbstractConsumer(ABC):
         """
@@ -30,6 +38,9 @@ else:
         name: str
         settings: ConsumerSetting
         channel: AbstractChannel
+        queue: AbstractQueue
+        consumer_tag: ConsumerTag
+        in_flight: int = 0
 
         def __init__(self, conf: Settings):
             """
@@ -38,7 +49,9 @@ else:
             config keys are like `RABBITMQ_{consumer name}_{config name}`
 
             required config keys are `RABBITMQ_{consumer name}_CHANNEL`, `RABBITMQ_{consumer name}_QUEUE_NAME`,
-            `RABBITMQ_{consumer name}_EXCHANGE_NAME` and `RABBITMQ_{consumer name}_ROUTING_KEY`
+            `RABBITMQ_{consumer name}_EXCHANGE_NAME` and `RABBITMQ_{consumer name}_ROUTING_KEY`,
+            flow control is tuned with `RABBITMQ_{consumer name}_PREFETCH_COUNT` and
+            `RABBITMQ_{consumer name}_MAX_CONCURRENCY`
             """
             for slot in fields(self.settings):
                 key = f"RABBITMQ_{self.name.upper()}_{slot.name.upper()}"
@@ -46,6 +59,13 @@ else:
                     setattr(self.settings, slot.name, getattr(conf, key))
                 elif slot.default is MISSING:
                     raise KeyError(f"{key} is not defined in settings")
+            self._semaphore = asyncio.Semaphore(self.settings.max_concurrency)
+
+        async def cancel(self) -> None:
+            """
+            `cancel` stop receiving messages, the ones being handled are still acked
+            """
+            await self.queue.cancel(self.consumer_tag)
 
         async def close(self) -> None:
             return await self.channel.close()
@@ -57,17 +77,154 @@ else:
             """
             raise NotImplementedError
 
+        async def dispatch(self, message: AbstractIncomingMessage) -> None:
+            """
+            `dispatch` run `on_message` once a concurrency slot is free, then ack the message
+
+            a message `on_message` raised on is rejected, and requeued if `requeue` is set
+            """
+            async with self._semaphore:
+                self.in_flight += 1
+                try:
+                    if self.settings.no_ack:
+                        await self.on_message(message)
+                    else:
+                        async with message.process(requeue=self.settings.requeue, ignore_processed=True):
+                            await self.on_message(message)
+                except Exception as e:
+                    logger.exception(e)
+                finally:
+                    self.in_flight -= 1
+
         async def register(self, connection: AbstractConnection) -> ConsumerTag:
             """
             `register` register the consumer with the connection and return the consumer tag
             """
-            async with connection:
-                self.channel = await connection.channel(self.settings.channel)
+            self.channel = await connection.channel(self.settings.channel)
+            if not self.settings.no_ack:
+                # prefetch is ignored by the broker in auto ack mode
+                await self.channel.set_qos(prefetch_count=self.settings.prefetch_count)
+
+            self.queue = await self.channel.declare_queue(self.settings.queue_name, durable=True)
 
-                queue = await self.channel.declare_queue(self.settings.queue_name, durable=True)
+            if self.settings.exchange_name:
+                await self.queue.bind(self.settings.exchange_name, routing_key=self.settings.routing_key)
+            self.consumer_tag = await self.queue.consume(self.dispatch, no_ack=self.settings.no_ack)
+            return self.consumer_tag
+
+    @dataclass
+    class BatchConsumerSetting(ConsumerSetting):
+        batch_size: int = 100  # messages handed to `on_batch` at most
+        max_wait_ms: float = 50  # time the first message of a batch waits for the batch to fill
 
-                if self.settings.exchange_name:
-                    await queue.bind(self.settings.exchange_name, routing_key=self.settings.routing_key)
-                return await queue.consume(self.on_message, no_ack=self.settings.no_ack)
+    class AbstractBatchConsumer(AbstractConsumer):
+        """
+        MQ Consumer receiving messages in batches
+        """
+
+        settings: BatchConsumerSetting
+
+        def __init__(self, conf: Settings):
+            """
+            `AbstractBatchConsumer` additionally reads `RABBITMQ_{consumer name}_BATCH_SIZE`
+            and `RABBITMQ_{consumer name}_MAX_WAIT_MS`
+
+            prefetch count is raised to the batch size so that a batch can fill up
+            """
+            super().__init__(conf)
+            self.settings.prefetch_count = max(self.settings.prefetch_count, self.settings.batch_size)
+            self._batch: list[AbstractIncomingMessage] = []
+            self._timer: Optional[asyncio.TimerHandle] = None
+            # batches are handled one at a time, so that acking multiple never covers another batch
+            self._lock = asyncio.Lock()
+            self._tasks: set[asyncio.Task[None]] = set()
+
+        @abstractmethod
+        async def on_batch(
+            self, messages: Sequence[AbstractIncomingMessage]
+        ) -> Optional[Sequence[AbstractIncomingMessage]]:
+            """
+            `on_batch` handle the received messages, in delivery order
+
+            return the messages which failed to be nacked, the others are acked,
+            if it raises, the whole batch is nacked
+            """
+            raise NotImplementedError
+
+        async def on_message(self, message: AbstractIncomingMessage) -> None:
+            """
+            `on_message` handle a single message as a batch of one
+            """
+            await self.on_batch([message])
+
+        async def dispatch(self, message: AbstractIncomingMessage) -> None:
+            """
+            `dispatch` collect the message, the batch is flushed when full or `max_wait_ms` after its first message
+            """
+            self._batch.append(message)
+            if len(self._batch) >= self.settings.batch_size:
+                self.flush()
+            elif self._timer is None:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(self.settings.max_wait_ms / 1000, self.flush)
+
+        def flush(self) -> None:
+            """
+            `flush` hand the collected messages over to `on_batch`
+            """
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._batch = self._batch, []
+            if batch:
+                task = asyncio.create_task(self.process(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        async def process(self, batch: list[AbstractIncomingMessage]) -> None:
+            async with self._lock:
+                self.in_flight += len(batch)
+                try:
+                    failed = await self.on_batch(batch)
+                except Exception as e:
+                    logger.exception(e)
+                    if not self.settings.no_ack:
+                        await batch[-1].nack(multiple=True, requeue=self.settings.requeue)
+                    return
+                finally:
+                    self.in_flight -= len(batch)
+                if self.settings.no_ack:
+                    return
+                failed_tags = {message.delivery_tag for message in failed or ()}
+                if not failed_tags:
+                    await batch[-1].ack(multiple=True)
+                    return
+                first = next(i for i, message in enumerate(batch) if message.delivery_tag in failed_tags)
+                # the messages before the first failure are acked at once
+                if first:
+                    await batch[first - 1].ack(multiple=True)
+                rest = batch[first:]
+                if len(rest) == len(failed_tags):
+                    await rest[-1].nack(multiple=True, requeue=self.settings.requeue)
+                    return
+                for message in rest:
+                    if message.delivery_tag in failed_tags:
+                        await message.nack(requeue=self.settings.requeue)
+                    else:
+                        await message.ack()
+
+        async def close_batches(self) -> None:
+            """
+            `close_batches` flush the collected messages and wait for every batch to be handled
+            """
+            self.flush()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        async def close(self) -> None:
+            await self.close_batches()
+            return await super().close()
 
     __consumers__: Sequence[type[AbstractConsumer]] = []
+    # consumers registered in this worker
+    __running__: "WeakSet[AbstractConsumer]" = WeakSet()
@@ -10,7 +10,7 @@ else:
 
     from settings import Settings
 
-    from .consumers import __consumers__
+    from .consumers import __consumers__, __running__
 
     async def setup_rabbitmq(
         conf: Settings, loop: Optional[AbstractEventLoop] = None
@@ -40,5 +40,6 @@ else:
             instance = consumer(conf)
             consumer_names.add(instance.name)
             await instance.register(conn)
+            __running__.add(instance)
 
         return conn
@@ -6,7 +6,14 @@ except ImportError:
     pass
 else:
     from abc import ABC, abstractmethod
-    from typing import Any, Optional
+    from typing import Any, Iterable, Optional
+
+    from ..publisher import (
+        Envelope,
+        PublishResult,
+        get_batch_publisher,
+        get_publisher,
+    )
 
     class BaseMessage(ABC):
         """MQ Message"""
@@ -49,29 +56,75 @@ else:
             """
             raise NotImplementedError
 
+        def envelope(
+            self, routing_key: str = "", *, mandatory: bool = True, immediate: bool = False, timeout: TimeoutType = None
+        ) -> Envelope:
+            """
+            `envelope` wrap the message with its exchange and routing key for publishing
+            """
+            return Envelope(
+                message=self.message,
+                routing_key=routing_key,
+                exchange=self.exchange,
+                exchange_type=self.exchange_type,
+                exchange_kwargs=self.kwargs,
+                mandatory=mandatory,
+                immediate=immediate,
+                timeout=timeout,
+            )
+
         async def send(
             self, routing_key: str = "", *, mandatory: bool = True, immediate: bool = False, timeout: TimeoutType = None
         ) -> Optional[ConfirmationFrameType]:
+            """
+            `send` publish the message through the pooled confirm channels of the connection
+
+            `channel_number`, `publisher_confirms` and `on_return_raises` are not used,
+            as channels are shared by every message sent over the connection
+            """
             if not self.connection:
                 raise ValueError("Rabbitmq connection does not exist")
-            async with self.connection:
-                # Creating a channel
-                channel = self.connection.channel(self.channel_number, self.publisher_confirms, self.on_return_raises)
-                if self.exchange:
-                    exchange = await channel.declare_exchange(self.exchange, type=self.exchange_type, **self.kwargs)
+            publisher = get_publisher(self.connection)
+            return await publisher.publish(
+                self.message,
+                routing_key,
+                exchange=self.exchange,
+                exchange_type=self.exchange_type,
+                exchange_kwargs=self.kwargs,
+                mandatory=mandatory,
+                immediate=immediate,
+                timeout=timeout,
+            )
+
+        async def send_batched(
+            self, routing_key: str = "", *, mandatory: bool = True, immediate: bool = False, timeout: TimeoutType = None
+        ) -> Optional[ConfirmationFrameType]:
+            """
+            `send_batched` publish the message within the next batch of the connection
+
+            concurrent callers share a single confirm wait per batch, see `BatchPublisher`
+            """
+            if not self.connection:
+                raise ValueError("Rabbitmq connection does not exist")
+            envelope = self.envelope(routing_key, mandatory=mandatory, immediate=immediate, timeout=timeout)
+            return await get_batch_publisher(self.connection).publish(envelope)
+
+    async def publish_many(messages: Iterable[tuple[BaseMessage, str]]) -> list[PublishResult]:
+        """
+        `publish_many` publish `(message, routing_key)` pairs, waiting for the confirms once per connection
 
-                    return await exchange.publish(
-                        message=self.message,
-                        routing_key=routing_key,
-                        mandatory=mandatory,
-                        immediate=immediate,
-                        timeout=timeout,
-                    )
-                else:
-                    return await channel.default_exchange.publish(
-                        message=self.message,
-                        routing_key=routing_key,
-                        mandatory=mandatory,
-                        immediate=immediate,
-                        timeout=timeout,
-                    )
+        the result of each message is either its confirmation or the exception it failed with, in order
+        """
+        messages = list(messages)
+        results: list[PublishResult] = [None] * len(messages)
+        by_connection: dict[AbstractConnection, list[int]] = {}
+        for index, (message, _) in enumerate(messages):
+            if not message.connection:
+                results[index] = ValueError("Rabbitmq connection does not exist")
+                continue
+            by_connection.setdefault(message.connection, []).append(index)
+        for connection, indexes in by_connection.items():
+            envelopes = [messages[index][0].envelope(messages[index][1]) for index in indexes]
+            for index, result in zip(indexes, await get_publisher(connection).publish_many(envelopes)):
+                results[index] = result
+        return results
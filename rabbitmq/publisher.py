@@ -0,0 +1,312 @@
+try:
+    from aio_pika import ExchangeType
+    from aio_pika.abc import (
+        AbstractChannel,
+        AbstractConnection,
+        AbstractExchange,
+        AbstractMessage,
+        TimeoutType,
+    )
+    from aiormq.abc import ConfirmationFrameType
+except ImportError:
+    pass
+else:
+    import asyncio
+    from dataclasses import dataclass, field
+    from itertools import count
+    from time import perf_counter
+    from typing import Any, Iterable, Optional, Union
+    from weakref import WeakKeyDictionary
+
+    from sanic.log import logger
+
+    from utils.metrics import REGISTRY
+
+    PUBLISH_CONFIRM = REGISTRY.histogram(
+        "rabbitmq_publish_confirm_seconds", "Time from a publish to its confirm by the broker", ("exchange",)
+    )
+
+    PublishResult = Union[Optional[ConfirmationFrameType], BaseException]
+
+    @dataclass
+    class Envelope:
+        """
+        `Envelope` a message with everything needed to publish it
+        """
+
+        message: AbstractMessage
+        routing_key: str = ""
+        exchange: str = ""
+        exchange_type: ExchangeType = ExchangeType.TOPIC
+        exchange_kwargs: dict[str, Any] = field(default_factory=dict)
+        mandatory: bool = True
+        immediate: bool = False
+        timeout: TimeoutType = None
+
+    class Publisher:
+        """
+        `Publisher` publish messages over a pool of long lived confirm channels
+
+        publishes are spread round robin over the channels and are not serialized,
+        so the confirms of concurrent publishes on the same channel are pipelined.
+        Exchanges are declared once per channel and cached by name and type.
+        """
+
+        def __init__(
+            self,
+            connection: AbstractConnection,
+            channels: int = 4,
+            max_in_flight: int = 1000,
+            on_return_raises: bool = False,
+        ) -> None:
+            if channels < 1:
+                raise ValueError("Publisher needs at least one channel")
+            self.connection = connection
+            self.on_return_raises = on_return_raises
+            self._channels: list[Optional[AbstractChannel]] = [None] * channels
+            self._locks = [asyncio.Lock() for _ in range(channels)]
+            self._exchanges: dict[tuple[int, str, str], AbstractExchange] = {}
+            self._counter = count()
+            self._in_flight = asyncio.Semaphore(max_in_flight)
+            self.in_flight = 0
+            self.published = 0
+            self.failed = 0
+            self.confirm_time = 0.0
+            self.confirm_time_max = 0.0
+
+        async def channel(self, slot: int) -> AbstractChannel:
+            """
+            `channel` get the channel of a slot, opening it if it is not opened yet or has been closed
+            """
+            channel = self._channels[slot]
+            if channel is not None and not channel.is_closed:
+                return channel
+            async with self._locks[slot]:
+                channel = self._channels[slot]
+                if channel is None or channel.is_closed:
+                    channel = await self.connection.channel(
+                        publisher_confirms=True, on_return_raises=self.on_return_raises
+                    )
+                    self._channels[slot] = channel
+                    for key in [key for key in self._exchanges if key[0] == slot]:
+                        del self._exchanges[key]
+            return channel
+
+        async def exchange(
+            self,
+            slot: int,
+            name: str = "",
+            type: ExchangeType = ExchangeType.TOPIC,
+            **kwargs: Any,
+        ) -> AbstractExchange:
+            """
+            `exchange` get the exchange declared on the channel of a slot, the default exchange if no name is given
+            """
+            channel = await self.channel(slot)
+            if not name:
+                return channel.default_exchange
+            key = (slot, name, type.value)
+            exchange = self._exchanges.get(key)
+            if exchange is not None:
+                return exchange
+            # concurrent first publishes on the slot declare the exchange once
+            async with self._locks[slot]:
+                if key not in self._exchanges:
+                    self._exchanges[key] = await channel.declare_exchange(name, type=type, **kwargs)
+            return self._exchanges[key]
+
+        async def _publish(self, slot: int, envelope: Envelope) -> Optional[ConfirmationFrameType]:
+            async with self._in_flight:
+                target = await self.exchange(
+                    slot, envelope.exchange, envelope.exchange_type, **envelope.exchange_kwargs
+                )
+                self.in_flight += 1
+                start = perf_counter()
+                try:
+                    confirmation = await target.publish(
+                        message=envelope.message,
+                        routing_key=envelope.routing_key,
+                        mandatory=envelope.mandatory,
+                        immediate=envelope.immediate,
+                        timeout=envelope.timeout,
+                    )
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.in_flight -= 1
+                    elapsed = perf_counter() - start
+                    self.confirm_time += elapsed
+                    self.confirm_time_max = max(self.confirm_time_max, elapsed)
+                    PUBLISH_CONFIRM.observe(envelope.exchange, value=elapsed)
+                self.published += 1
+                return confirmation
+
+        async def publish(
+            self,
+            message: AbstractMessage,
+            routing_key: str = "",
+            *,
+            exchange: str = "",
+            exchange_type: ExchangeType = ExchangeType.TOPIC,
+            exchange_kwargs: Optional[dict[str, Any]] = None,
+            mandatory: bool = True,
+            immediate: bool = False,
+            timeout: TimeoutType = None,
+        ) -> Optional[ConfirmationFrameType]:
+            """
+            `publish` publish a message and wait for the broker to confirm it
+            """
+            envelope = Envelope(
+                message, routing_key, exchange, exchange_type, exchange_kwargs or {}, mandatory, immediate, timeout
+            )
+            return await self._publish(next(self._counter) % len(self._channels), envelope)
+
+        async def publish_many(self, envelopes: Iterable[Envelope]) -> list[PublishResult]:
+            """
+            `publish_many` publish messages on one channel and wait for all the confirms at once
+
+            the result of each message is either its confirmation or the exception it failed with, in order
+            """
+            slot = next(self._counter) % len(self._channels)
+            return await asyncio.gather(
+                *(self._publish(slot, envelope) for envelope in envelopes), return_exceptions=True
+            )
+
+        def stats(self) -> dict[str, Union[int, float]]:
+            """
+            `stats` publisher counters, confirm times are in seconds
+            """
+            return {
+                "channels": sum(1 for channel in self._channels if channel is not None and not channel.is_closed),
+                "in_flight": self.in_flight,
+                "published": self.published,
+                "failed": self.failed,
+                "confirm_time": self.confirm_time,
+                "confirm_time_max": self.confirm_time_max,
+            }
+
+        async def close(self) -> None:
+            """
+            `close` close the pooled channels, the connection is left open
+            """
+            channels = [channel for channel in self._channels if channel is not None and not channel.is_closed]
+            self._channels = [None] * len(self._channels)
+            self._exchanges.clear()
+            await asyncio.gather(*(channel.close() for channel in channels), return_exceptions=True)
+
+    class BatchPublisher:
+        """
+        `BatchPublisher` coalesce messages from concurrent callers into batches
+
+        a batch is flushed through `Publisher.publish_many` once it holds `batch_size` messages
+        or its first message has waited `linger` seconds. Callers wait for room when `max_buffered`
+        messages are already waiting to be flushed.
+        """
+
+        def __init__(
+            self,
+            publisher: Publisher,
+            batch_size: int = 500,
+            linger: float = 0.005,
+            max_buffered: int = 10000,
+        ) -> None:
+            self.publisher = publisher
+            self.batch_size = batch_size
+            self.linger = linger
+            self._queue: asyncio.Queue[
+                tuple[Envelope, asyncio.Future[Optional[ConfirmationFrameType]]]
+            ] = asyncio.Queue(max_buffered)
+            self._task: Optional[asyncio.Task[None]] = None
+            self.batches = 0
+
+        async def enqueue(self, envelope: Envelope) -> "asyncio.Future[Optional[ConfirmationFrameType]]":
+            """
+            `enqueue` buffer a message and return a future resolved with its confirmation once its batch is flushed
+            """
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+            future: asyncio.Future[Optional[ConfirmationFrameType]] = asyncio.get_running_loop().create_future()
+            await self._queue.put((envelope, future))
+            return future
+
+        async def publish(self, envelope: Envelope) -> Optional[ConfirmationFrameType]:
+            """
+            `publish` publish a message within the next batch and wait for its confirmation
+            """
+            return await (await self.enqueue(envelope))
+
+        async def _collect(self) -> list[tuple[Envelope, asyncio.Future[Optional[ConfirmationFrameType]]]]:
+            loop = asyncio.get_running_loop()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.linger
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            return batch
+
+        async def _flush(self, batch: list[tuple[Envelope, asyncio.Future[Optional[ConfirmationFrameType]]]]) -> None:
+            results = await self.publisher.publish_many(envelope for envelope, _ in batch)
+            self.batches += 1
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+        async def _run(self) -> None:
+            while True:
+                batch = await self._collect()
+                try:
+                    await self._flush(batch)
+                except Exception as e:
+                    logger.exception(e)
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+        async def close(self) -> None:
+            """
+            `close` wait for the buffered messages to be flushed and stop batching
+            """
+            if self._task is None:
+                return
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    __publishers__: "WeakKeyDictionary[AbstractConnection, Publisher]" = WeakKeyDictionary()
+    __batchers__: "WeakKeyDictionary[AbstractConnection, BatchPublisher]" = WeakKeyDictionary()
+
+    def get_publisher(connection: AbstractConnection, **kwargs: Any) -> Publisher:
+        """
+        `get_publisher` get the publisher of a connection, creating it with `kwargs` on first use
+        """
+        if connection not in __publishers__:
+            __publishers__[connection] = Publisher(connection, **kwargs)
+        return __publishers__[connection]
+
+    def get_batch_publisher(connection: AbstractConnection, **kwargs: Any) -> BatchPublisher:
+        """
+        `get_batch_publisher` get the batch publisher of a connection, creating it with `kwargs` on first use
+        """
+        if connection not in __batchers__:
+            __batchers__[connection] = BatchPublisher(get_publisher(connection), **kwargs)
+        return __batchers__[connection]
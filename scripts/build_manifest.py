@@ -0,0 +1,18 @@
+"""
+Write the blueprint manifest of `controllers`, so that workers skip walking the package at boot
+
+usage: python scripts/build_manifest.py [path, default to blueprints.json]
+then point `APP_AUTODISCOVERY_MANIFEST` to the written file
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import controllers  # noqa: E402
+from utils.autodiscovery import write_manifest  # noqa: E402
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "blueprints.json"
+    manifest = write_manifest(path, controllers, recursive=True)
+    print(f"{sum(len(names) for names in manifest.values())} blueprints from {len(manifest)} modules written to {path}")
@@ -0,0 +1,17 @@
+"""
+Write the compressed variants of the assets of `statics`, so that workers serve them without compressing them
+
+usage: python scripts/precompress.py [directory, default to statics]
+gzip variants are always written, brotli and zstd ones when `brotli` and `zstandard` are installed
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.statics import precompress  # noqa: E402
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else "statics")
+    written = precompress(root)
+    print(", ".join(f"{count} {encoding}" for encoding, count in written.items()) + f" variants written to {root}")
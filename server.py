@@ -1,3 +1,4 @@
+from time import perf_counter
 from typing import Any, Callable, Optional
 
 try:
@@ -11,29 +12,34 @@ except ImportError:
 
 
 from sanic import Sanic
+from sanic.log import logger
 
 import controllers
-from settings import Settings
+from settings import Settings, get_settings
 from setup import setup
 from utils.autodiscovery import autodiscover
+from utils.context import Request
 
 
 def init_app(conf: Optional[Settings] = None) -> Sanic:
-    conf = conf or Settings()
-    app = Sanic(name=conf.NAME, dumps=dumps, loads=loads)
+    start = perf_counter()
+    conf = conf or get_settings()
+    app = Sanic(name=conf.NAME, dumps=dumps, loads=loads, request_class=Request)
 
     autodiscover(
         app,
         controllers,
         recursive=True,
+        manifest=conf.AUTODISCOVERY_MANIFEST,
     )
     setup(app, conf)
 
+    logger.info(f"{conf.NAME} initialized in {(perf_counter() - start) * 1000:.1f}ms")
     return app
 
 
 def main(app: Optional[Sanic] = None, conf: Optional[Settings] = None) -> None:
-    conf = conf or Settings()
+    conf = conf or get_settings()
     app = app or init_app(conf)
     app.run(
         host=conf.HOST,
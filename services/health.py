@@ -1,36 +1,47 @@
+import asyncio
+from time import monotonic
+from typing import Any, Awaitable, Callable, Union
+
 try:
     from orjson import __version__ as orjson_version
+    from orjson import dumps
 except ImportError:
-    pass
+    from json import dumps as json_dumps
+
+    orjson_version = None
+
+    def dumps(__obj: Any) -> bytes:  # type: ignore[misc]
+        return json_dumps(__obj).encode("utf-8")
+
+
 try:
     from aio_pika import __version__ as aio_pika_version
 except ImportError:
-    pass
+    aio_pika_version = None
 try:
     from sentry_sdk.consts import VERSION as sentry_sdk_version
 except ImportError:
-    pass
+    sentry_sdk_version = None
 try:
     from asyncpg import __version__ as asyncpg_version
     from sqlalchemy import __version__ as sqlalchemy_version
-    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncEngine
 except ImportError:
-    pass
+    asyncpg_version = sqlalchemy_version = None
 try:
-    from redis import Connection
     from redis import __version__ as redis_version
+    from redis.asyncio import Redis
 except ImportError:
-    pass
-from typing import Union
-
+    redis_version = None
 from pydantic import __version__ as pydantic_version
-from sanic import Request
+from sanic import Sanic
 from sanic import __version__ as sanic_version
 
 from version import __version__
 
 
-async def health(request: Request) -> dict[str, Union[str, list[str]]]:
+def modules() -> list[str]:
     modules = []
     if sanic_version:
         modules.append(f"sanic: {sanic_version}")
@@ -48,22 +59,76 @@ async def health(request: Request) -> dict[str, Union[str, list[str]]]:
         modules.append(f"aio_pika {aio_pika_version}")
     if sentry_sdk_version:
         modules.append(f"sentry_sdk {sentry_sdk_version}")
+    return modules
+
+
+# versions do not change while the process is running, serialize them once
+LIVENESS: bytes = dumps({"status": "ok", "version": __version__, "modules": modules()})
+
+
+def health() -> bytes:
+    """
+    `health` pre-serialized liveness payload
+    """
+    return LIVENESS
+
+
+async def _probe(check: Callable[[], Awaitable[Any]], timeout: float) -> str:
+    try:
+        await asyncio.wait_for(check(), timeout)
+    except asyncio.TimeoutError:
+        return "timeout"
+    except Exception as e:
+        return f"error: {e.__class__.__name__}"
+    return "ok"
+
+
+def _checks(app: Sanic) -> dict[str, Callable[[], Awaitable[Any]]]:
+    # only the configured dependencies are probed
+    checks: dict[str, Callable[[], Awaitable[Any]]] = {}
+    if getattr(app.ctx, "redis", None):
+        checks["redis"] = Redis(connection_pool=app.ctx.redis).ping
+    if getattr(app.ctx, "db_engine", None):
+        engines: list[AsyncEngine] = [app.ctx.db_engine, *app.ctx.db_readers]
+        for index, engine in enumerate(engines):
+
+            async def select_one(engine: AsyncEngine = engine) -> None:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+
+            checks["database" if index == 0 else f"database_reader_{index - 1}"] = select_one
+    if getattr(app.ctx, "rabbitmq", None):
+
+        async def channel() -> None:
+            # the publisher reopens its channel if the broker closed it
+            await app.ctx.rabbitmq_publisher.channel(0)
+
+        checks["rabbitmq"] = channel
+    return checks
+
+
+async def _readiness(app: Sanic, timeout: float) -> tuple[bool, bytes]:
+    checks = _checks(app)
+    results = await asyncio.gather(*(_probe(check, timeout) for check in checks.values()))
+    status = dict(zip(checks, results))
+    warmup: Union[asyncio.Task[None], None] = getattr(app.ctx, "warmup", None)
+    if warmup is not None:
+        # the first requests would wait for the pools to open their connections
+        status["warmup"] = "ok" if warmup.done() else "running"
+    ready = all(result == "ok" for result in status.values())
+    return ready, dumps({"status": "ok" if ready else "unavailable", "version": __version__, "checks": status})
+
+
+async def readiness(app: Sanic) -> tuple[bool, bytes]:
+    """
+    `readiness` probe redis, the databases and rabbitmq concurrently, not ready until the warmup is done
 
-    connections = []
-    if hasattr(request.app.ctx, "rabbitmq") and request.app.ctx.rabbitmq and not request.app.ctx.rabbitmq.is_closed:
-        connections.append("rabbitmq: connected")
-    else:
-        connections.append("rabbitmq: disconnected")
-    if hasattr(request.app.ctx, "redis") and request.app.ctx.redis:
-        connections.append(f"redis pool: {request.app.ctx.redis._created_connections} connected")
-        if request.ctx.redis:
-            conn: Connection = request.ctx.redis
-            connections.append(f'redis connection: {"Ready" if not await conn.can_read() else "In use"}')
-    else:
-        connections.append("redis: disconnected")
-    if hasattr(request.ctx, "db_session") and request.ctx.db_session:
-        session: AsyncSession = request.ctx.db_session
-        connections.append(f"database: {'connected' if session.is_active else 'disconnected'}")
-    else:
-        connections.append("database: disconnected")
-    return {"status": "ok", "version": __version__, "modules": modules, "connections": connections}
+    results are cached for `HEALTH_CACHE_TTL` seconds and concurrent callers share the probes in flight
+    """
+    conf = app.ctx.settings
+    cached: Union[tuple[float, asyncio.Task[tuple[bool, bytes]]], None] = getattr(app.ctx, "readiness", None)
+    if cached is None or (cached[1].done() and monotonic() >= cached[0]):
+        task = asyncio.create_task(_readiness(app, conf.HEALTH_PROBE_TIMEOUT))
+        task.add_done_callback(lambda _: setattr(app.ctx, "readiness", (monotonic() + conf.HEALTH_CACHE_TTL, task)))
+        cached = app.ctx.readiness = (float("inf"), task)
+    return await asyncio.shield(cached[1])
@@ -5,9 +5,17 @@ except ImportError:
 
 from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from pydantic import BaseSettings, HttpUrl, PostgresDsn, RedisDsn
+from pydantic import (
+    BaseSettings,
+    HttpUrl,
+    PositiveFloat,
+    PositiveInt,
+    PostgresDsn,
+    RedisDsn,
+    SecretStr,
+)
 from pydantic.env_settings import SettingsSourceCallable
 
 
@@ -30,22 +38,108 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     WORKER: int = 1
     ENV_NAME: str = "production"
+    AUTODISCOVERY_MANIFEST: Optional[str]  # blueprint manifest written by `scripts/build_manifest.py`
+
+    PROCESS_POOL_WORKERS: Optional[int]  # per sanic worker, None to share the cores between workers, 0 to disable
+    PROCESS_POOL_START_METHOD: Optional[Literal["fork", "spawn", "forkserver"]] = "spawn"
+    THREAD_POOL_WORKERS: Optional[int]  # per sanic worker, None to derive from the cores, 0 to disable
+    EXECUTOR_MAX_PENDING: int = 1000  # calls queued or running on a pool before callers wait
+    EXECUTOR_TIMEOUT: Optional[float]  # default per call timeout in seconds
 
     RABBITMQ_HOST: Optional[str]
     RABBITMQ_PORT: Optional[int]
     RABBITMQ_USERNAME: Optional[str]
     RABBITMQ_PASSWORD: Optional[str]
     RABBITMQ_VHOST: Optional[str] = "/"
+    RABBITMQ_PUBLISHER_CHANNELS: int = 4
+    RABBITMQ_PUBLISHER_MAX_IN_FLIGHT: int = 1000  # unconfirmed publishes per worker
+    RABBITMQ_BATCH_SIZE: int = 500
+    RABBITMQ_BATCH_LINGER_MS: float = 5.0
+    RABBITMQ_BATCH_BUFFER: int = 10000  # buffered messages before callers of `send_batched` have to wait
 
     DATABASE_MASTER: PostgresDsn
     DATABASE_READER: Optional[PostgresDsn]
+    DATABASE_READERS: List[PostgresDsn] = []  # more replicas, balanced together with DATABASE_READER
+    DATABASE_READER_STRATEGY: Literal["round_robin", "least_connections"] = "round_robin"
+    DATABASE_STICKY_WINDOW: Optional[float]  # seconds reads stay on master after a write, None for the whole request
+    DATABASE_POOL_SIZE: int = 5  # connections kept open per engine and worker
+    DATABASE_POOL_MAX_OVERFLOW: int = 10  # connections opened beyond DATABASE_POOL_SIZE under load
+    DATABASE_POOL_TIMEOUT: float = 30  # seconds to wait for a free connection
+    DATABASE_POOL_RECYCLE: Optional[int]  # seconds after which a connection is replaced, None to keep it
+    DATABASE_POOL_PRE_PING: bool = False  # test connections when they are checked out
+    DATABASE_POOL_WARMUP: int = 1  # connections each engine opens at start, up to DATABASE_POOL_SIZE
     UPDATE_DATABASE: bool = False
     POPULATE_DATABASE: bool = False
+    QUERY_CACHE_ENABLED: bool = False  # cache the statements with the `query_cache` execution option
+    QUERY_CACHE_TTL: float = 60  # default seconds a result is cached for
+    QUERY_CACHE_MAX_ENTRIES: int = 1024  # per worker
+    QUERY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # per worker
+    QUERY_CACHE_REPLICA_LAG: float = 1.0  # seconds the reads of a table stay on master after its invalidation
 
     REDIS_DSN: Optional[RedisDsn]
+    REDIS_MAX_CONNECTIONS: int = 10
+    REDIS_POOL_TIMEOUT: Optional[float] = 5.0  # seconds to wait for a free connection, None to wait forever
+    REDIS_POOL_WARMUP: int = 1  # connections opened at start, up to REDIS_MAX_CONNECTIONS
+    REDIS_SOCKET_TIMEOUT: Optional[float]
+    REDIS_SOCKET_CONNECT_TIMEOUT: Optional[float]
 
     SENTRY_DSN: Optional[HttpUrl]
 
+    RESPONSE_CACHE_TTL: float = 60  # default seconds a response is cached for
+    RESPONSE_CACHE_LOCAL_TTL: Optional[float]  # bound the staleness of the copies kept by each worker
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024  # per worker
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # per worker
+
+    RATE_LIMIT_RATE: Optional[PositiveFloat]  # requests per second per client over every route, None for no limit
+    RATE_LIMIT_BURST: Optional[PositiveInt]  # requests a client may send at once, defaults to the rate
+    RATE_LIMIT_BATCH: int = 10  # tokens a worker borrows from redis at once
+    RATE_LIMIT_LEASE: float = 1.0  # seconds a worker may hand out the tokens it borrowed
+    SHED_MAX_IN_FLIGHT: Optional[int]  # requests handled at once per worker, None to disable load shedding
+    SHED_MAX_QUEUED: Optional[int]  # requests waiting for a slot per worker, defaults to SHED_MAX_IN_FLIGHT
+    SHED_QUEUE_TIMEOUT: float = 0.5  # seconds a request may wait for a slot before a 503
+    SHED_RETRY_AFTER: float = 1.0  # seconds clients are told to wait after a 503
+
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes under which responses are sent as they are
+    COMPRESSION_TYPES: Optional[List[str]]  # content types compressed, None for the ones of `middleware.compression`
+    COMPRESSION_LEVEL: int = 6
+    COMPRESSION_LEVELS: Dict[str, int] = {}  # content type: level, overrides COMPRESSION_LEVEL
+    COMPRESSION_OFFLOAD_SIZE: Optional[int] = 256 * 1024  # bytes from which bodies are compressed on the thread pool
+    STATICS_DIR: Optional[str] = "statics"  # precompressed by `scripts/precompress.py`, None to not serve it
+    STATICS_URL: str = "/statics"
+    STATICS_MAX_AGE: int = 365 * 24 * 3600  # seconds clients cache the assets for
+    STATICS_MEMORY_MAX: int = 256 * 1024  # bytes up to which an asset is kept in memory, larger ones are streamed
+
+    SHARED_SLOTS: int = 4096  # entries of the cache shared by the workers, 0 to disable `utils.shared`
+    SHARED_SLOT_SIZE: int = 1024  # bytes of the key and value of an entry
+    SHARED_COUNTERS: int = 1024  # counters shared by the workers
+
+    HEALTH_PROBE_TIMEOUT: float = 1.0  # seconds each readiness probe may take
+    HEALTH_CACHE_TTL: float = 1.0  # seconds a readiness result is reused
+    WARMUP_TIMEOUT: float = 10.0  # seconds the pools are given to open their first connections at start
+
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: Optional[str]  # where workers share their metrics, defaults to a temporary directory if WORKER > 1
+    METRICS_SYNC_INTERVAL: float = 5.0  # seconds between two snapshots of a worker
+
+    TASK_CONCURRENCY: int = 10  # tasks running at the same time per queue and worker
+    TASK_QUEUE_SIZE: int = 1000  # tasks waiting per queue and worker
+    TASK_TIMEOUT: Optional[float] = 60  # default seconds a task may run
+    TASK_RETRIES: int = 3  # default retries of a failed task
+    TASK_RETRY_BACKOFF: float = 1.0  # seconds before the first retry, doubled on each retry
+    TASK_RETRY_BACKOFF_MAX: float = 60.0
+    TASK_SHUTDOWN_TIMEOUT: float = 10.0  # seconds queued tasks are given to finish on shutdown
+    TASK_LEASE_TTL: float = 60.0  # seconds the lease of a job run is kept, jobs run on one worker when WORKER > 1
+    TASK_SPILL: bool = False  # publish the tasks a full queue cannot take to rabbitmq
+    TASK_SPILL_QUEUE: Optional[str]  # rabbitmq queue of the spilled tasks, `{NAME}.tasks` by default
+
+    ADMIN_TOKEN: Optional[SecretStr]  # bearer token of the `/admin` endpoints, which are disabled without it
+    PROFILE_MAX_SECONDS: float = 60  # longest profile `/admin/profile` runs
+    SLOW_CALLBACK_THRESHOLD_MS: Optional[float]  # log the event loop steps longer than this from the start
+
+    CONFIG_WATCH: bool = False  # reload the tunables of `config.json` when it changes, see `RELOADABLE`
+    CONFIG_WATCH_INTERVAL: float = 2.0  # seconds between two checks of `config.json`
+
     class Config:
         env_prefix = "APP_"
         config_file = "config.json"
@@ -66,3 +160,65 @@ class Settings(BaseSettings):
                 partial(json_config_settings_source, cls.config_file),
                 file_secret_settings,
             )
+
+
+# fields a running worker picks up when the settings are reloaded, the others need a restart
+RELOADABLE = frozenset(
+    {
+        "EXECUTOR_TIMEOUT",
+        "RABBITMQ_BATCH_SIZE",
+        "RABBITMQ_BATCH_LINGER_MS",
+        "DATABASE_STICKY_WINDOW",
+        "QUERY_CACHE_TTL",
+        "QUERY_CACHE_MAX_ENTRIES",
+        "QUERY_CACHE_MAX_BYTES",
+        "QUERY_CACHE_REPLICA_LAG",
+        "REDIS_POOL_TIMEOUT",
+        "RESPONSE_CACHE_TTL",
+        "RESPONSE_CACHE_LOCAL_TTL",
+        "RESPONSE_CACHE_MAX_ENTRIES",
+        "RESPONSE_CACHE_MAX_BYTES",
+        "RATE_LIMIT_RATE",
+        "RATE_LIMIT_BURST",
+        "SHED_QUEUE_TIMEOUT",
+        "SHED_RETRY_AFTER",
+        "COMPRESSION_ENABLED",
+        "COMPRESSION_MIN_SIZE",
+        "COMPRESSION_TYPES",
+        "COMPRESSION_LEVEL",
+        "COMPRESSION_LEVELS",
+        "COMPRESSION_OFFLOAD_SIZE",
+        "HEALTH_PROBE_TIMEOUT",
+        "HEALTH_CACHE_TTL",
+        "METRICS_SYNC_INTERVAL",
+        "TASK_TIMEOUT",
+        "TASK_RETRIES",
+        "TASK_RETRY_BACKOFF",
+        "TASK_RETRY_BACKOFF_MAX",
+        "TASK_SHUTDOWN_TIMEOUT",
+        "ADMIN_TOKEN",
+        "PROFILE_MAX_SECONDS",
+        "SLOW_CALLBACK_THRESHOLD_MS",
+        "CONFIG_WATCH_INTERVAL",
+    }
+)
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """
+    `get_settings` the settings of the process, read from the environment, `config.json` and the secrets once
+    """
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def set_settings(conf: Optional[Settings]) -> None:
+    """
+    `set_settings` replace the settings returned by `get_settings`, `None` reads them again on next access
+    """
+    global _settings
+    _settings = conf
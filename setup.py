@@ -1,9 +1,19 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from os import cpu_count, getpid
+from pathlib import Path
+from tempfile import gettempdir
+
 from sanic import Request, Sanic
 from sanic.errorpages import RENDERERS_BY_CONFIG, HTMLRenderer
 from sanic.log import logger
 from sanic.response import BaseHTTPResponse, HTTPResponse
 
-from settings import Settings
+from settings import Settings, set_settings
+from utils.context import is_resolved, register_lazy
+from utils.executor import Offloader, __offloaders__
+from utils.reload import ConfigWatcher, on_reload
 from version import __version__
 
 
@@ -44,37 +54,134 @@ def setup_redis(app: Sanic, conf: Settings) -> None:
         return None
     try:
         from redis import asyncio as aioredis
+
+        from utils.redis import InstrumentedConnectionPool
     except ImportError:
         return None
 
     async def before_server_start(app: Sanic) -> None:
         # setup redis if redis_dsn is provided
-        app.ctx.redis = aioredis.ConnectionPool(aioredis.Connection, max_connections=10).from_url(
-            conf.REDIS_DSN.__str__()
+        app.ctx.redis = InstrumentedConnectionPool.from_url(
+            conf.REDIS_DSN.__str__(),
+            max_connections=conf.REDIS_MAX_CONNECTIONS,
+            timeout=conf.REDIS_POOL_TIMEOUT,
+            socket_timeout=conf.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=conf.REDIS_SOCKET_CONNECT_TIMEOUT,
         )
 
     async def after_server_stop(app: Sanic) -> None:
         # close the redis connection pool
-        conn: aioredis.Connection = app.ctx.redis
-        if conn:
-            await conn.disconnect()
-
-    async def get_redis_connection(request: Request) -> None:
-        # get a connection from the pool
-        pool: aioredis.ConnectionPool = request.app.ctx.redis
-        request.ctx.redis = await pool.get_connection(request.id)
-
-    async def release_redis_connection(request: Request, _: BaseHTTPResponse) -> None:
-        # release the connection to the pool
-        conn: aioredis.Connection = request.ctx.redis
-        pool: aioredis.ConnectionPool = app.ctx.redis
-        if conn:
-            await pool.release(conn)
+        pool: InstrumentedConnectionPool = app.ctx.redis
+        if pool:
+            await pool.disconnect()
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        app.ctx.redis.timeout = conf.REDIS_POOL_TIMEOUT
+
+    def get_redis_client(request: Request) -> aioredis.Redis:
+        # connections are checked out of the pool per command or pipeline, not per request
+        return aioredis.Redis(connection_pool=request.app.ctx.redis)
 
     app.register_listener(before_server_start, "before_server_start")
     app.register_listener(after_server_stop, "after_server_stop")
-    app.register_middleware(get_redis_connection, "request")
-    app.register_middleware(release_redis_connection, "response")
+    register_lazy(app, "redis", get_redis_client)
+    on_reload(app, ["REDIS_POOL_TIMEOUT"], reload)
+
+
+def setup_shared(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the cache and counters of `utils.shared`, shared by every worker through memory
+    """
+    if not conf.SHARED_SLOTS:
+        return None
+
+    from utils.shared import SharedStore
+
+    async def main_process_start(app: Sanic) -> None:
+        # created before sanic forks the workers, which inherit the mapping
+        app.ctx.shared = SharedStore(conf.SHARED_SLOTS, conf.SHARED_SLOT_SIZE, conf.SHARED_COUNTERS)
+
+    async def main_process_stop(app: Sanic) -> None:
+        shared: SharedStore | None = getattr(app.ctx, "shared", None)
+        if shared:
+            shared.close()
+
+    app.register_listener(main_process_start, "main_process_start")
+    app.register_listener(main_process_stop, "main_process_stop")
+
+
+def setup_admission(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the rate limits and the load shedding of `middleware.ratelimit`
+
+    the requests are admitted before any handler runs, so rejected ones never open a database session
+    """
+    from middleware.ratelimit import LoadShedder, RateLimiter, admit, release
+
+    async def before_server_start(app: Sanic) -> None:
+        app.ctx.rate_limiter = RateLimiter(
+            getattr(app.ctx, "redis", None),
+            prefix=f"{conf.NAME}:ratelimit:",
+            batch=conf.RATE_LIMIT_BATCH,
+            lease=conf.RATE_LIMIT_LEASE,
+        )
+        app.ctx.load_shedder = None
+        if conf.SHED_MAX_IN_FLIGHT:
+            app.ctx.load_shedder = LoadShedder(
+                conf.SHED_MAX_IN_FLIGHT,
+                max_queued=conf.SHED_MAX_QUEUED,
+                queue_timeout=conf.SHED_QUEUE_TIMEOUT,
+                retry_after=conf.SHED_RETRY_AFTER,
+            )
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        shedder: LoadShedder | None = app.ctx.load_shedder
+        if shedder:
+            shedder.queue_timeout = conf.SHED_QUEUE_TIMEOUT
+            shedder.retry_after = conf.SHED_RETRY_AFTER
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_middleware(admit, "request")
+    app.register_middleware(release, "response")
+    on_reload(app, ["SHED_QUEUE_TIMEOUT", "SHED_RETRY_AFTER"], reload)
+
+
+def setup_compression(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the response compression of `middleware.compression` and the precompressed assets of `STATICS_DIR`
+    """
+    from middleware.compression import Compressor, compress_response
+    from utils.statics import Statics
+
+    statics = None
+    if conf.STATICS_DIR and Path(conf.STATICS_DIR).is_dir():
+        statics = app.ctx.statics = Statics(conf.STATICS_DIR, conf.STATICS_MAX_AGE, conf.STATICS_MEMORY_MAX)
+        app.add_route(
+            statics.serve, f"{conf.STATICS_URL.rstrip('/')}/<path:path>", methods=["GET", "HEAD"], name="statics"
+        )
+
+    def compressor(conf: Settings) -> Compressor | None:
+        if not conf.COMPRESSION_ENABLED:
+            return None
+        return Compressor(
+            min_size=conf.COMPRESSION_MIN_SIZE,
+            types=conf.COMPRESSION_TYPES,
+            level=conf.COMPRESSION_LEVEL,
+            levels=conf.COMPRESSION_LEVELS,
+            offload_size=conf.COMPRESSION_OFFLOAD_SIZE,
+        )
+
+    async def before_server_start(app: Sanic) -> None:
+        app.ctx.compressor = compressor(conf)
+        if statics:
+            statics.scan()
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        app.ctx.compressor = compressor(conf)
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_middleware(compress_response, "response")
+    on_reload(app, [name for name in Settings.__fields__ if name.startswith("COMPRESSION_")], reload)
 
 
 def setup_database(app: Sanic, conf: Settings) -> None:
@@ -91,41 +198,373 @@ def setup_database(app: Sanic, conf: Settings) -> None:
             create_async_engine,
         )
         from sqlalchemy.orm import sessionmaker
+
+        from utils.database import ReaderSelector, RoutingSession, finalize_session
+        from utils.query_cache import QueryCache
     except ImportError:
         return None
 
+    pool = {
+        "pool_size": conf.DATABASE_POOL_SIZE,
+        "max_overflow": conf.DATABASE_POOL_MAX_OVERFLOW,
+        "pool_timeout": conf.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": -1 if conf.DATABASE_POOL_RECYCLE is None else conf.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": conf.DATABASE_POOL_PRE_PING,
+    }
+
     async def before_server_start(app: Sanic) -> None:
         # setup database if database is provided
-        engine = create_async_engine(conf.DATABASE_MASTER)
+        engine = create_async_engine(conf.DATABASE_MASTER, **pool)
         app.ctx.db_engine = engine
+        # setup read replicas if any reader is provided
+        readers = [conf.DATABASE_READER] if conf.DATABASE_READER else []
+        readers.extend(reader for reader in conf.DATABASE_READERS if reader not in readers)
+        app.ctx.db_readers = [create_async_engine(reader, **pool) for reader in readers]
+        # cached results are shared through redis, and invalidated in every worker when a session commits a write
+        app.ctx.query_cache = None
+        if conf.QUERY_CACHE_ENABLED:
+            app.ctx.query_cache = QueryCache(
+                engine.dialect,
+                ttl=conf.QUERY_CACHE_TTL,
+                max_entries=conf.QUERY_CACHE_MAX_ENTRIES,
+                max_bytes=conf.QUERY_CACHE_MAX_BYTES,
+                replica_lag=conf.QUERY_CACHE_REPLICA_LAG,
+                redis=getattr(app.ctx, "redis", None),
+                prefix=f"{conf.NAME}:query:",
+            )
+            app.ctx.query_cache.start()
+        # sessions route reads to the replicas
+        app.ctx.db_sessionmaker = sessionmaker(
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            master=engine,
+            readers=ReaderSelector(app.ctx.db_readers, conf.DATABASE_READER_STRATEGY),
+            sticky_window=conf.DATABASE_STICKY_WINDOW,
+            expire_on_commit=False,
+            info={"query_cache": app.ctx.query_cache} if app.ctx.query_cache else None,
+        )
 
     async def after_server_stop(app: Sanic) -> None:
-        # dispose the database engine
+        # dispose the database engines
+        cache: QueryCache | None = app.ctx.query_cache
+        if cache:
+            await cache.stop()
         engine: AsyncEngine = app.ctx.db_engine
         if engine:
             await engine.dispose()
+        for reader in app.ctx.db_readers:
+            await reader.dispose()
 
-    async def get_session(request: Request) -> None:
-        # get a session from the engine
-        engine: AsyncEngine = app.ctx.db_engine
-        request.ctx.db_session = sessionmaker(engine, AsyncSession, expire_on_commit=False)()
+    def reload(app: Sanic, conf: Settings) -> None:
+        app.ctx.db_sessionmaker.kw["sticky_window"] = conf.DATABASE_STICKY_WINDOW
+        cache: QueryCache | None = app.ctx.query_cache
+        if cache:
+            cache.ttl = conf.QUERY_CACHE_TTL
+            cache.local.max_entries = conf.QUERY_CACHE_MAX_ENTRIES
+            cache.local.max_bytes = conf.QUERY_CACHE_MAX_BYTES
+            cache.replica_lag = conf.QUERY_CACHE_REPLICA_LAG
+
+    def get_session(request: Request) -> AsyncSession:
+        # create the session on first access of `request.ctx.db_session`
+        session: AsyncSession = request.app.ctx.db_sessionmaker()
+        # handlers marked with `ctx_read_only=True` read from the replicas only
+        if request.route and getattr(request.route.ctx, "read_only", False):
+            session.sync_session.info["read_only"] = True
+        return session
 
     async def close_session(request: Request, _: BaseHTTPResponse) -> None:
-        # auto commit and close the session
-        session: AsyncSession = request.ctx.db_session
-        if session:
-            try:
-                await session.commit()
-            except Exception as e:
-                logger.exception(e)
-                await session.rollback()
-            finally:
-                await session.close()
+        # auto commit and close the session, if the handler ever used it and does not stream from it
+        if is_resolved(request.ctx, "db_session") and not getattr(request.ctx, "db_session_held", False):
+            await finalize_session(request.ctx.db_session)
 
     app.register_listener(before_server_start, "before_server_start")
     app.register_listener(after_server_stop, "after_server_stop")
-    app.register_middleware(get_session, "request")
+    register_lazy(app, "db_session", get_session)
     app.register_middleware(close_session, "response")
+    on_reload(
+        app,
+        [
+            "DATABASE_STICKY_WINDOW",
+            "QUERY_CACHE_TTL",
+            "QUERY_CACHE_MAX_ENTRIES",
+            "QUERY_CACHE_MAX_BYTES",
+            "QUERY_CACHE_REPLICA_LAG",
+        ],
+        reload,
+    )
+
+
+def setup_response_cache(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the response cache used by `middleware.cache.cache_response`, shared through redis if it is set up
+    """
+    from middleware.cache import ResponseCache
+
+    async def before_server_start(app: Sanic) -> None:
+        app.ctx.response_cache = ResponseCache(
+            ttl=conf.RESPONSE_CACHE_TTL,
+            max_entries=conf.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=conf.RESPONSE_CACHE_MAX_BYTES,
+            local_ttl=conf.RESPONSE_CACHE_LOCAL_TTL,
+            redis=getattr(app.ctx, "redis", None),
+            prefix=f"{conf.NAME}:response:",
+        )
+        app.ctx.response_cache.start()
+
+    async def after_server_stop(app: Sanic) -> None:
+        cache: ResponseCache = app.ctx.response_cache
+        await cache.stop()
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        cache: ResponseCache = app.ctx.response_cache
+        cache.ttl = conf.RESPONSE_CACHE_TTL
+        cache.local_ttl = conf.RESPONSE_CACHE_LOCAL_TTL
+        cache.local.max_entries = conf.RESPONSE_CACHE_MAX_ENTRIES
+        cache.local.max_bytes = conf.RESPONSE_CACHE_MAX_BYTES
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_listener(after_server_stop, "after_server_stop")
+    on_reload(app, [name for name in Settings.__fields__ if name.startswith("RESPONSE_CACHE_")], reload)
+
+
+def setup_executors(app: Sanic, conf: Settings) -> None:
+    """
+    Setup process and thread pools to run blocking and CPU bound work off the event loop
+    """
+    # every sanic worker has its own pools, share the cores between them
+    cores = max(1, (cpu_count() or 1) // max(1, conf.WORKER))
+    process_workers = cores if conf.PROCESS_POOL_WORKERS is None else conf.PROCESS_POOL_WORKERS
+    thread_workers = min(32, cores + 4) if conf.THREAD_POOL_WORKERS is None else conf.THREAD_POOL_WORKERS
+
+    async def before_server_start(app: Sanic) -> None:
+        # pools are created in each worker, after sanic forked it
+        app.ctx.process_pool = app.ctx.thread_pool = None
+        if process_workers:
+            executor = ProcessPoolExecutor(process_workers, mp_context=get_context(conf.PROCESS_POOL_START_METHOD))
+            app.ctx.process_pool = __offloaders__["process"] = Offloader(
+                executor, conf.EXECUTOR_MAX_PENDING, conf.EXECUTOR_TIMEOUT
+            )
+        if thread_workers:
+            executor = ThreadPoolExecutor(thread_workers, thread_name_prefix=conf.NAME)
+            app.ctx.thread_pool = __offloaders__["thread"] = Offloader(
+                executor, conf.EXECUTOR_MAX_PENDING, conf.EXECUTOR_TIMEOUT
+            )
+
+    async def after_server_stop(app: Sanic) -> None:
+        # wait for the running calls, queued ones are cancelled
+        for kind in ("process", "thread"):
+            offloader = __offloaders__.pop(kind, None)
+            if offloader:
+                offloader.shutdown()
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        for offloader in __offloaders__.values():
+            offloader.timeout = conf.EXECUTOR_TIMEOUT
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_listener(after_server_stop, "after_server_stop")
+    on_reload(app, ["EXECUTOR_TIMEOUT"], reload)
+
+
+def setup_metrics(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the request metrics and the pool collectors served on `/metrics`
+    """
+    if not conf.METRICS_ENABLED:
+        return None
+
+    from middleware.metrics import pool_collector, record_response, start_timer
+    from utils.metrics import REGISTRY
+
+    # every worker writes its snapshot in the directory, the worker serving `/metrics` merges them
+    directory = conf.METRICS_DIR or (str(Path(gettempdir(), f"{conf.NAME}-metrics")) if conf.WORKER > 1 else None)
+    app.ctx.metrics = REGISTRY
+    app.ctx.metrics_dir = directory
+
+    async def main_process_start(app: Sanic) -> None:
+        # drop the snapshots of the workers of a previous run
+        if directory:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            for path in Path(directory).glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    async def sync(app: Sanic) -> None:
+        while True:
+            await asyncio.sleep(app.ctx.settings.METRICS_SYNC_INTERVAL)
+            REGISTRY.write(directory)
+
+    async def after_server_start(app: Sanic) -> None:
+        # the collector of this app is removed when it stops, the registry is shared by the apps of the process
+        app.ctx.metrics_collector = REGISTRY.collector(lambda: pool_collector(app))
+        app.ctx.metrics_sync = None
+        if directory:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            app.ctx.metrics_sync = asyncio.create_task(sync(app))
+
+    async def before_server_stop(app: Sanic) -> None:
+        task: asyncio.Task | None = getattr(app.ctx, "metrics_sync", None)
+        if task:
+            task.cancel()
+
+    async def after_server_stop(app: Sanic) -> None:
+        REGISTRY.remove_collector(getattr(app.ctx, "metrics_collector", None))
+        # the gauges of a stopped worker must not be summed any more
+        if directory:
+            Path(directory, f"{getpid()}.json").unlink(missing_ok=True)
+
+    app.register_listener(main_process_start, "main_process_start")
+    app.register_listener(after_server_start, "after_server_start")
+    app.register_listener(before_server_stop, "before_server_stop")
+    app.register_listener(after_server_stop, "after_server_stop")
+    app.register_middleware(start_timer, "request")
+    app.register_middleware(record_response, "response")
+
+
+def setup_profiler(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the slow callback detector if a threshold is provided, it can also be toggled on `/admin/slow-callbacks`
+    """
+    from utils.profiler import slow_callbacks
+
+    async def before_server_start(app: Sanic) -> None:
+        if conf.SLOW_CALLBACK_THRESHOLD_MS:
+            slow_callbacks.enable(conf.SLOW_CALLBACK_THRESHOLD_MS / 1000)
+
+    async def after_server_stop(app: Sanic) -> None:
+        slow_callbacks.disable()
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        if conf.SLOW_CALLBACK_THRESHOLD_MS:
+            slow_callbacks.enable(conf.SLOW_CALLBACK_THRESHOLD_MS / 1000)
+        else:
+            slow_callbacks.disable()
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_listener(after_server_stop, "after_server_stop")
+    on_reload(app, ["SLOW_CALLBACK_THRESHOLD_MS"], reload)
+
+
+def setup_tasks(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the task queues and the job scheduler of `tasks`
+
+    queues drain on shutdown, before the connections are closed
+    """
+    from tasks import Scheduler, TaskQueue
+    from tasks.scheduler import __jobs__, __queue_options__, __queues__
+
+    spill = False
+    if conf.TASK_SPILL:
+        try:
+            from rabbitmq.consumers import __running__
+            from tasks.spill import TaskConsumer, rabbitmq_spill
+        except ImportError:
+            logger.warning("TASK_SPILL is set but aio-pika is not installed")
+        else:
+            spill = True
+
+    async def before_server_start(app: Sanic) -> None:
+        on_full = None
+        app.ctx.task_consumer = None
+        if spill and getattr(app.ctx, "rabbitmq", None):
+            on_full = rabbitmq_spill(app.ctx.rabbitmq, conf.TASK_SPILL_QUEUE or f"{conf.NAME}.tasks")
+        for name, options in {"default": {}, **__queue_options__}.items():
+            queue = TaskQueue(
+                name,
+                **{
+                    "concurrency": conf.TASK_CONCURRENCY,
+                    "max_size": conf.TASK_QUEUE_SIZE,
+                    "timeout": conf.TASK_TIMEOUT,
+                    "retries": conf.TASK_RETRIES,
+                    "backoff": conf.TASK_RETRY_BACKOFF,
+                    "max_backoff": conf.TASK_RETRY_BACKOFF_MAX,
+                    "spill": on_full,
+                    **options,
+                },
+            )
+            queue.start()
+            __queues__[name] = queue
+        if on_full is not None:
+            # the spilled tasks are consumed once there are queues to run them
+            app.ctx.task_consumer = TaskConsumer(conf)
+            await app.ctx.task_consumer.register(app.ctx.rabbitmq)
+            __running__.add(app.ctx.task_consumer)
+        # jobs run on one worker only, workers agree through redis
+        redis = getattr(app.ctx, "redis", None) if conf.WORKER > 1 else None
+        if conf.WORKER > 1 and redis is None and any(job.lease for job in __jobs__):
+            logger.warning("jobs run on every worker, set REDIS_DSN to run them on one worker only")
+        app.ctx.scheduler = Scheduler(__jobs__, redis, f"{conf.NAME}:tasks:lease:", conf.TASK_LEASE_TTL)
+        app.ctx.scheduler.start()
+
+    async def before_server_stop(app: Sanic) -> None:
+        # the spilled tasks being run are acked once done, the others stay in rabbitmq for the other workers
+        consumer: TaskConsumer | None = app.ctx.task_consumer
+        if consumer:
+            await consumer.cancel()
+
+    async def after_server_stop(app: Sanic) -> None:
+        # stop queuing jobs, then let the queued tasks finish
+        await app.ctx.scheduler.stop()
+        queues = list(__queues__.values())
+        __queues__.clear()
+        timeout = app.ctx.settings.TASK_SHUTDOWN_TIMEOUT
+        await asyncio.gather(*(queue.close(timeout) for queue in queues))
+
+    def reload(app: Sanic, conf: Settings) -> None:
+        # options given to `define_queue` are kept
+        defaults = {
+            "timeout": conf.TASK_TIMEOUT,
+            "retries": conf.TASK_RETRIES,
+            "backoff": conf.TASK_RETRY_BACKOFF,
+            "max_backoff": conf.TASK_RETRY_BACKOFF_MAX,
+        }
+        for name, queue in __queues__.items():
+            for option, value in defaults.items():
+                if option not in __queue_options__.get(name, {}):
+                    setattr(queue, option, value)
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_listener(before_server_stop, "before_server_stop")
+    app.register_listener(after_server_stop, "after_server_stop")
+    on_reload(app, ["TASK_TIMEOUT", "TASK_RETRIES", "TASK_RETRY_BACKOFF", "TASK_RETRY_BACKOFF_MAX"], reload)
+
+
+def setup_warmup(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the warmup of `utils.warmup`, the worker reports ready on `/ready` once it is done
+    """
+    from utils.warmup import warmup
+
+    async def before_server_start(app: Sanic) -> None:
+        # in the background, the worker starts serving its liveness endpoint meanwhile
+        app.ctx.warmup = asyncio.create_task(warmup(app), name="warmup")
+
+    async def before_server_stop(app: Sanic) -> None:
+        task: asyncio.Task | None = app.ctx.warmup
+        if task and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    app.register_listener(before_server_start, "before_server_start")
+    app.register_listener(before_server_stop, "before_server_stop")
+
+
+def setup_config_watch(app: Sanic, conf: Settings) -> None:
+    """
+    Setup the reload of `config.json` in every worker when it changes, if `CONFIG_WATCH` is set
+    """
+    if not conf.CONFIG_WATCH:
+        return None
+
+    async def after_server_start(app: Sanic) -> None:
+        app.ctx.config_watcher = ConfigWatcher(app, conf.Config.config_file)
+        app.ctx.config_watcher.start()
+
+    async def before_server_stop(app: Sanic) -> None:
+        await app.ctx.config_watcher.stop()
+
+    app.register_listener(after_server_start, "after_server_start")
+    app.register_listener(before_server_stop, "before_server_stop")
 
 
 def global_exception_handler(request: Request, exception: Exception) -> HTTPResponse:
@@ -145,18 +584,46 @@ def setup(app: Sanic, conf: Settings) -> None:
     Setup all extensions
     """
 
+    app.ctx.settings = conf
+    set_settings(conf)
+
     setup_sentry(conf)
 
+    setup_config_watch(app, conf)
+
+    setup_metrics(app, conf)
+
+    setup_profiler(app, conf)
+
     setup_redis(app, conf)
 
+    setup_shared(app, conf)
+
+    # before the database, so its listeners run once redis is set up and its middleware before the sessions
+    setup_admission(app, conf)
+
+    # response middleware run in reverse order, the body is compressed once the session is closed
+    # and before the admission slot is released
+    setup_compression(app, conf)
+
     setup_database(app, conf)
 
+    setup_response_cache(app, conf)
+
+    setup_executors(app, conf)
+
     app.error_handler.add(Exception, global_exception_handler)
 
     try:
         from aio_pika.abc import AbstractConnection
 
         from rabbitmq.listener import setup_rabbitmq
+        from rabbitmq.publisher import (
+            BatchPublisher,
+            Publisher,
+            get_batch_publisher,
+            get_publisher,
+        )
     except ImportError:
         pass
     else:
@@ -164,12 +631,46 @@ def setup(app: Sanic, conf: Settings) -> None:
         async def before_server_start(app: Sanic) -> None:
             # setup rabbitmq if host, port and etc. are provided
             app.ctx.rabbitmq = await setup_rabbitmq(conf, loop=app.loop)
+            # messages sent over the connection share the publisher's channels
+            app.ctx.rabbitmq_publisher = None
+            app.ctx.rabbitmq_batch_publisher = None
+            if app.ctx.rabbitmq:
+                app.ctx.rabbitmq_publisher = get_publisher(
+                    app.ctx.rabbitmq,
+                    channels=conf.RABBITMQ_PUBLISHER_CHANNELS,
+                    max_in_flight=conf.RABBITMQ_PUBLISHER_MAX_IN_FLIGHT,
+                )
+                app.ctx.rabbitmq_batch_publisher = get_batch_publisher(
+                    app.ctx.rabbitmq,
+                    batch_size=conf.RABBITMQ_BATCH_SIZE,
+                    linger=conf.RABBITMQ_BATCH_LINGER_MS / 1000,
+                    max_buffered=conf.RABBITMQ_BATCH_BUFFER,
+                )
 
         async def after_server_stop(app: Sanic) -> None:
-            # close the rabbitmq connection
+            # flush the buffered messages, close the publisher channels and the rabbitmq connection
+            batcher: BatchPublisher | None = app.ctx.rabbitmq_batch_publisher
+            if batcher:
+                await batcher.close()
+            publisher: Publisher | None = app.ctx.rabbitmq_publisher
+            if publisher:
+                await publisher.close()
             conn: AbstractConnection | None = app.ctx.rabbitmq
             if conn:
                 await conn.close()
 
+        def reload(app: Sanic, conf: Settings) -> None:
+            batcher: BatchPublisher | None = app.ctx.rabbitmq_batch_publisher
+            if batcher:
+                batcher.batch_size = conf.RABBITMQ_BATCH_SIZE
+                batcher.linger = conf.RABBITMQ_BATCH_LINGER_MS / 1000
+
         app.register_listener(before_server_start, "before_server_start")
         app.register_listener(after_server_stop, "after_server_stop")
+        on_reload(app, ["RABBITMQ_BATCH_SIZE", "RABBITMQ_BATCH_LINGER_MS"], reload)
+
+    # last, so tasks start once every connection is open, and drain before they are closed
+    setup_tasks(app, conf)
+
+    # once every pool is created
+    setup_warmup(app, conf)
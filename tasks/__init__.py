@@ -0,0 +1,28 @@
+from .cron import Cron
+from .queue import Task, TaskQueue, TaskQueueClosed, TaskQueueFull
+from .scheduler import (
+    Job,
+    Scheduler,
+    TaskFunction,
+    cron,
+    define_queue,
+    get_queue,
+    periodic,
+    task,
+)
+
+__all__ = [
+    "Cron",
+    "Job",
+    "Scheduler",
+    "Task",
+    "TaskFunction",
+    "TaskQueue",
+    "TaskQueueClosed",
+    "TaskQueueFull",
+    "cron",
+    "define_queue",
+    "get_queue",
+    "periodic",
+    "task",
+]
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+
+# minute, hour, day of month, month, day of week
+BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _field(expr: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_expr = part.split("/", 1)
+            step = int(step_expr)
+            if step < 1:
+                raise ValueError(f"invalid step in {expr!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(bound) for bound in part.split("-", 1))
+        else:
+            start = int(part)
+            # `5/15` means from 5 to the end, every 15
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"{expr!r} is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class Cron:
+    """
+    `Cron` a five fields cron expression, `minute hour day-of-month month day-of-week`
+
+    fields accept `*`, numbers, ranges, lists and steps, like `*/15 9-17 * * 1-5`.
+    As with cron, a day matches either restricted day field when both are restricted.
+    """
+
+    def __init__(self, expr: str) -> None:
+        self.expr = expr
+        fields = ALIASES.get(expr, expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression {expr!r} should have 5 fields")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _field(field, *bounds) for field, bounds in zip(fields, BOUNDS)
+        )
+        # both 0 and 7 are sunday, python counts from monday
+        self.weekdays = frozenset((day - 1) % 7 for day in weekdays)
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def __repr__(self) -> str:
+        return f"Cron({self.expr!r})"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = moment.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next(self, after: Optional[datetime] = None) -> datetime:
+        """
+        `next` the first matching minute strictly after `after`, now in UTC by default
+        """
+        moment = (after or datetime.now(timezone.utc)).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # a matching day exists within 4 years, `0 0 29 2 *` included
+        limit = moment + timedelta(days=366 * 4 + 1)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron expression {self.expr!r} never matches")
@@ -0,0 +1,219 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from sanic.log import logger
+
+TaskFunc = Callable[..., Awaitable[Any]]
+# `spill(task)` hands a task over when the queue is full, returns False if it could not
+Spill = Callable[["Task"], Awaitable[bool]]
+
+
+class TaskQueueFull(Exception):
+    pass
+
+
+class TaskQueueClosed(Exception):
+    pass
+
+
+@dataclass
+class Task:
+    func: TaskFunc
+    args: tuple[Any, ...] = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    name: str = ""
+    timeout: Optional[float] = None
+    retries: int = 0
+    attempt: int = 0
+    future: "Optional[asyncio.Future[Any]]" = None
+
+    def __post_init__(self) -> None:
+        self.name = self.name or f"{self.func.__module__}.{self.func.__qualname__}"
+
+
+def _retrieve(future: "asyncio.Future[Any]") -> None:
+    # failures are logged by the queue, callers are not required to await the future
+    if not future.cancelled():
+        future.exception()
+
+
+class TaskQueue:
+    """
+    `TaskQueue` run async tasks in the background, at most `concurrency` at a time
+
+    at most `max_size` tasks wait in the queue. A task is cancelled after `timeout` seconds and retried
+    `retries` times, waiting `backoff * 2 ** attempt` seconds (at most `max_backoff`) between attempts.
+    When the queue is full, tasks are handed to `spill` if provided.
+    """
+
+    def __init__(
+        self,
+        name: str = "default",
+        concurrency: int = 10,
+        max_size: int = 1000,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        spill: Optional[Spill] = None,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spill = spill
+        self._queue: asyncio.Queue[Task] = asyncio.Queue(max_size)
+        self._workers: list[asyncio.Task[None]] = []
+        self._retrying: dict[asyncio.Task[None], Task] = {}
+        self.closed = False
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.retried = 0
+        self.spilled = 0
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work(), name=f"{self.name}-worker-{index}")
+                for index in range(self.concurrency)
+            ]
+
+    def task(
+        self,
+        func: TaskFunc,
+        args: tuple[Any, ...] = (),
+        kwargs: Optional[dict[str, Any]] = None,
+        *,
+        name: str = "",
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> Task:
+        """
+        `task` a task of `func(*args, **kwargs)`, with the queue `timeout` and `retries` unless overridden
+        """
+        task = Task(
+            func,
+            args,
+            kwargs or {},
+            name=name,
+            timeout=self.timeout if timeout is None else timeout,
+            retries=self.retries if retries is None else retries,
+        )
+        task.future = asyncio.get_running_loop().create_future()
+        task.future.add_done_callback(_retrieve)
+        return task
+
+    async def enqueue(self, task: Task, wait: bool = False) -> "asyncio.Future[Any]":
+        """
+        `enqueue` queue `task` and return the future of its result, without waiting for it to run
+
+        when the queue is full, wait for room if `wait` is set, otherwise the task is spilled or `TaskQueueFull`
+        is raised. The future of a spilled task resolves to `None` once it is handed over.
+        """
+        if self.closed:
+            raise TaskQueueClosed(f"task queue {self.name} is closed")
+        assert task.future is not None
+        if wait:
+            await self._queue.put(task)
+            if self.closed:
+                # room was made by `close` dropping the tasks left, nothing runs this one any more
+                task.future.cancel()
+                raise TaskQueueClosed(f"task queue {self.name} is closed")
+            return task.future
+        try:
+            self._queue.put_nowait(task)
+        except asyncio.QueueFull:
+            if self.spill is None or not await self.spill(task):
+                raise TaskQueueFull(f"task queue {self.name} is full")
+            self.spilled += 1
+            task.future.set_result(None)
+        return task.future
+
+    async def submit(self, func: TaskFunc, *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        """
+        `submit` queue `func(*args, **kwargs)`, see `enqueue`
+        """
+        return await self.enqueue(self.task(func, args, kwargs))
+
+    async def put(self, func: TaskFunc, *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        """
+        `put` queue `func(*args, **kwargs)`, waiting for room in the queue
+        """
+        return await self.enqueue(self.task(func, args, kwargs), wait=True)
+
+    async def _work(self) -> None:
+        while True:
+            task = await self._queue.get()
+            self.running += 1
+            try:
+                await self._run(task)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    async def _run(self, task: Task) -> None:
+        assert task.future is not None
+        if task.future.done():
+            return
+        try:
+            result = await asyncio.wait_for(task.func(*task.args, **task.kwargs), task.timeout)
+        except asyncio.CancelledError:
+            task.future.cancel()
+            raise
+        except Exception as e:
+            if task.attempt < task.retries and not self.closed:
+                delay = min(self.backoff * 2**task.attempt, self.max_backoff)
+                task.attempt += 1
+                self.retried += 1
+                logger.warning(f"task {task.name} failed with {e!r}, retry {task.attempt} in {delay:.1f}s")
+                retry = asyncio.create_task(self._retry(task, delay))
+                self._retrying[retry] = task
+                retry.add_done_callback(self._retrying.pop)
+                return
+            self.failed += 1
+            logger.error(f"task {task.name} failed after {task.attempt + 1} attempts", exc_info=e)
+            task.future.set_exception(e)
+        else:
+            self.done += 1
+            task.future.set_result(result)
+
+    async def _retry(self, task: Task, delay: float) -> None:
+        # retries wait outside of the workers, so they do not hold a concurrency slot
+        await asyncio.sleep(delay)
+        await self._queue.put(task)
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """
+        `close` stop accepting tasks, wait at most `timeout` seconds for the queued ones, then cancel the rest
+        """
+        self.closed = True
+        if self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"task queue {self.name} closed with {self._queue.qsize()} tasks left")
+        left = [*self._retrying.values()]
+        for pending in (*self._workers, *self._retrying):
+            pending.cancel()
+        await asyncio.gather(*self._workers, *self._retrying, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            left.append(self._queue.get_nowait())
+        for task in left:
+            if task.future is not None:
+                task.future.cancel()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "running": self.running,
+            "retrying": len(self._retrying),
+            "done": self.done,
+            "failed": self.failed,
+            "retried": self.retried,
+            "spilled": self.spilled,
+        }
@@ -0,0 +1,253 @@
+try:
+    from redis.asyncio import ConnectionPool, Redis
+except ImportError:
+    pass
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import update_wrapper
+from math import floor
+from typing import Any, Callable, Generic, Optional, TypeVar
+from uuid import uuid4
+
+from sanic.log import logger
+
+from .cron import Cron
+from .queue import TaskFunc, TaskQueue, TaskQueueFull
+
+Result = TypeVar("Result")
+
+__queues__: dict[str, TaskQueue] = {}
+# options of the queues other than `default`, see `define_queue`
+__queue_options__: dict[str, dict[str, Any]] = {}
+__tasks__: dict[str, "TaskFunction[Any]"] = {}
+__jobs__: list["Job"] = []
+
+
+def define_queue(name: str, **options: Any) -> None:
+    """
+    `define_queue` declare a task queue created in every worker, `options` are the ones of `TaskQueue`
+
+    options not given default to the `TASK_*` settings
+    """
+    __queue_options__[name] = options
+
+
+def get_queue(name: str = "default") -> TaskQueue:
+    """
+    `get_queue` the task queue of this worker named `name`
+    """
+    queue = __queues__.get(name)
+    if queue is None:
+        raise RuntimeError(f"task queue {name} is not set up, see `setup.setup_tasks` and `define_queue`")
+    return queue
+
+
+class TaskFunction(Generic[Result]):
+    """
+    `TaskFunction` an async function which can also be deferred to a task queue
+
+    calling it runs it right away, `defer` queues it and returns the future of its result
+    """
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        name: str,
+        queue: str,
+        timeout: Optional[float],
+        retries: Optional[int],
+    ) -> None:
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.timeout = timeout
+        self.retries = retries
+        update_wrapper(self, func)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.func(*args, **kwargs)
+
+    async def defer(self, *args: Any, **kwargs: Any) -> "asyncio.Future[Result]":
+        """
+        `defer` queue the call, raise `TaskQueueFull` if the queue is full and cannot spill
+        """
+        queue = get_queue(self.queue)
+        task = queue.task(self.func, args, kwargs, name=self.name, timeout=self.timeout, retries=self.retries)
+        return await queue.enqueue(task)
+
+    async def defer_wait(self, *args: Any, **kwargs: Any) -> "asyncio.Future[Result]":
+        """
+        `defer_wait` queue the call, waiting for room in the queue
+        """
+        queue = get_queue(self.queue)
+        task = queue.task(self.func, args, kwargs, name=self.name, timeout=self.timeout, retries=self.retries)
+        return await queue.enqueue(task, wait=True)
+
+
+def task(
+    name: Optional[str] = None,
+    *,
+    queue: str = "default",
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+) -> Callable[[Callable[..., Any]], TaskFunction[Any]]:
+    """
+    `task` register an async function as a task, run in the background with `defer`
+
+    registered tasks can be spilled to rabbitmq, their arguments must then be JSON serializable
+
+    ```python
+    @task(retries=5)
+    async def send_welcome_email(user_id: int) -> None:
+        ...
+
+    await send_welcome_email.defer(user.id)
+    ```
+    """
+
+    def decorator(func: Callable[..., Any]) -> TaskFunction[Any]:
+        definition: TaskFunction[Any] = TaskFunction(
+            func, name or f"{func.__module__}.{func.__qualname__}", queue, timeout, retries
+        )
+        __tasks__[definition.name] = definition
+        return definition
+
+    return decorator
+
+
+def _every(seconds: float) -> Callable[[datetime], datetime]:
+    # ticks are aligned on the epoch, so every worker computes the same ones
+    def next_run(after: datetime) -> datetime:
+        return datetime.fromtimestamp((floor(after.timestamp() / seconds) + 1) * seconds, timezone.utc)
+
+    return next_run
+
+
+@dataclass
+class Job:
+    name: str
+    func: TaskFunc
+    next_run: Callable[[datetime], datetime]
+    queue: str = "default"
+    lease: bool = True
+    timeout: Optional[float] = None
+    retries: Optional[int] = 0
+
+
+def _job(
+    next_run: Callable[[datetime], datetime],
+    name: Optional[str],
+    queue: str,
+    lease: bool,
+    timeout: Optional[float],
+    retries: Optional[int],
+) -> Callable[[TaskFunc], TaskFunc]:
+    def decorator(func: TaskFunc) -> TaskFunc:
+        __jobs__.append(
+            Job(name or f"{func.__module__}.{func.__qualname__}", func, next_run, queue, lease, timeout, retries)
+        )
+        return func
+
+    return decorator
+
+
+def periodic(
+    seconds: float,
+    *,
+    name: Optional[str] = None,
+    queue: str = "default",
+    lease: bool = True,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = 0,
+) -> Callable[[TaskFunc], TaskFunc]:
+    """
+    `periodic` run an async function without arguments every `seconds`
+
+    with `lease`, each run happens on one worker only, see `Scheduler`
+    """
+    if seconds <= 0:
+        raise ValueError("periodic jobs need a positive interval")
+    return _job(_every(seconds), name, queue, lease, timeout, retries)
+
+
+def cron(
+    expr: str,
+    *,
+    name: Optional[str] = None,
+    queue: str = "default",
+    lease: bool = True,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = 0,
+) -> Callable[[TaskFunc], TaskFunc]:
+    """
+    `cron` run an async function without arguments on a cron schedule, in UTC
+
+    ```python
+    @cron("0 3 * * *")
+    async def purge_sessions() -> None:
+        ...
+    ```
+    """
+    return _job(Cron(expr).next, name, queue, lease, timeout, retries)
+
+
+class Scheduler:
+    """
+    `Scheduler` queue the jobs when they are due
+
+    with a redis pool, a job with `lease` runs on the first worker taking the lease of its run,
+    the lease key is made of the job name and the run time, so workers agree on it without releasing it
+    """
+
+    def __init__(
+        self,
+        jobs: list[Job],
+        redis: Optional["ConnectionPool"] = None,
+        prefix: str = "tasks:lease:",
+        lease_ttl: float = 60,
+    ) -> None:
+        self.jobs = jobs
+        self.redis = Redis(connection_pool=redis) if redis else None
+        self.prefix = prefix
+        self.lease_ttl = lease_ttl
+        self.token = uuid4().hex
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._loop(job), name=f"job-{job.name}") for job in self.jobs]
+
+    async def stop(self) -> None:
+        for pending in self._tasks:
+            pending.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def acquire(self, job: Job, run: datetime) -> bool:
+        """
+        `acquire` the lease of a run of `job`, always granted without redis
+        """
+        if not job.lease or self.redis is None:
+            return True
+        key = f"{self.prefix}{job.name}:{run.timestamp():.3f}"
+        try:
+            return bool(await self.redis.set(key, self.token, nx=True, px=int(self.lease_ttl * 1000)))
+        except Exception as e:
+            # without the lease the run could happen twice, skip it
+            logger.warning(f"job {job.name} skipped, lease unavailable: {e!r}")
+            return False
+
+    async def _loop(self, job: Job) -> None:
+        after = datetime.now(timezone.utc)
+        while True:
+            run = job.next_run(after)
+            await asyncio.sleep(max(0.0, (run - datetime.now(timezone.utc)).total_seconds()))
+            # the timer may fire a bit early, and runs missed while the loop was blocked are skipped
+            after = max(run, datetime.now(timezone.utc))
+            if not await self.acquire(job, run):
+                continue
+            try:
+                queue = get_queue(job.queue)
+                await queue.enqueue(queue.task(job.func, name=job.name, timeout=job.timeout, retries=job.retries))
+            except (RuntimeError, TaskQueueFull) as e:
+                logger.error(f"job {job.name} not queued: {e}")
@@ -0,0 +1,105 @@
+try:
+    from aio_pika import DeliveryMode, Message
+    from aio_pika.abc import AbstractConnection, AbstractIncomingMessage
+except ImportError:
+    pass
+else:
+    import asyncio
+    from dataclasses import dataclass
+    from typing import Any
+
+    try:
+        from orjson import dumps, loads
+    except ImportError:
+        from json import dumps as json_dumps
+        from json import loads
+
+        def dumps(__obj: Any) -> bytes:  # type: ignore[misc]
+            return json_dumps(__obj).encode("utf-8")
+
+    from sanic.log import logger
+
+    from rabbitmq.consumers import AbstractConsumer, ConsumerSetting
+    from rabbitmq.publisher import get_publisher
+    from settings import Settings
+
+    from .queue import Spill, Task, TaskQueueClosed
+    from .scheduler import __tasks__, get_queue
+
+    def rabbitmq_spill(connection: AbstractConnection, queue_name: str) -> Spill:
+        """
+        `rabbitmq_spill` publish the tasks a full queue cannot take to the rabbitmq queue `queue_name`
+
+        only tasks registered with `task` and JSON serializable arguments can be spilled,
+        they are run by the `TaskConsumer` of any worker
+        """
+
+        async def spill(task: Task) -> bool:
+            if task.name not in __tasks__:
+                return False
+            try:
+                body = dumps({"task": task.name, "args": task.args, "kwargs": task.kwargs})
+            except TypeError:
+                return False
+            message = Message(body, content_type="application/json", delivery_mode=DeliveryMode.PERSISTENT)
+            try:
+                await get_publisher(connection).publish(message, queue_name)
+            except Exception as e:
+                logger.warning(f"task {task.name} not spilled: {e!r}")
+                return False
+            return True
+
+        return spill
+
+    @dataclass
+    class TaskConsumerSetting(ConsumerSetting):
+        channel: int = 1000  # clear of the channel numbers of the other consumers
+        queue_name: str = ""
+        exchange_name: str = ""  # the default exchange routes to the queue by its name
+        routing_key: str = ""
+        requeue: bool = False  # tasks which ran have already been retried by the queue
+
+    class TaskConsumer(AbstractConsumer):
+        """
+        `TaskConsumer` run the spilled tasks on the local task queues
+
+        tasks wait for room in their queue, and are acked once they are done. Tasks which did not run,
+        as their queue is not set up or was closed first, are requeued for another worker.
+
+        it is started by `setup.setup_tasks` once the queues are set up, and cancelled before they drain
+        """
+
+        name = "tasks"
+        settings = TaskConsumerSetting()
+
+        def __init__(self, conf: Settings):
+            super().__init__(conf)
+            self.settings.queue_name = self.settings.queue_name or conf.TASK_SPILL_QUEUE or f"{conf.NAME}.tasks"
+
+        async def on_message(self, message: AbstractIncomingMessage) -> None:
+            payload = loads(message.body)
+            definition = __tasks__.get(payload["task"])
+            if definition is None:
+                raise LookupError(f"task {payload['task']} is not registered")
+            try:
+                queue = get_queue(definition.queue)
+                task = queue.task(
+                    definition.func,
+                    tuple(payload["args"]),
+                    payload["kwargs"],
+                    name=definition.name,
+                    timeout=definition.timeout,
+                    retries=definition.retries,
+                )
+                future = await queue.enqueue(task, wait=True)
+                # the future is cancelled when the queue is closed before the task is done
+                await asyncio.wait([future])
+            except (RuntimeError, TaskQueueClosed) as e:
+                logger.warning(f"task {definition.name} requeued: {e!r}")
+                await message.nack(requeue=True)
+                return
+            if future.cancelled():
+                logger.warning(f"task {definition.name} requeued: task queue {queue.name} is closed")
+                await message.nack(requeue=True)
+                return
+            future.result()
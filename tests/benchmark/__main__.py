@@ -0,0 +1,146 @@
+"""
+Benchmark the request path of `server.app`
+
+    python -m tests.benchmark --workers 2 --concurrency 64 --duration 10 --output bench.json
+    python -m tests.benchmark --compare bench.json --output bench-new.json
+
+the server runs in a child process with the stand-ins of `tests.benchmark.standins`,
+so the load generator does not share its event loop or GIL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from multiprocessing.process import BaseProcess
+from typing import Any, Optional
+
+import httpx
+
+from tests.benchmark.load import run_load
+from tests.benchmark.server import serve
+from tests.benchmark.standins import fakeredis_available, sqlite_available
+
+SCENARIOS = {
+    "health": "/",
+    "db": "/bench/db",
+    "redis": "/bench/redis",
+    "publish": "/bench/publish",
+}
+
+
+async def wait_ready(base: str, server: BaseProcess, timeout: float = 30) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(base + "/")).is_success:
+                    return
+            except httpx.HTTPError:
+                pass
+            if not server.is_alive():
+                raise RuntimeError(f"server exited with code {server.exitcode}")
+            if loop.time() > deadline:
+                raise TimeoutError(f"server did not start within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+def available(args: argparse.Namespace) -> list[str]:
+    scenarios = []
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+        if name == "db" and not (args.database or sqlite_available()):
+            print("skip db: install aiosqlite or pass --database", file=sys.stderr)
+            continue
+        if name == "redis" and not (args.redis or fakeredis_available()):
+            print("skip redis: install fakeredis or pass --redis", file=sys.stderr)
+            continue
+        scenarios.append(name)
+    return scenarios
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> None:
+    print(f"\ncompared with {previous['meta'].get('commit')}")
+    for name, summary in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("rps", "p50_ms", "p99_ms"):
+            delta = (summary[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            changes.append(f"{key} {before[key]} -> {summary[key]} ({delta:+.1f}%)")
+        print(f"{name:>8}  " + "  ".join(changes))
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    scenarios = available(args)
+    base = f"http://127.0.0.1:{args.port}"
+    server = get_context("spawn").Process(
+        target=serve, args=(args.port, args.workers, args.database, args.redis, args.amqp_latency_ms / 1000)
+    )
+    server.start()
+    results: dict[str, Any] = {}
+    try:
+        await wait_ready(base, server)
+        for name in scenarios:
+            summary = await run_load(base + SCENARIOS[name], args.concurrency, args.duration, args.warmup)
+            results[name] = summary.dict()
+            print(
+                f"{name:>8}  {summary.rps:>9.1f} req/s  p50 {summary.p50_ms:.2f}ms  p95 {summary.p95_ms:.2f}ms  "
+                f"p99 {summary.p99_ms:.2f}ms  errors {summary.errors}"
+            )
+    finally:
+        server.terminate()
+        server.join(10)
+    return {
+        "meta": {
+            "commit": commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        },
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark", description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before measuring")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--database", help="postgres DSN to benchmark instead of in memory sqlite")
+    parser.add_argument("--redis", help="redis DSN to benchmark instead of fakeredis")
+    parser.add_argument("--amqp-latency-ms", type=float, default=1.0, help="confirm latency of the fake broker")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
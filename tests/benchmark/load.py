@@ -0,0 +1,103 @@
+import asyncio
+from dataclasses import asdict, dataclass, field
+from math import ceil
+from time import perf_counter
+from typing import Any, Optional
+
+import httpx
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+
+@dataclass
+class Summary:
+    requests: int
+    errors: int
+    rps: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+    def dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """
+    `percentile` nearest rank percentile of sorted values
+    """
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered), max(1, ceil(q / 100 * len(ordered)))) - 1]
+
+
+def summarize(result: Result) -> Summary:
+    ordered = sorted(result.latencies)
+    count = len(ordered)
+    ms = 1000
+    return Summary(
+        requests=count,
+        errors=result.errors,
+        rps=round(count / result.elapsed, 1) if result.elapsed else 0.0,
+        mean_ms=round(sum(ordered) / count * ms, 3) if count else 0.0,
+        p50_ms=round(percentile(ordered, 50) * ms, 3),
+        p95_ms=round(percentile(ordered, 95) * ms, 3),
+        p99_ms=round(percentile(ordered, 99) * ms, 3),
+        max_ms=round(ordered[-1] * ms, 3) if count else 0.0,
+    )
+
+
+async def run_load(
+    url: str,
+    concurrency: int = 32,
+    duration: float = 10,
+    warmup: float = 1,
+    method: str = "GET",
+    client: Optional[httpx.AsyncClient] = None,
+) -> Summary:
+    """
+    `run_load` send requests to `url` from `concurrency` connections for `duration` seconds
+
+    requests sent during the `warmup` seconds are not measured. Responses other than 2xx count as errors.
+    """
+    own_client = client is None
+    client = client or httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency), timeout=30
+    )
+    result = Result()
+    loop = asyncio.get_running_loop()
+    start = loop.time() + warmup
+    deadline = start + duration
+
+    async def user() -> None:
+        while True:
+            sent = perf_counter()
+            try:
+                response = await client.request(method, url)  # type: ignore[union-attr]
+                ok = response.is_success
+            except httpx.HTTPError:
+                ok = False
+            now = loop.time()
+            if now >= deadline:
+                return
+            if now < start:
+                continue
+            if ok:
+                result.latencies.append(perf_counter() - sent)
+            else:
+                result.errors += 1
+
+    try:
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    finally:
+        if own_client:
+            await client.aclose()
+    result.elapsed = duration
+    return summarize(result)
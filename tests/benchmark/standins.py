@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any, Optional
+
+from sanic import Blueprint, HTTPResponse, Request, Sanic, json
+from sqlalchemy import text
+
+from utils.context import register_lazy
+
+BenchBP = Blueprint("bench", url_prefix="/bench")
+
+
+@BenchBP.get("/db")
+async def bench_db(request: Request) -> HTTPResponse:
+    result = await request.ctx.db_session.execute(text("SELECT 1"))
+    return json({"value": result.scalar()})
+
+
+@BenchBP.get("/redis")
+async def bench_redis(request: Request) -> HTTPResponse:
+    value = await request.ctx.redis.incr("bench")
+    return json({"value": value})
+
+
+@BenchBP.get("/publish")
+async def bench_publish(request: Request) -> HTTPResponse:
+    from aio_pika import Message
+
+    await request.app.ctx.rabbitmq_publisher.publish(Message(b"{}"), "bench", exchange="bench")
+    return json({})
+
+
+class FakeExchange:
+    """
+    `FakeExchange` confirm every message after `latency` seconds
+    """
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    async def publish(self, message: Any, routing_key: str, **kwargs: Any) -> None:
+        await asyncio.sleep(self.latency)
+
+
+class FakeChannel:
+    def __init__(self, latency: float) -> None:
+        self.is_closed = False
+        self.latency = latency
+        self.default_exchange = FakeExchange(latency)
+
+    async def declare_exchange(self, name: str, **kwargs: Any) -> FakeExchange:
+        return FakeExchange(self.latency)
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+
+class FakeConnection:
+    """
+    `FakeConnection` in-memory AMQP connection, enough for `rabbitmq.publisher.Publisher`
+    """
+
+    def __init__(self, latency: float = 0.001) -> None:
+        self.latency = latency
+
+    async def channel(self, **kwargs: Any) -> FakeChannel:
+        return FakeChannel(self.latency)
+
+    async def close(self) -> None:
+        pass
+
+
+def sqlite_available() -> bool:
+    try:
+        import aiosqlite  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def fakeredis_available() -> bool:
+    try:
+        import fakeredis.aioredis  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def install(
+    app: Sanic, database: Optional[str] = None, redis: Optional[str] = None, amqp_latency: float = 0.001
+) -> None:
+    """
+    `install` the benchmark routes on `app`, and swap the services it would connect to with local stand-ins
+
+    the database is `database` if provided, in memory sqlite otherwise. Redis is `redis` if provided,
+    fakeredis otherwise. RabbitMQ is always faked. Listeners run after the ones of `setup`.
+    """
+    app.blueprint(BenchBP)
+
+    async def before_server_start(app: Sanic) -> None:
+        if database is None and sqlite_available():
+            from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+            from sqlalchemy.orm import sessionmaker
+
+            await app.ctx.db_engine.dispose()
+            app.ctx.db_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+            app.ctx.db_readers = []
+            app.ctx.db_sessionmaker = sessionmaker(app.ctx.db_engine, class_=AsyncSession, expire_on_commit=False)
+
+        if redis is None and fakeredis_available():
+            from fakeredis import FakeServer
+            from fakeredis.aioredis import FakeConnection as FakeRedisConnection
+            from redis.asyncio import ConnectionPool
+
+            app.ctx.redis = ConnectionPool(connection_class=FakeRedisConnection, server=FakeServer())
+
+        from rabbitmq.publisher import Publisher
+
+        app.ctx.rabbitmq_publisher = Publisher(FakeConnection(amqp_latency))  # type: ignore[arg-type]
+
+    if redis is None:
+        # `setup_redis` only registers the client when a DSN is provided
+        def get_redis_client(request: Request) -> Any:
+            from redis.asyncio import Redis
+
+            return Redis(connection_pool=request.app.ctx.redis)
+
+        register_lazy(app, "redis", get_redis_client)
+
+    app.register_listener(before_server_start, "before_server_start")
@@ -1,7 +1,10 @@
 # from tests import test_blueprint
+import sys
+from pathlib import Path
+
 from sanic import Sanic
 
-from utils.autodiscovery import autodiscover
+from utils.autodiscovery import autodiscover, write_manifest
 
 
 class TestAutodiscover:
@@ -11,3 +14,14 @@ class TestAutodiscover:
         assert "test" in app.blueprints
         assert len(app.blueprints["test"].routes) == 1
         assert app.blueprints["test"].routes[0].name == "test_autodiscover.test.test"
+
+    def test_manifest(self, tmp_path: Path) -> None:
+        path = tmp_path / "blueprints.json"
+        manifest = write_manifest(path, "tests.test_blueprint", recursive=True)
+        assert manifest == {"tests.test_blueprint.testbp": ["TestBP"]}
+        # modules are imported once through the import system
+        assert "tests.test_blueprint.testbp" in sys.modules
+
+        app = Sanic(name="test_autodiscover_manifest")
+        autodiscover(app, "tests.test_blueprint", recursive=True, manifest=path)
+        assert "test" in app.blueprints
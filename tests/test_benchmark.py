@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+import pytest
+
+from tests.benchmark.load import Result, percentile, run_load, summarize
+
+
+class TestBenchmark:
+    def test_summary(self) -> None:
+        latencies = [i / 1000 for i in range(1, 101)]
+        assert percentile(latencies, 50) == 0.05
+        assert percentile(latencies, 99) == 0.099
+        summary = summarize(Result(latencies, errors=2, elapsed=2))
+        assert summary.requests == 100 and summary.errors == 2
+        assert summary.rps == 50
+        assert summary.p95_ms == 95
+        assert summary.max_ms == 100
+
+    @pytest.mark.asyncio
+    async def test_run_load(self) -> None:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.001)
+            return httpx.Response(200 if request.url.path == "/" else 500)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            summary = await run_load("http://bench/", concurrency=4, duration=0.1, warmup=0.02, client=client)
+            assert summary.requests > 0 and summary.errors == 0
+            assert 0 < summary.p50_ms <= summary.p99_ms <= summary.max_ms
+
+            summary = await run_load("http://bench/fail", concurrency=2, duration=0.05, warmup=0, client=client)
+            assert summary.requests == 0 and summary.errors > 0
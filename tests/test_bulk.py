@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+from typing import Any, AsyncIterator
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+from models.bulk import (
+    bulk_insert,
+    bulk_upsert,
+    chunks,
+    records,
+    staging_name,
+    staging_sql,
+    upsert_sql,
+)
+
+item = Table(
+    "item",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("name", String),
+    Column("order", Integer),
+    schema="shop",
+)
+
+log = Table("log", MetaData(), Column("message", String))
+
+
+class FakeResult:
+    def __init__(self, rowcount: int) -> None:
+        self.rowcount = rowcount
+
+
+class FakeDriver:
+    """
+    the asyncpg connection, `COPY` reports the number of rows copied
+    """
+
+    def __init__(self) -> None:
+        self.copied: list[tuple[str, Any, list[Any], Any]] = []
+
+    async def copy_records_to_table(self, name: str, records: Any, columns: Any, schema_name: Any) -> str:
+        self.copied.append((name, schema_name, list(records), list(columns)))
+        return f"COPY {len(records)}"
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.driver = FakeDriver()
+        self.statements: list[str] = []
+
+    async def exec_driver_sql(self, statement: str) -> FakeResult:
+        self.statements.append(statement)
+        return FakeResult(len(self.driver.copied[-1][2]) if statement.startswith("INSERT") else -1)
+
+    async def get_raw_connection(self) -> Any:
+        return SimpleNamespace(driver_connection=self.driver)
+
+
+async def collect(rows: Any, size: int) -> list[list[Any]]:
+    return [chunk async for chunk in chunks(rows, size)]
+
+
+async def numbers(count: int) -> AsyncIterator[int]:
+    for number in range(count):
+        yield number
+
+
+class TestBulk:
+    @pytest.mark.asyncio
+    async def test_chunks(self) -> None:
+        assert await collect(range(5), 2) == [[0, 1], [2, 3], [4]]
+        assert await collect(numbers(4), 2) == [[0, 1], [2, 3]]
+        assert await collect((), 2) == []
+
+    @pytest.mark.asyncio
+    async def test_chunks_size(self) -> None:
+        with pytest.raises(ValueError):
+            await collect(range(5), 0)
+
+    def test_records(self) -> None:
+        rows = [{"name": "a", "id": 1, "extra": True}, (2, "b")]
+        assert records(rows, ["id", "name"]) == [(1, "a"), (2, "b")]
+
+    def test_staging(self) -> None:
+        name = staging_name(item, ["id", "name"])
+        assert name.startswith("_bulk_item_")
+        assert name != staging_name(item, ["id", "order"])
+        other = Table("item", MetaData(), Column("id", Integer, primary_key=True), schema="archive")
+        assert name != staging_name(other, ["id", "name"])
+        assert staging_sql(item, name, ["id", "order"]) == (
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS {name} ON COMMIT DROP AS SELECT id, "order" FROM shop.item '
+            "WITH NO DATA"
+        )
+
+    def test_upsert(self) -> None:
+        assert upsert_sql(item, "staging", ["id", "name", "order"], ["id"], ["name", "order"]) == (
+            'INSERT INTO shop.item (id, name, "order") SELECT DISTINCT ON (id) id, name, "order" FROM staging '
+            'ORDER BY id, ctid DESC ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, "order" = EXCLUDED."order"'
+        )
+
+    def test_upsert_do_nothing(self) -> None:
+        assert upsert_sql(item, "staging", ["id", "name"], ["id"], []) == (
+            "INSERT INTO shop.item (id, name) SELECT id, name FROM staging ON CONFLICT (id) DO NOTHING"
+        )
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert(self) -> None:
+        connection = FakeConnection()
+        rows = [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}]
+        assert await bulk_insert(connection, item, rows, chunk_size=2) == 3  # type: ignore[arg-type]
+        assert connection.driver.copied == [
+            ("item", "shop", [(1, "a"), (2, "b")], ["id", "name"]),
+            ("item", "shop", [(3, "c")], ["id", "name"]),
+        ]
+        assert connection.statements == ["SELECT 1"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_upsert(self) -> None:
+        connection = FakeConnection()
+        rows = [(1, "a"), (2, "b"), (3, "c")]
+        written = await bulk_upsert(
+            connection, item, rows, columns=["id", "name"], chunk_size=2  # type: ignore[arg-type]
+        )
+        assert written == 3
+        staging = staging_name(item, ["id", "name"])
+        assert [copy[0] for copy in connection.driver.copied] == [staging, staging]
+        merge = upsert_sql(item, staging, ["id", "name"], ["id"], ["name"])
+        assert connection.statements == [
+            staging_sql(item, staging, ["id", "name"]),
+            merge,
+            f"TRUNCATE {staging}",
+            merge,
+            f"TRUNCATE {staging}",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_bulk_upsert_without_primary_key(self) -> None:
+        connection = FakeConnection()
+        with pytest.raises(ValueError):
+            await bulk_upsert(connection, log, [("a",)])  # type: ignore[arg-type]
+        assert connection.statements == []
+        # rows conflicting on any constraint are skipped
+        assert await bulk_upsert(connection, log, [("a",)], update=()) == 1  # type: ignore[arg-type]
+        assert connection.statements[1].endswith("ON CONFLICT DO NOTHING")
@@ -0,0 +1,240 @@
+import time
+from json import dumps
+from typing import Any, Callable, Optional
+
+import pytest
+from sanic import HTTPResponse, Request, Sanic, json
+
+from middleware.cache import CachedResponse, ResponseCache, cache_response
+from middleware.compression import Compressor, compress_response
+from utils.lru import LRUCache
+from utils.redis import TAG_SCRIPT
+
+
+class TestLRUCache:
+    def test_entries_bound(self) -> None:
+        cache: LRUCache[int] = LRUCache(max_entries=2)
+        cache.set("a", 1, 60)
+        cache.set("b", 2, 60)
+        assert cache.get("a") == 1
+        cache.set("c", 3, 60)
+        # "b" is the least recently used
+        assert "b" not in cache
+        assert cache.get("a") == 1 and cache.get("c") == 3
+
+    def test_bytes_bound(self) -> None:
+        cache: LRUCache[bytes] = LRUCache(max_bytes=10)
+        cache.set("a", b"12345", 60, size=5)
+        cache.set("b", b"123456", 60, size=6)
+        assert "a" not in cache
+        assert cache.bytes == 6
+        cache.set("c", b"x" * 11, 60, size=11)
+        assert "c" not in cache
+
+    def test_expiry(self) -> None:
+        cache: LRUCache[int] = LRUCache()
+        cache.set("a", 1, 0.01)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_tags(self) -> None:
+        cache: LRUCache[int] = LRUCache()
+        cache.set("a", 1, 60, tags=["items"])
+        cache.set("b", 2, 60, tags=["items", "item:2"])
+        cache.set("c", 3, 60)
+        assert cache.invalidate("item:2") == 1
+        assert cache.invalidate("items") == 1
+        assert len(cache) == 1
+
+
+class TestCacheResponse:
+    def test_cache_and_etag(self) -> None:
+        app = Sanic(name="test_cache_response")
+        app.ctx.response_cache = ResponseCache()
+        calls = []
+
+        @app.get("/items")
+        @cache_response(60, tags=["items"])
+        async def items(request: Request) -> HTTPResponse:
+            calls.append(request.args.get("page"))
+            return json({"page": request.args.get("page")})
+
+        @app.get("/invalidate")
+        async def invalidate(request: Request) -> HTTPResponse:
+            await request.app.ctx.response_cache.invalidate("items")
+            return json({})
+
+        _, response = app.test_client.get("/items?page=1")
+        assert response.headers["x-cache"] == "MISS"
+        etag = response.headers["etag"]
+
+        _, response = app.test_client.get("/items?page=1")
+        assert response.headers["x-cache"] == "HIT-LOCAL"
+        assert response.json == {"page": "1"}
+        assert response.headers["etag"] == etag
+
+        _, response = app.test_client.get("/items?page=1", headers={"If-None-Match": etag})
+        assert response.status == 304
+
+        _, response = app.test_client.get("/items?page=2")
+        assert response.headers["x-cache"] == "MISS"
+        assert calls == ["1", "2"]
+
+        app.test_client.get("/invalidate")
+        _, response = app.test_client.get("/items?page=1")
+        assert response.headers["x-cache"] == "MISS"
+        assert calls == ["1", "2", "1"]
+
+    def test_compressed_etag(self) -> None:
+        app = Sanic(name="test_cache_response_compressed")
+        app.ctx.response_cache = ResponseCache()
+        app.ctx.compressor = Compressor(min_size=100, offload_size=None)
+
+        @app.get("/items")
+        @cache_response(60)
+        async def items(request: Request) -> HTTPResponse:
+            return json({"items": list(range(200))})
+
+        app.register_middleware(compress_response, "response")
+
+        _, response = app.test_client.get("/items", headers={"accept-encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        etag = response.headers["etag"]
+        assert etag.startswith("W/")
+
+        _, response = app.test_client.get("/items", headers={"accept-encoding": "gzip", "If-None-Match": etag})
+        assert response.status == 304
+        assert response.headers["etag"] == etag
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        pass
+
+    def __getattr__(self, name: str) -> Callable[..., "FakePipeline"]:
+        def command(*args: Any, **kwargs: Any) -> FakePipeline:
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return command
+
+    async def execute(self) -> list[Any]:
+        return [getattr(self.redis, f"do_{name}")(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeScript:
+    """
+    `TAG_SCRIPT`, run by the fake redis
+    """
+
+    def __init__(self, redis: "FakeRedis", script: str) -> None:
+        assert script == TAG_SCRIPT
+        self.redis = redis
+
+    async def __call__(self, keys: list[str], args: list[Any], client: Any = None) -> Any:
+        if isinstance(client, FakePipeline):
+            return client.tag(keys, args)
+        return self.redis.do_tag(keys, args)
+
+
+class FakeRedis:
+    """
+    the redis commands of the caches, keys expire on a clock the tests move forward with `now`
+    """
+
+    def __init__(self, store: Optional[dict[str, Any]] = None) -> None:
+        self.store: dict[str, Any] = dict(store or {})
+        self.expiries: dict[str, float] = {}
+        self.now = 0.0
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def register_script(self, script: str) -> FakeScript:
+        return FakeScript(self, script)
+
+    async def sunion(self, keys: list[str]) -> set[bytes]:
+        return {member.encode() for key in keys for member in self._get(key) or ()}
+
+    def _get(self, key: str) -> Any:
+        if key in self.expiries and self.expiries[key] <= self.now:
+            del self.store[key], self.expiries[key]
+        return self.store.get(key)
+
+    def do_get(self, key: str) -> Any:
+        return self._get(key)
+
+    def do_pttl(self, key: str) -> int:
+        if self._get(key) is None:
+            return -2
+        return int((self.expiries[key] - self.now) * 1000) if key in self.expiries else -1
+
+    def do_set(self, key: str, value: bytes, px: int) -> None:
+        self.store[key] = value
+        self.expiries[key] = self.now + px / 1000
+
+    def do_delete(self, *keys: str) -> None:
+        for key in keys:
+            self.store.pop(key, None)
+            self.expiries.pop(key, None)
+
+    def do_publish(self, channel: str, message: bytes) -> None:
+        pass
+
+    def do_tag(self, keys: list[str], args: list[Any]) -> None:
+        member, ttl = args
+        for key in keys:
+            self.store[key] = (self._get(key) or set()) | {member}
+            if self.do_pttl(key) < ttl:
+                self.expiries[key] = self.now + ttl / 1000
+
+
+class TestResponseCacheTags:
+    def test_dump_keeps_tags(self) -> None:
+        entry = CachedResponse(200, "application/json", [("x-a", "1")], b"{}", '"e"', ("items",))
+        assert CachedResponse.load(entry.dump()) == entry
+        # entries written without tags
+        assert CachedResponse.load(b'[200,"text/plain",[],"\\"e\\""]\nok').tags == ()
+
+    @pytest.mark.asyncio
+    async def test_shared_hit_is_invalidated_locally(self) -> None:
+        entry = CachedResponse(200, "application/json", [], b"{}", '"e"', ("items", "item:1"))
+        cache = ResponseCache(prefix="p:")
+        cache.redis = FakeRedis({"p:key": entry.dump()})  # type: ignore[assignment]
+        cache.redis.expiries["p:key"] = 60
+        assert (await cache.get("key")) == (entry, "HIT")
+        assert cache.local.get("key") == entry
+        cache.local.invalidate("item:1")
+        assert cache.local.get("key") is None
+
+    @pytest.mark.asyncio
+    async def test_invalidation_with_mixed_ttls(self) -> None:
+        redis = FakeRedis()
+        cache = ResponseCache(prefix="p:")
+        cache.redis, cache.tag_script = redis, redis.register_script(TAG_SCRIPT)  # type: ignore[assignment]
+        entry = CachedResponse(200, "application/json", [], b"{}", '"e"')
+        await cache.set("long", entry, 60, tags=["items"])
+        await cache.set("short", entry, 1, tags=["items"])
+        redis.now = 10
+        await cache.invalidate("items")
+        cache.local.clear()
+        assert await cache.get("long") is None
+
+    def test_invalidations_of_other_workers(self) -> None:
+        cache = ResponseCache()
+        entry = CachedResponse(200, None, [], b"", '"e"')
+        cache._set_local("a", entry, 60, ("items",))
+        cache._set_local("b", entry, 60, ("users",))
+        # published by this worker, already applied
+        cache._on_invalidation(dumps({"origin": cache.origin, "tags": ["items"]}))
+        assert "a" in cache.local
+        cache._on_invalidation(dumps({"origin": "other", "tags": ["items"]}))
+        assert "a" not in cache.local and "b" in cache.local
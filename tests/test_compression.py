@@ -0,0 +1,142 @@
+import gzip
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from sanic import HTTPResponse, Request, Sanic, json, text
+from sanic.response import raw
+
+from middleware.compression import Compressor, compress_response, negotiate
+from utils.executor import __offloaders__
+from utils.statics import Statics, precompress
+
+PAYLOAD = {"items": [{"id": i, "name": f"item {i}"} for i in range(200)]}
+
+
+class TestNegotiate:
+    def test_preference(self) -> None:
+        assert negotiate("gzip, deflate", ["br", "gzip", "deflate"]) == "gzip"
+        assert negotiate("deflate;q=1, gzip;q=0.5", ["gzip", "deflate"]) == "deflate"
+        # equal weights follow the order of the server
+        assert negotiate("deflate, gzip", ["gzip", "deflate"]) == "gzip"
+
+    def test_refused(self) -> None:
+        assert negotiate("", ["gzip"]) is None
+        assert negotiate("identity", ["gzip"]) is None
+        assert negotiate("gzip;q=0", ["gzip"]) is None
+        assert negotiate("*;q=0.1, gzip;q=0", ["gzip", "deflate"]) == "deflate"
+
+
+class TestCompressor:
+    @pytest.fixture
+    def app(self, request: pytest.FixtureRequest) -> Sanic:
+        app = Sanic(name=f"test_compression_{request.node.name}")
+        # the test client runs the server listeners on every request, the state is kept in between
+        app.ctx.compressor = Compressor(min_size=100, levels={"application/json": 1}, offload_size=None)
+
+        @app.get("/json")
+        async def items(request: Request) -> HTTPResponse:
+            return json(PAYLOAD, headers={"etag": '"v1"'})
+
+        @app.get("/small")
+        async def small(request: Request) -> HTTPResponse:
+            return text("ok")
+
+        @app.get("/binary")
+        async def binary(request: Request) -> HTTPResponse:
+            return raw(os.urandom(1000), content_type="image/png")
+
+        @app.get("/no-transform")
+        async def no_transform(request: Request) -> HTTPResponse:
+            return json(PAYLOAD, headers={"cache-control": "no-transform"})
+
+        app.register_middleware(compress_response, "response")
+        return app
+
+    def test_compressed(self, app: Sanic) -> None:
+        _, response = app.test_client.get("/json", headers={"accept-encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"v1"'
+        # the client decodes the body
+        assert response.json == PAYLOAD
+
+    def test_not_compressed(self, app: Sanic) -> None:
+        _, response = app.test_client.get("/json", headers={"accept-encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == '"v1"'
+        for path in ("/small", "/binary", "/no-transform"):
+            _, response = app.test_client.get(path, headers={"accept-encoding": "gzip"})
+            assert "content-encoding" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_offload(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        calls = []
+
+        class Offloader:
+            async def run(self, func, *args):  # type: ignore[no-untyped-def]
+                calls.append(func)
+                return func(*args)
+
+        monkeypatch.setitem(__offloaders__, "thread", Offloader())
+        compressor = Compressor(min_size=100, offload_size=1000)
+        request = SimpleNamespace(headers={"accept-encoding": "gzip"})
+        for size in (500, 5000):
+            response = text("a" * size)
+            await compressor.compress(request, response)  # type: ignore[arg-type]
+            assert gzip.decompress(response.body) == b"a" * size
+        assert len(calls) == 1
+
+
+class TestStatics:
+    @pytest.fixture
+    def root(self, tmp_path: Path) -> Path:
+        (tmp_path / "css").mkdir()
+        (tmp_path / "css" / "app.css").write_text("body { color: red; }\n" * 100)
+        (tmp_path / "logo.png").write_bytes(os.urandom(500))
+        return tmp_path
+
+    def test_precompress(self, root: Path) -> None:
+        assert precompress(root, levels={})["gzip"] == 1
+        variant = root / "css" / "app.css.gz"
+        assert gzip.decompress(variant.read_bytes()) == (root / "css" / "app.css").read_bytes()
+        assert not (root / "logo.png.gz").exists()
+        # up to date variants are kept
+        assert precompress(root)["gzip"] == 0
+
+    @pytest.mark.parametrize("memory_max", [0, 1 << 20])
+    def test_serve(self, root: Path, memory_max: int) -> None:
+        precompress(root)
+        statics = Statics(root, max_age=600, memory_max=memory_max)
+        statics.scan()
+        assert sorted(statics.assets) == ["css/app.css", "logo.png"]
+        app = Sanic(name=f"test_statics_{memory_max}")
+        app.add_route(statics.serve, "/statics/<path:path>")
+
+        _, response = app.test_client.get("/statics/css/app.css", headers={"accept-encoding": "gzip"})
+        assert response.status == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == "public, max-age=600"
+        assert response.headers["content-type"] == "text/css; charset=utf-8"
+        assert response.text == (root / "css" / "app.css").read_text()
+        etag = response.headers["etag"]
+
+        _, response = app.test_client.get(
+            "/statics/css/app.css", headers={"accept-encoding": "gzip", "if-none-match": etag}
+        )
+        assert response.status == 304
+        # another encoding is another representation
+        _, response = app.test_client.get(
+            "/statics/css/app.css", headers={"accept-encoding": "identity", "if-none-match": etag}
+        )
+        assert response.status == 200
+        assert "content-encoding" not in response.headers
+        assert response.headers["etag"] != etag
+
+        _, response = app.test_client.get("/statics/logo.png", headers={"accept-encoding": "gzip"})
+        assert response.body == (root / "logo.png").read_bytes()
+        assert "vary" not in response.headers
+        _, response = app.test_client.get("/statics/missing.css")
+        assert response.status == 404
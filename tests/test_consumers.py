@@ -0,0 +1,153 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Optional, Sequence
+
+import pytest
+from aio_pika.abc import AbstractIncomingMessage
+
+from rabbitmq.consumers import (
+    AbstractBatchConsumer,
+    AbstractConsumer,
+    BatchConsumerSetting,
+    ConsumerSetting,
+)
+
+
+class FakeMessage:
+    def __init__(self, body: bytes, delivery_tag: int = 0, log: list[tuple[str, int, bool]] | None = None) -> None:
+        self.body = body
+        self.delivery_tag = delivery_tag
+        self.log = log if log is not None else []
+        self.acked = False
+        self.rejected = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.log.append(("ack", self.delivery_tag, multiple))
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        self.log.append(("nack", self.delivery_tag, multiple))
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False, ignore_processed: bool = False) -> AsyncIterator[None]:
+        try:
+            yield
+        except Exception:
+            self.rejected = True
+            raise
+        self.acked = True
+
+
+def settings(**kwargs: Any) -> SimpleNamespace:
+    return SimpleNamespace(
+        RABBITMQ_EXAMPLE_CHANNEL=1,
+        RABBITMQ_EXAMPLE_QUEUE_NAME="example",
+        RABBITMQ_EXAMPLE_EXCHANGE_NAME="",
+        RABBITMQ_EXAMPLE_ROUTING_KEY="",
+        **{f"RABBITMQ_EXAMPLE_{key.upper()}": value for key, value in kwargs.items()},
+    )
+
+
+class ExampleConsumer(AbstractConsumer):
+    name = "example"
+    settings = ConsumerSetting(channel=0, queue_name="", exchange_name="", routing_key="")
+
+    def __init__(self, conf: Any) -> None:
+        super().__init__(conf)
+        self.running = 0
+        self.max_running = 0
+
+    async def on_message(self, message: AbstractIncomingMessage) -> None:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if message.body == b"fail":
+            raise ValueError("fail")
+
+
+class TestConsumer:
+    def test_settings_from_config(self) -> None:
+        consumer = ExampleConsumer(settings(prefetch_count=5, max_concurrency=2))
+        assert consumer.settings.prefetch_count == 5
+        assert consumer.settings.max_concurrency == 2
+        assert consumer.settings.no_ack is False
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency_and_ack(self) -> None:
+        consumer = ExampleConsumer(settings(max_concurrency=3))
+        messages = [FakeMessage(b"ok") for _ in range(9)] + [FakeMessage(b"fail")]
+        await asyncio.gather(*(consumer.dispatch(message) for message in messages))  # type: ignore[arg-type]
+        assert consumer.max_running == 3
+        assert consumer.in_flight == 0
+        assert all(message.acked for message in messages[:-1])
+        assert messages[-1].rejected and not messages[-1].acked
+
+
+class ExampleBatchConsumer(AbstractBatchConsumer):
+    name = "example"
+    settings = BatchConsumerSetting(channel=0, queue_name="", exchange_name="", routing_key="")
+
+    def __init__(self, conf: Any) -> None:
+        super().__init__(conf)
+        self.batches: list[list[bytes]] = []
+
+    async def on_batch(
+        self, messages: Sequence[AbstractIncomingMessage]
+    ) -> Optional[Sequence[AbstractIncomingMessage]]:
+        self.batches.append([message.body for message in messages])
+        if any(message.body == b"raise" for message in messages):
+            raise ValueError("raise")
+        return [message for message in messages if message.body == b"fail"]
+
+
+class TestBatchConsumer:
+    def test_prefetch_covers_batch(self) -> None:
+        consumer = ExampleBatchConsumer(settings(batch_size=50, prefetch_count=10))
+        assert consumer.settings.prefetch_count == 50
+
+    @pytest.mark.asyncio
+    async def test_batch_by_size(self) -> None:
+        consumer = ExampleBatchConsumer(settings(batch_size=3, max_wait_ms=1000))
+        log: list[tuple[str, int, bool]] = []
+        for tag in range(1, 7):
+            await consumer.dispatch(FakeMessage(b"ok", tag, log))  # type: ignore[arg-type]
+        await consumer.close_batches()
+        assert consumer.batches == [[b"ok"] * 3] * 2
+        assert log == [("ack", 3, True), ("ack", 6, True)]
+
+    @pytest.mark.asyncio
+    async def test_batch_by_time(self) -> None:
+        consumer = ExampleBatchConsumer(settings(batch_size=100, max_wait_ms=5))
+        log: list[tuple[str, int, bool]] = []
+        await consumer.dispatch(FakeMessage(b"ok", 1, log))  # type: ignore[arg-type]
+        await asyncio.sleep(0.02)
+        assert consumer.batches == [[b"ok"]]
+        assert log == [("ack", 1, True)]
+
+    @pytest.mark.asyncio
+    async def test_failed_subset(self) -> None:
+        consumer = ExampleBatchConsumer(settings(batch_size=4))
+        log: list[tuple[str, int, bool]] = []
+        for tag, body in enumerate((b"ok", b"ok", b"fail", b"ok"), 1):
+            await consumer.dispatch(FakeMessage(body, tag, log))  # type: ignore[arg-type]
+        await consumer.close_batches()
+        assert log == [("ack", 2, True), ("nack", 3, False), ("ack", 4, False)]
+
+    @pytest.mark.asyncio
+    async def test_failed_suffix(self) -> None:
+        consumer = ExampleBatchConsumer(settings(batch_size=3))
+        log: list[tuple[str, int, bool]] = []
+        for tag, body in enumerate((b"ok", b"fail", b"fail"), 1):
+            await consumer.dispatch(FakeMessage(body, tag, log))  # type: ignore[arg-type]
+        await consumer.close_batches()
+        assert log == [("ack", 1, True), ("nack", 3, True)]
+
+    @pytest.mark.asyncio
+    async def test_raise_nacks_batch(self) -> None:
+        consumer = ExampleBatchConsumer(settings(batch_size=2))
+        log: list[tuple[str, int, bool]] = []
+        for tag, body in enumerate((b"ok", b"raise"), 1):
+            await consumer.dispatch(FakeMessage(body, tag, log))  # type: ignore[arg-type]
+        await consumer.close_batches()
+        assert log == [("nack", 2, True)]
@@ -0,0 +1,42 @@
+from sanic import HTTPResponse, Request, Sanic, text
+
+from utils.context import Request as LazyRequest
+from utils.context import is_resolved, register_lazy
+
+
+class TestLazyContext:
+    def test_resolved_on_first_access(self) -> None:
+        app = Sanic(name="test_lazy_context", request_class=LazyRequest)
+        calls = []
+
+        def factory(request: Request) -> str:
+            calls.append(request.id)
+            return "value"
+
+        register_lazy(app, "thing", factory)
+
+        @app.get("/untouched")
+        async def untouched(request: Request) -> HTTPResponse:
+            return text(str(is_resolved(request.ctx, "thing")))
+
+        @app.get("/touched")
+        async def touched(request: Request) -> HTTPResponse:
+            return text(request.ctx.thing + request.ctx.thing)
+
+        _, response = app.test_client.get("/untouched")
+        assert response.text == "False"
+        assert calls == []
+
+        _, response = app.test_client.get("/touched")
+        assert response.text == "valuevalue"
+        assert len(calls) == 1
+
+    def test_missing_attribute(self) -> None:
+        app = Sanic(name="test_lazy_context_missing", request_class=LazyRequest)
+
+        @app.get("/")
+        async def handler(request: Request) -> HTTPResponse:
+            return text(str(hasattr(request.ctx, "nothing")))
+
+        _, response = app.test_client.get("/")
+        assert response.text == "False"
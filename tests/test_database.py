@@ -0,0 +1,94 @@
+import pytest
+from sanic import HTTPResponse
+from sanic import Request as SanicRequest
+from sanic import Sanic, text
+from sqlalchemy import Column, Integer, MetaData, Table, select
+from sqlalchemy import text as sql_text
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from settings import Settings
+from setup import setup_database
+from utils.context import Request, is_resolved
+from utils.database import ReaderSelector, RoutingSession
+from utils.query_cache import QueryCache
+
+DSN = "postgresql+asyncpg://postgres:123456@{}:5432/postgres"
+
+table = Table("example", MetaData(), Column("id", Integer, primary_key=True))
+
+
+class TestRoutingSession:
+    master = create_async_engine(DSN.format("master"))
+    readers = [create_async_engine(DSN.format("reader1")), create_async_engine(DSN.format("reader2"))]
+
+    def session(self, sticky_window: float | None = None) -> RoutingSession:
+        return RoutingSession(master=self.master, readers=ReaderSelector(self.readers), sticky_window=sticky_window)
+
+    def test_read_goes_to_readers(self) -> None:
+        session = self.session()
+        binds = {session.get_bind(clause=select(table)).url.host for _ in range(4)}
+        assert binds == {"reader1", "reader2"}
+
+    def test_write_goes_to_master(self) -> None:
+        session = self.session()
+        assert session.get_bind(clause=update(table).values(id=1)).url.host == "master"
+        assert session.get_bind(clause=sql_text("SELECT 1")).url.host == "master"
+        assert session.get_bind(clause=select(table).with_for_update()).url.host == "master"
+
+    def test_read_your_writes(self) -> None:
+        session = self.session()
+        session.get_bind(clause=update(table).values(id=1))
+        assert session.get_bind(clause=select(table)).url.host == "master"
+
+    def test_sticky_window_expired(self) -> None:
+        session = self.session(sticky_window=0)
+        session.get_bind(clause=update(table).values(id=1))
+        assert session.get_bind(clause=select(table)).url.host != "master"
+
+    def test_read_only(self) -> None:
+        session = self.session()
+        session.info["read_only"] = True
+        session.get_bind(clause=update(table).values(id=1))
+        assert session.get_bind(clause=select(table)).url.host != "master"
+
+    @pytest.mark.asyncio
+    async def test_recently_invalidated(self) -> None:
+        cache = QueryCache(self.master.dialect, replica_lag=60)
+        session = self.session()
+        session.info["query_cache"] = cache
+        await cache.invalidate("example")
+        # another session of the worker, which did not write
+        assert session.get_bind(clause=select(table)).url.host == "master"
+        cache.replica_lag = 0
+        assert session.get_bind(clause=select(table)).url.host != "master"
+
+    def test_without_readers(self) -> None:
+        session = RoutingSession(master=self.master, readers=ReaderSelector([]))
+        assert session.get_bind(clause=select(table)).url.host == "master"
+
+    def test_least_connections(self) -> None:
+        selector = ReaderSelector(self.readers, "least_connections")
+        assert selector.select() is self.readers[0].sync_engine
+
+
+class TestLazySession:
+    def test_untouched_session(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("APP_DATABASE_MASTER", DSN.format("localhost"))
+        app = Sanic(name="test_lazy_session", request_class=Request)
+        setup_database(app, Settings())
+
+        @app.get("/untouched")
+        async def untouched(request: SanicRequest) -> HTTPResponse:
+            return text(str(is_resolved(request.ctx, "db_session")))
+
+        @app.get("/read_only", ctx_read_only=True)
+        async def read_only(request: SanicRequest) -> HTTPResponse:
+            # the session never began a transaction, so nothing is sent to the (unreachable) database
+            return text(str(request.ctx.db_session.sync_session.info.get("read_only")))
+
+        _, response = app.test_client.get("/untouched")
+        assert response.text == "False"
+        _, response = app.test_client.get("/read_only")
+        assert response.status == 200
+        assert response.text == "True"
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator
+
+import pytest
+
+from utils.executor import (
+    Offloader,
+    __offloaders__,
+    offload,
+    run_in_process,
+    run_in_thread,
+)
+
+
+@run_in_process()
+def pid() -> int:
+    return os.getpid()
+
+
+@run_in_thread(timeout=0.05)
+def sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def offloaders() -> Iterator[None]:
+    __offloaders__["process"] = Offloader(ProcessPoolExecutor(1, mp_context=get_context("spawn")))
+    __offloaders__["thread"] = Offloader(ThreadPoolExecutor(2), max_pending=2)
+    yield
+    for offloader in __offloaders__.values():
+        offloader.shutdown()
+    __offloaders__.clear()
+
+
+class TestOffload:
+    @pytest.mark.asyncio
+    async def test_run_in_process(self, offloaders: None) -> None:
+        assert await pid() != os.getpid()
+        assert __offloaders__["process"].stats()["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_run_in_thread_timeout(self, offloaders: None) -> None:
+        assert await sleep(0) == 0
+        with pytest.raises(asyncio.TimeoutError):
+            await sleep(0.2)
+        assert __offloaders__["thread"].stats()["timed_out"] == 1
+
+    @pytest.mark.asyncio
+    async def test_bounded_pending(self, offloaders: None) -> None:
+        offloader = __offloaders__["thread"]
+        tasks = [asyncio.create_task(offload(time.sleep, 0.05)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert offloader.pending == 2
+        await asyncio.gather(*tasks)
+        assert offloader.stats()["completed"] == 4
+
+    @pytest.mark.asyncio
+    async def test_timed_out_calls_keep_their_slot(self, offloaders: None) -> None:
+        offloader = __offloaders__["thread"]
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await offloader.run(time.sleep, 0.1, timeout=0.01)
+        # both threads are still sleeping
+        assert offloader.pending == 2
+        task = asyncio.create_task(offloader.run(time.sleep, 0))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        await task
+        await asyncio.sleep(0.01)
+        assert offloader.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_zero_timeout(self, offloaders: None) -> None:
+        offloader = Offloader(__offloaders__["thread"].executor, timeout=60)
+        with pytest.raises(asyncio.TimeoutError):
+            await offloader.run(time.sleep, 0.05, timeout=0)
+
+    @pytest.mark.asyncio
+    async def test_not_set_up(self) -> None:
+        with pytest.raises(RuntimeError):
+            await offload(time.sleep, 0)
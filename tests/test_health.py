@@ -1,10 +1,15 @@
+import asyncio
 import json
 import os
+from types import SimpleNamespace
 
 import pytest
 from sanic import Sanic
 from sanic_testing.testing import SanicASGITestClient
 
+from services.health import readiness
+from utils.warmup import warm_redis, warmup
+
 
 @pytest.fixture
 def app() -> Sanic:
@@ -26,3 +31,69 @@ class TestHealth:
         assert response.status == 200
         resp = json.loads(response.body)
         assert resp["status"] == "ok"
+
+    @pytest.mark.asyncio
+    async def test_readiness(self, app: Sanic) -> None:
+        client: SanicASGITestClient = app.asgi_client
+        _, response = await client.get("/ready")
+
+        # no database is listening in the test environment
+        assert response.status == 503
+        resp = json.loads(response.body)
+        assert resp["status"] == "unavailable"
+        assert resp["checks"]["database"] != "ok"
+        assert "redis" not in resp["checks"]
+
+    @pytest.mark.asyncio
+    async def test_not_ready_while_warming_up(self) -> None:
+        app = Sanic(name="test_warmup_readiness")
+        app.ctx.settings = SimpleNamespace(HEALTH_PROBE_TIMEOUT=1.0, HEALTH_CACHE_TTL=0)
+        started = asyncio.Event()
+        app.ctx.warmup = asyncio.create_task(started.wait())
+        ready, body = await readiness(app)
+        assert not ready
+        assert json.loads(body)["checks"] == {"warmup": "running"}
+        started.set()
+        await app.ctx.warmup
+        await asyncio.sleep(0)
+        ready, body = await readiness(app)
+        assert ready
+        assert json.loads(body)["checks"] == {"warmup": "ok"}
+
+
+class TestWarmup:
+    @pytest.mark.asyncio
+    async def test_warm_redis(self) -> None:
+        class Pool:
+            max_connections = 3
+
+            def __init__(self) -> None:
+                self.opened = 0
+                self.released: list[int] = []
+
+            async def get_connection(self, command_name: str) -> int:
+                self.opened += 1
+                return self.opened
+
+            async def release(self, connection: int) -> None:
+                self.released.append(connection)
+
+        pool = Pool()
+        assert await warm_redis(pool, 5) == 3  # type: ignore[arg-type]
+        assert sorted(pool.released) == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_warmup_failure_is_logged(self, caplog: pytest.LogCaptureFixture) -> None:
+        class Pool:
+            max_connections = 2
+
+            async def get_connection(self, command_name: str) -> None:
+                raise ConnectionError("refused")
+
+        app = Sanic(name="test_warmup_failure")
+        app.ctx.settings = SimpleNamespace(
+            DATABASE_POOL_WARMUP=1, REDIS_POOL_WARMUP=2, RABBITMQ_PUBLISHER_CHANNELS=1, WARMUP_TIMEOUT=1.0
+        )
+        app.ctx.redis = Pool()
+        await warmup(app)
+        assert "warmup of redis failed" in caplog.text
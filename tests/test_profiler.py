@@ -0,0 +1,81 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from pydantic import SecretStr
+from sanic import Sanic
+
+from controllers.admin import AdminBP
+from utils.profiler import SLOW_CALLBACKS, ProfilerBusy, profile, sample, slow_callbacks
+
+
+def busy() -> None:
+    time.sleep(0.1)
+
+
+class TestProfiler:
+    @pytest.mark.asyncio
+    async def test_sample(self) -> None:
+        stacks = await sample(0.05, 0.005)
+        lines = stacks.splitlines()
+        assert lines
+        # the event loop thread is waiting on this coroutine
+        assert any("test_sample" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    @pytest.mark.asyncio
+    async def test_one_profile_at_a_time(self) -> None:
+        running = asyncio.create_task(profile(0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(ProfilerBusy):
+            await sample(0.01)
+        assert "function calls" in await running
+
+    @pytest.mark.asyncio
+    async def test_slow_callbacks(self) -> None:
+        before = SLOW_CALLBACKS.values.get(("-",), 0)
+        slow_callbacks.enable(0.02)
+        try:
+            await asyncio.sleep(0.05)
+            assert SLOW_CALLBACKS.values.get(("-",), 0) == before
+            asyncio.get_running_loop().call_soon(busy)
+            await asyncio.sleep(0.05)
+        finally:
+            slow_callbacks.disable()
+        assert not slow_callbacks.enabled
+        assert SLOW_CALLBACKS.values[("-",)] == before + 1
+
+
+class TestAdmin:
+    def test_token(self) -> None:
+        app = Sanic(name="test_admin")
+        app.ctx.settings = SimpleNamespace(
+            ADMIN_TOKEN=SecretStr("secret"), PROFILE_MAX_SECONDS=0.05, SLOW_CALLBACK_THRESHOLD_MS=None
+        )
+        app.blueprint(AdminBP)
+
+        _, response = app.test_client.get("/admin/slow-callbacks")
+        assert response.status == 401
+        _, response = app.test_client.get("/admin/slow-callbacks", headers={"Authorization": "Bearer wrong"})
+        assert response.status == 401
+
+        headers = {"Authorization": "Bearer secret"}
+        _, response = app.test_client.get("/admin/profile?seconds=10&format=pstats", headers=headers)
+        assert response.status == 200
+        assert "function calls" in response.text
+
+        for query in ("format=pstats&sort=foo", "seconds=nan", "seconds=-1", "format=pstats&limit=0"):
+            _, response = app.test_client.get(f"/admin/profile?{query}", headers=headers)
+            assert response.status == 400
+        _, response = app.test_client.post("/admin/slow-callbacks?threshold_ms=0", headers=headers)
+        assert response.status == 400
+
+        _, response = app.test_client.post("/admin/slow-callbacks?threshold_ms=50", headers=headers)
+        assert response.json["enabled"] and response.json["threshold_ms"] == 50
+        _, response = app.test_client.delete("/admin/slow-callbacks", headers=headers)
+        assert not response.json["enabled"]
+
+        app.ctx.settings.ADMIN_TOKEN = None
+        _, response = app.test_client.get("/admin/slow-callbacks", headers=headers)
+        assert response.status == 404
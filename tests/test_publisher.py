@@ -0,0 +1,123 @@
+import asyncio
+from typing import Any
+
+import pytest
+from aio_pika import ExchangeType, Message
+
+from rabbitmq.publisher import BatchPublisher, Envelope, Publisher
+
+
+class FakeExchange:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.published: list[tuple[bytes, str]] = []
+
+    async def publish(self, message: Message, routing_key: str, **kwargs: Any) -> None:
+        await asyncio.sleep(0.01)
+        if message.body == b"fail":
+            raise RuntimeError("nack")
+        self.published.append((message.body, routing_key))
+
+
+class FakeChannel:
+    def __init__(self) -> None:
+        self.is_closed = False
+        self.declared: list[str] = []
+        self.default_exchange = FakeExchange("")
+
+    async def declare_exchange(self, name: str, **kwargs: Any) -> FakeExchange:
+        self.declared.append(name)
+        # a round trip to the broker, other publishes run meanwhile
+        await asyncio.sleep(0)
+        return FakeExchange(name)
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.channels: list[FakeChannel] = []
+
+    async def channel(self, **kwargs: Any) -> FakeChannel:
+        self.channels.append(FakeChannel())
+        return self.channels[-1]
+
+
+class TestPublisher:
+    @pytest.mark.asyncio
+    async def test_channels_and_exchanges_are_reused(self) -> None:
+        connection = FakeConnection()
+        publisher = Publisher(connection, channels=2)  # type: ignore[arg-type]
+        await asyncio.gather(
+            *(publisher.publish(Message(b"%d" % i), "key", exchange="events") for i in range(10)),
+            publisher.publish(Message(b"direct"), "queue"),
+        )
+        assert len(connection.channels) == 2
+        assert [channel.declared for channel in connection.channels] == [["events"], ["events"]]
+        assert publisher.stats()["published"] == 11
+        assert publisher.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_confirms_are_pipelined(self) -> None:
+        publisher = Publisher(FakeConnection(), channels=1)  # type: ignore[arg-type]
+        await publisher.exchange(0, "events", ExchangeType.TOPIC)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(publisher.publish(Message(b""), exchange="events") for _ in range(50)))
+        # each fake publish takes 10ms, serialized they would take 500ms
+        assert loop.time() - start < 0.25
+
+    @pytest.mark.asyncio
+    async def test_closed_channel_is_reopened(self) -> None:
+        connection = FakeConnection()
+        publisher = Publisher(connection, channels=1)  # type: ignore[arg-type]
+        await publisher.publish(Message(b""), exchange="events")
+        await connection.channels[0].close()
+        await publisher.publish(Message(b""), exchange="events")
+        assert len(connection.channels) == 2
+        assert connection.channels[1].declared == ["events"]
+
+
+class TestBatchPublisher:
+    @pytest.mark.asyncio
+    async def test_batches_by_size(self) -> None:
+        batcher = BatchPublisher(Publisher(FakeConnection()), batch_size=100, linger=1)  # type: ignore[arg-type]
+        await asyncio.gather(*(batcher.publish(Envelope(Message(b""), exchange="events")) for _ in range(250)))
+        # the last 50 messages are flushed once the linger time is over
+        assert batcher.batches == 3
+        assert batcher.publisher.stats()["published"] == 250
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_batches_by_linger(self) -> None:
+        batcher = BatchPublisher(Publisher(FakeConnection()), batch_size=100, linger=0.005)  # type: ignore[arg-type]
+        await batcher.publish(Envelope(Message(b"")))
+        await batcher.publish(Envelope(Message(b"")))
+        assert batcher.batches == 2
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_failures_are_per_message(self) -> None:
+        batcher = BatchPublisher(Publisher(FakeConnection()), batch_size=3, linger=1)  # type: ignore[arg-type]
+        results = await asyncio.gather(
+            *(batcher.publish(Envelope(Message(body))) for body in (b"ok", b"fail", b"ok")), return_exceptions=True
+        )
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], RuntimeError)
+        assert batcher.batches == 1
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self) -> None:
+        batcher = BatchPublisher(Publisher(FakeConnection()), batch_size=2, max_buffered=2)  # type: ignore[arg-type]
+        futures = [await batcher.enqueue(Envelope(Message(b""))) for _ in range(2)]
+        await asyncio.sleep(0.001)
+        # the first batch is being flushed, the buffer takes two more messages
+        futures.extend([await batcher.enqueue(Envelope(Message(b""))) for _ in range(2)])
+        enqueue = asyncio.create_task(batcher.enqueue(Envelope(Message(b""))))
+        await asyncio.sleep(0.001)
+        assert not enqueue.done()
+        futures.append(await enqueue)
+        await asyncio.gather(*futures)
+        await batcher.close()
@@ -0,0 +1,132 @@
+from typing import Iterator
+
+import pytest
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+    String,
+    create_engine,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session, declarative_base
+
+from tests.test_cache import FakeRedis
+from utils.query_cache import (
+    WRITTEN,
+    QueryCache,
+    mark_written,
+    tables_of,
+)
+from utils.redis import TAG_SCRIPT
+
+Base = declarative_base()
+
+
+class Shop(Base):  # type: ignore[misc,valid-type]
+    __tablename__ = "shop"
+    id = Column(Integer, primary_key=True)
+
+
+class Item(Base):  # type: ignore[misc,valid-type]
+    __tablename__ = "item"
+    id = Column(Integer, primary_key=True)
+    shop_id = Column(Integer, ForeignKey("shop.id"))
+    name = Column(String)
+
+
+@pytest.fixture
+def session() -> Iterator[Session]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine, info={"query_cache": QueryCache(engine.dialect)}) as session:
+        session.add_all([Shop(id=1), Item(id=1, shop_id=1, name="a"), Item(id=2, shop_id=1, name="b")])
+        session.commit()
+        yield session
+
+
+class TestQueryCache:
+    def test_tables_of(self) -> None:
+        statement = select(Item).join(Shop).where(Item.id.in_(select(Item.id)))
+        assert tables_of(statement) == {"item", "shop"}
+
+    def test_key(self) -> None:
+        cache = QueryCache(create_engine("sqlite://").dialect)
+        assert cache.key(select(Item).where(Item.id == 1)) == cache.key(select(Item).where(Item.id == 1))
+        assert cache.key(select(Item).where(Item.id == 1)) != cache.key(select(Item).where(Item.id == 2))
+        assert cache.key(select(Item)) != cache.key(select(Shop))
+
+    def test_opt_in(self, session: Session) -> None:
+        session.scalars(select(Item)).all()
+        assert len(session.info["query_cache"].local) == 0
+
+    def test_cached(self, session: Session) -> None:
+        cache: QueryCache = session.info["query_cache"]
+        statement = select(Item).where(Item.shop_id == 1).order_by(Item.id).execution_options(query_cache=30)
+        assert [item.name for item in session.scalars(statement)] == ["a", "b"]
+        # changed behind the back of the session and the cache
+        session.execute(text("UPDATE item SET name = 'c'"))
+        session.expunge_all()
+        items = session.scalars(statement).all()
+        assert [item.name for item in items] == ["a", "b"]
+        assert cache.local.hits == 1
+        # the entities are merged into the session
+        assert items[0] in session
+
+    def test_writes_are_tracked(self, session: Session) -> None:
+        session.execute(update(Item).values(name="c"))
+        session.add(Shop(id=2))
+        session.flush()
+        assert session.info[WRITTEN] == {"item", "shop"}
+        mark_written(session, "other")
+        assert session.info[WRITTEN] == {"item", "shop", "other"}
+
+    def test_reads_own_writes(self, session: Session) -> None:
+        cache: QueryCache = session.info["query_cache"]
+        statement = select(Item).order_by(Item.id).execution_options(query_cache=30)
+        session.scalars(statement).all()
+        session.execute(update(Item).where(Item.id == 1).values(name="c"))
+        session.expunge_all()
+        assert [item.name for item in session.scalars(statement)] == ["c", "b"]
+        assert cache.local.hits == 0
+        # the other tables are still cached
+        session.scalars(select(Shop).execution_options(query_cache=30)).all()
+        assert len(cache.local) == 2
+
+    def test_uncommitted_rows_are_not_cached(self, session: Session) -> None:
+        cache: QueryCache = session.info["query_cache"]
+        statement = select(Item).order_by(Item.id).execution_options(query_cache=30)
+        session.add(Item(id=3, shop_id=1, name="c"))
+        assert [item.name for item in session.scalars(statement)] == ["a", "b", "c"]
+        assert len(cache.local) == 0
+        session.rollback()
+        assert [item.name for item in session.scalars(statement)] == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_invalidation_with_mixed_ttls(self) -> None:
+        redis = FakeRedis()
+        cache = QueryCache(create_engine("sqlite://").dialect, prefix="q:")
+        cache.redis, cache.tag_script = redis, redis.register_script(TAG_SCRIPT)  # type: ignore[assignment]
+        await cache.set_shared("long", b"rows", 60, ["item"])
+        await cache.set_shared("short", b"rows", 1, ["item"])
+        redis.now = 10
+        await cache.invalidate("item")
+        assert await cache.get_shared("long") is None
+
+    def test_commit_invalidates(self, session: Session) -> None:
+        cache: QueryCache = session.info["query_cache"]
+        statement = select(Item).order_by(Item.id).execution_options(query_cache=True)
+        session.scalars(statement).all()
+        session.scalars(select(Shop).execution_options(query_cache=True)).all()
+        session.get(Item, 1).name = "c"  # type: ignore[union-attr]
+        session.commit()
+        assert WRITTEN not in session.info
+        assert len(cache.local) == 1
+        assert [item.name for item in session.scalars(statement)] == ["c", "b"]
+
+    def test_rollback_forgets_writes(self, session: Session) -> None:
+        session.execute(update(Item).values(name="c"))
+        session.rollback()
+        assert WRITTEN not in session.info
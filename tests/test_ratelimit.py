@@ -0,0 +1,141 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+
+import pytest
+from sanic import HTTPResponse, Request, Sanic, text
+
+from exceptions import Overloaded
+from middleware.ratelimit import Limit, LoadShedder, RateLimiter, admit, release
+
+
+class TestRateLimiter:
+    @pytest.mark.asyncio
+    async def test_local_bucket(self) -> None:
+        limiter = RateLimiter(batch=2)
+        assert [await limiter.acquire("a", 10, burst=3) for _ in range(3)] == [0, 0, 0]
+        retry_after = await limiter.acquire("a", 10, burst=3)
+        assert 0 < retry_after <= 0.1
+        # buckets are independent
+        assert await limiter.acquire("b", 10, burst=3) == 0
+        await asyncio.sleep(retry_after + 0.01)
+        assert await limiter.acquire("a", 10, burst=3) == 0
+
+    @pytest.mark.asyncio
+    async def test_borrow_is_shared(self) -> None:
+        limiter = RateLimiter(batch=5)
+        borrows = 0
+        borrow = limiter._borrow
+
+        async def counted(*args: object) -> float:
+            nonlocal borrows
+            borrows += 1
+            return await borrow(*args)  # type: ignore[arg-type]
+
+        limiter._borrow = counted  # type: ignore[assignment]
+        results = await asyncio.gather(*(limiter.acquire("a", 1, burst=5) for _ in range(5)))
+        assert results == [0] * 5
+        assert borrows == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_take_every_token(self) -> None:
+        limiter = RateLimiter(batch=10)
+        # more concurrent requests than a borrow grants, none is rejected while the bucket has tokens
+        results = await asyncio.gather(*(limiter.acquire("a", 1000, burst=1000) for _ in range(50)))
+        assert results == [0] * 50
+        results = await asyncio.gather(*(limiter.acquire("b", 1, burst=15) for _ in range(20)))
+        assert results.count(0) == 15
+
+    @pytest.mark.asyncio
+    async def test_unused_tokens_are_given_back(self) -> None:
+        limiter = RateLimiter(batch=5, lease=0.01)
+        assert await limiter.acquire("a", 1, burst=5) == 0
+        assert limiter._buckets["a"][0] < 1
+        await asyncio.sleep(0.02)
+        assert "a" not in limiter._borrowed
+        assert limiter._buckets["a"][0] >= 4
+
+    @pytest.mark.asyncio
+    async def test_unused_tokens_are_given_back_to_redis(self) -> None:
+        given_back = []
+
+        async def borrow(keys: list[str], args: list[float]) -> list[int]:
+            return [args[2], 0]
+
+        async def give_back(keys: list[str], args: list[float]) -> None:
+            given_back.append((keys, args))
+
+        limiter = RateLimiter(batch=5, lease=0.01, prefix="r:")
+        limiter.script, limiter.return_script = borrow, give_back  # type: ignore[assignment]
+        assert await limiter.acquire("a", 1, burst=5) == 0
+        assert await limiter.acquire("a", 1, burst=5) == 0
+        await asyncio.sleep(0.02)
+        assert given_back == [(["r:a"], [3, 5])]
+
+    def test_positive_rate(self) -> None:
+        with pytest.raises(ValueError):
+            Limit(0)
+
+
+class TestLoadShedder:
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self) -> None:
+        shedder = LoadShedder(1, queue_timeout=0.01, retry_after=2)
+        slot = await shedder.acquire()
+        with pytest.raises(Overloaded) as error:
+            await shedder.acquire()
+        assert error.value.headers == {"Retry-After": "2"}
+        slot.release()
+        slot.release()
+        assert shedder.stats() == {"in_flight": 0, "queued": 0}
+        (await shedder.acquire()).release()
+
+    @pytest.mark.asyncio
+    async def test_queue_full(self) -> None:
+        shedder = LoadShedder(1, max_queued=1, queue_timeout=1)
+        slot = await shedder.acquire()
+        waiting = asyncio.create_task(shedder.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await shedder.acquire()
+        slot.release()
+        (await waiting).release()
+
+    @pytest.mark.asyncio
+    async def test_collected_slot_is_released(self) -> None:
+        shedder = LoadShedder(1)
+        await shedder.acquire()
+        gc.collect()
+        assert shedder.in_flight == 0
+
+
+class TestAdmission:
+    def test_middleware(self) -> None:
+        app = Sanic(name="test_admission")
+        # the test client runs the server listeners on every request, the state is kept in between
+        app.ctx.settings = SimpleNamespace(RATE_LIMIT_RATE=None, RATE_LIMIT_BURST=None)
+        app.ctx.rate_limiter = RateLimiter(batch=1)
+        app.ctx.load_shedder = LoadShedder(1, max_queued=0, retry_after=3)
+
+        @app.get("/limited", ctx_rate_limit=Limit(0.01, burst=1))
+        async def limited(request: Request) -> HTTPResponse:
+            return text("ok")
+
+        @app.get("/slow")
+        async def slow(request: Request) -> HTTPResponse:
+            await asyncio.sleep(0.2)
+            return text("ok")
+
+        app.register_middleware(admit, "request")
+        app.register_middleware(release, "response")
+
+        async def run() -> list[int]:
+            _, first = await app.asgi_client.get("/limited")
+            _, second = await app.asgi_client.get("/limited")
+            assert second.headers["retry-after"] == "100"
+            responses = await asyncio.gather(app.asgi_client.get("/slow"), app.asgi_client.get("/slow"))
+            statuses = sorted(response.status for _, response in responses)
+            assert [response.headers.get("retry-after") for _, response in responses if response.status == 503] == ["3"]
+            return [first.status, second.status, *statuses]
+
+        assert asyncio.run(run()) == [200, 429, 200, 503]
@@ -0,0 +1,68 @@
+import time
+from multiprocessing import get_context
+
+import pytest
+
+from utils.shared import SharedStore
+
+
+def _increment(shared: SharedStore, times: int) -> None:
+    for _ in range(times):
+        shared.incr("hits")
+    shared.set("child", b"done")
+
+
+class TestSharedStore:
+    def test_get_set(self) -> None:
+        shared = SharedStore(slots=64, slot_size=64, counters=16)
+        assert shared.get("a") is None
+        assert shared.set("a", b"1")
+        assert shared.get("a") == b"1"
+        assert shared.set("a", b"22")
+        assert shared.get("a") == b"22"
+        shared.delete("a")
+        assert shared.get("a") is None
+        # too large for a slot
+        assert not shared.set("b", b"x" * 64)
+        assert shared.stats() == {"hits": 2, "misses": 2, "evictions": 0}
+
+    def test_expiry(self) -> None:
+        shared = SharedStore(slots=8, slot_size=64, counters=8)
+        shared.set("a", b"1", ttl=0.01)
+        time.sleep(0.02)
+        assert shared.get("a") is None
+
+    def test_lru_eviction(self) -> None:
+        # a single set of 4 slots
+        shared = SharedStore(slots=4, slot_size=16, counters=8, ways=4)
+        for key in "abcd":
+            shared.set(key, key.encode())
+        assert shared.get("a") == b"a"
+        shared.set("e", b"e")
+        assert shared.get("b") is None
+        assert [shared.get(key) for key in "acde"] == [b"a", b"c", b"d", b"e"]
+        assert shared.stats()["evictions"] == 1
+
+    def test_counters(self) -> None:
+        shared = SharedStore(slots=8, slot_size=16, counters=8, ways=8)
+        assert shared.counter("a") == 0
+        assert shared.incr("a") == 1
+        assert shared.incr("a", 5) == 6
+        assert shared.incr("a", -2) == 4
+        for i in range(7):
+            shared.incr(f"c{i}")
+        with pytest.raises(ValueError):
+            shared.incr("one too many")
+        with pytest.raises(ValueError):
+            shared.incr("x" * 48)
+
+    def test_shared_between_processes(self) -> None:
+        shared = SharedStore(slots=256, slot_size=64, counters=16)
+        context = get_context("fork")
+        processes = [context.Process(target=_increment, args=(shared, 200)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert shared.counter("hits") == 800
+        assert shared.get("child") == b"done"
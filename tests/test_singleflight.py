@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from redis.asyncio import ConnectionPool
+
+from utils.singleflight import SingleFlight, singleflight
+
+calls: list[str] = []
+
+
+@singleflight()
+async def load(name: str) -> str:
+    calls.append(name)
+    await asyncio.sleep(0.01)
+    if name == "fail":
+        raise ValueError(name)
+    return name.upper()
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_are_shared(self) -> None:
+        calls.clear()
+        results = await asyncio.gather(*(load("a") for _ in range(10)), load("b"))
+        assert results == ["A"] * 10 + ["B"]
+        assert calls == ["a", "b"]
+        assert len(load.flight) == 0  # type: ignore[attr-defined]
+
+        # once done, the next call runs again
+        assert await load("a") == "A"
+        assert calls == ["a", "b", "a"]
+
+    @pytest.mark.asyncio
+    async def test_exception_is_shared(self) -> None:
+        calls.clear()
+        results = await asyncio.gather(*(load("fail") for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert calls == ["fail"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller(self) -> None:
+        flight: SingleFlight[int] = SingleFlight()
+
+        async def compute() -> int:
+            await asyncio.sleep(0.01)
+            return 1
+
+        first = asyncio.create_task(flight.do("key", compute))
+        second = asyncio.create_task(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == 1
+
+    @pytest.mark.asyncio
+    async def test_unhashable_arguments(self) -> None:
+        counted: list[list[int]] = []
+
+        @singleflight()
+        async def total(values: list[int]) -> int:
+            counted.append(values)
+            await asyncio.sleep(0.01)
+            return sum(values)
+
+        assert await asyncio.gather(total([1, 2]), total([1, 2]), total([3])) == [3, 3, 3]
+        assert counted == [[1, 2], [3]]
+
+    @pytest.mark.asyncio
+    async def test_redis_unavailable(self) -> None:
+        # nothing listens on port 1, the lease cannot be taken
+        pool = ConnectionPool.from_url("redis://127.0.0.1:1/0")
+        ran: list[str] = []
+
+        @singleflight(distributed=True, redis=pool)
+        async def compute(name: str) -> str:
+            ran.append(name)
+            return name.upper()
+
+        assert await asyncio.gather(*(compute("a") for _ in range(5))) == ["A"] * 5
+        assert ran == ["a"]
+        await pool.disconnect()
@@ -0,0 +1,85 @@
+import json
+from typing import Any, AsyncIterator, Optional
+
+from sanic import HTTPResponse, Sanic
+from sqlalchemy import select
+
+from settings import Settings
+from setup import setup_database
+from tests.test_database import DSN, table
+from utils.context import Request, register_lazy
+from utils.streaming import stream_query, stream_rows
+
+
+class FakeRow:
+    def __init__(self, id: int) -> None:
+        self._mapping = {"id": id, "name": f"item {id}"}
+
+
+async def rows(count: int, events: Optional[list[str]] = None) -> AsyncIterator[FakeRow]:
+    for id in range(count):
+        yield FakeRow(id)
+    if events is not None:
+        events.append("exhausted")
+
+
+class FakeSession:
+    def __init__(self, events: list[str]) -> None:
+        self.events = events
+        self.info: dict[str, Any] = {}
+
+    async def stream(self, statement: Any, params: Any = None) -> AsyncIterator[FakeRow]:
+        return rows(2500, self.events)
+
+    def in_transaction(self) -> bool:
+        return True
+
+    async def commit(self) -> None:
+        self.events.append("commit")
+
+    async def rollback(self) -> None:
+        self.events.append("rollback")
+
+    async def close(self) -> None:
+        self.events.append("close")
+
+
+class TestStreaming:
+    def test_formats(self) -> None:
+        app = Sanic(name="test_streaming", request_class=Request)
+
+        @app.get("/ndjson")
+        async def ndjson(request: Request) -> HTTPResponse:
+            return await stream_rows(request, rows(1000), partition=100, buffer_size=1024)
+
+        @app.get("/json")
+        async def array(request: Request) -> HTTPResponse:
+            return await stream_rows(request, rows(int(request.args.get("count", 1000))), format="json")
+
+        _, response = app.test_client.get("/ndjson")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert len(lines) == 1000
+        assert json.loads(lines[-1]) == {"id": 999, "name": "item 999"}
+
+        _, response = app.test_client.get("/json")
+        assert response.headers["content-type"] == "application/json"
+        assert [item["id"] for item in response.json] == list(range(1000))
+
+        _, response = app.test_client.get("/json?count=0")
+        assert response.json == []
+
+    def test_session_is_finalized_after_streaming(self) -> None:
+        app = Sanic(name="test_streaming_session", request_class=Request)
+        setup_database(app, Settings(DATABASE_MASTER=DSN.format("localhost"), DEBUG=False))
+        events: list[str] = []
+        register_lazy(app, "db_session", lambda request: FakeSession(events))
+
+        @app.get("/export")
+        async def export(request: Request) -> HTTPResponse:
+            return await stream_query(request, select(table), buffer_size=4096)
+
+        _, response = app.test_client.get("/export")
+        assert len(response.text.splitlines()) == 2500
+        # `close_session` left the session open while rows were sent
+        assert events == ["exhausted", "commit", "close"]
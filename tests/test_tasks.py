@@ -0,0 +1,233 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from tasks import Cron, Scheduler, Task, TaskQueue, TaskQueueFull, periodic, task
+from tasks.scheduler import __jobs__, __queues__, __tasks__
+from tasks.spill import TaskConsumer, rabbitmq_spill
+from tests.test_publisher import FakeConnection
+
+
+def at(text: str) -> datetime:
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc)
+
+
+class TestCron:
+    def test_next(self) -> None:
+        assert Cron("*/15 * * * *").next(at("2022-01-01T10:07:30")) == at("2022-01-01T10:15:00")
+        assert Cron("0 3 * * *").next(at("2022-01-01T03:00:00")) == at("2022-01-02T03:00:00")
+        # 2022-01-03 is a monday
+        assert Cron("30 9 * * 1-5").next(at("2022-01-01T12:00:00")) == at("2022-01-03T09:30:00")
+        assert Cron("@monthly").next(at("2022-01-15T00:00:00")) == at("2022-02-01T00:00:00")
+        assert Cron("0 0 29 2 *").next(at("2022-03-01T00:00:00")) == at("2024-02-29T00:00:00")
+        # either day field matches when both are restricted
+        assert Cron("0 0 15 * 0").next(at("2022-01-03T00:00:00")) == at("2022-01-09T00:00:00")
+
+    def test_invalid(self) -> None:
+        for expr in ("* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *"):
+            with pytest.raises(ValueError):
+                Cron(expr)
+
+
+class TestTaskQueue:
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self) -> None:
+        queue = TaskQueue(concurrency=2)
+        queue.start()
+        running = []
+        peak = 0
+
+        async def work(i: int) -> int:
+            nonlocal peak
+            running.append(i)
+            peak = max(peak, len(running))
+            await asyncio.sleep(0.01)
+            running.remove(i)
+            return i * 2
+
+        futures = [await queue.submit(work, i) for i in range(6)]
+        assert await asyncio.gather(*futures) == [0, 2, 4, 6, 8, 10]
+        assert peak == 2
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_retries(self) -> None:
+        queue = TaskQueue(timeout=0.02, retries=2, backoff=0.01)
+        queue.start()
+        attempts = 0
+
+        async def flaky() -> str:
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                await asyncio.sleep(1)
+            return "done"
+
+        assert await (await queue.submit(flaky)) == "done"
+        assert attempts == 3
+        assert queue.stats()["retried"] == 2
+
+        async def broken() -> None:
+            raise ValueError("broken")
+
+        with pytest.raises(ValueError):
+            await (await queue.enqueue(queue.task(broken, retries=0)))
+        assert queue.stats()["failed"] == 1
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_spills(self) -> None:
+        spilled: list[Task] = []
+
+        async def spill(task: Task) -> bool:
+            spilled.append(task)
+            return len(spilled) == 1
+
+        queue = TaskQueue(max_size=1, spill=spill)
+
+        async def noop() -> None:
+            pass
+
+        await queue.submit(noop)
+        assert await (await queue.submit(noop)) is None
+        with pytest.raises(TaskQueueFull):
+            await queue.submit(noop)
+        assert queue.stats()["spilled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_close_drains(self) -> None:
+        queue = TaskQueue(concurrency=1)
+        queue.start()
+        done = []
+
+        async def slow(i: int) -> None:
+            await asyncio.sleep(0.01 if i < 2 else 1)
+            done.append(i)
+
+        futures = [await queue.submit(slow, i) for i in range(3)]
+        await queue.close(timeout=0.1)
+        assert done == [0, 1]
+        assert futures[2].cancelled()
+
+
+class TestScheduler:
+    @pytest.mark.asyncio
+    async def test_task_defer(self) -> None:
+        @task("test_tasks.double")
+        async def double(value: int) -> int:
+            return value * 2
+
+        assert __tasks__["test_tasks.double"] is double
+        assert await double(2) == 4
+        __queues__["default"] = queue = TaskQueue()
+        queue.start()
+        try:
+            assert await (await double.defer(3)) == 6
+        finally:
+            await queue.close()
+            del __queues__["default"]
+
+    @pytest.mark.asyncio
+    async def test_periodic_with_lease(self) -> None:
+        runs = []
+
+        @periodic(0.02, name="test_tasks.tick")
+        async def tick() -> None:
+            runs.append(1)
+
+        job = __jobs__.pop()
+        assert job.name == "test_tasks.tick"
+
+        class FakeRedis:
+            def __init__(self) -> None:
+                self.keys: set[str] = set()
+
+            async def set(self, key: str, value: str, nx: bool, px: int) -> Any:
+                if key in self.keys:
+                    return None
+                self.keys.add(key)
+                return True
+
+        __queues__["default"] = queue = TaskQueue()
+        queue.start()
+        redis = FakeRedis()
+        # two workers sharing the lease
+        schedulers = [Scheduler([job]), Scheduler([job])]
+        for scheduler in schedulers:
+            scheduler.redis = redis  # type: ignore[assignment]
+            scheduler.start()
+        try:
+            await asyncio.sleep(0.11)
+        finally:
+            for scheduler in schedulers:
+                await scheduler.stop()
+            await queue.close()
+            del __queues__["default"]
+        assert 3 <= len(runs) <= 6
+        assert len(runs) == len(redis.keys)
+
+
+class TestSpill:
+    @pytest.mark.asyncio
+    async def test_spill_and_consume(self) -> None:
+        results = []
+
+        @task("test_tasks.record")
+        async def record(value: int) -> None:
+            results.append(value)
+
+        connection = FakeConnection()
+        spill = rabbitmq_spill(connection, "scaffold.tasks")  # type: ignore[arg-type]
+        __queues__["default"] = queue = TaskQueue(max_size=1, spill=spill)
+        try:
+            await record.defer(1)
+            await record.defer(2)
+            assert queue.stats() == {**queue.stats(), "queued": 1, "spilled": 1}
+            exchange = connection.channels[0].default_exchange
+            assert exchange.published == [(b'{"task":"test_tasks.record","args":[2],"kwargs":{}}', "scaffold.tasks")]
+
+            # any worker runs the spilled task
+            queue.start()
+            consumer = TaskConsumer(SimpleNamespace(NAME="scaffold", TASK_SPILL_QUEUE=None))  # type: ignore[arg-type]
+            assert consumer.settings.queue_name == "scaffold.tasks"
+            message = SimpleNamespace(body=json.dumps({"task": "test_tasks.record", "args": [2], "kwargs": {}}))
+            await consumer.on_message(message)  # type: ignore[arg-type]
+            assert sorted(results) == [1, 2]
+        finally:
+            await queue.close()
+            del __queues__["default"]
+
+    @pytest.mark.asyncio
+    async def test_tasks_not_run_are_requeued(self) -> None:
+        @task("test_tasks.sleep")
+        async def sleep() -> None:
+            await asyncio.sleep(1)
+
+        requeued: list[bool] = []
+
+        async def nack(requeue: bool = True) -> None:
+            requeued.append(requeue)
+
+        consumer = TaskConsumer(SimpleNamespace(NAME="scaffold", TASK_SPILL_QUEUE=None))  # type: ignore[arg-type]
+        message = SimpleNamespace(body=json.dumps({"task": "test_tasks.sleep", "args": [], "kwargs": {}}), nack=nack)
+        # the queues are not set up yet
+        await consumer.on_message(message)  # type: ignore[arg-type]
+        assert requeued == [True]
+
+        # the queue is closed before the task is done
+        __queues__["default"] = queue = TaskQueue(concurrency=1)
+        queue.start()
+        try:
+            consuming = asyncio.create_task(consumer.on_message(message))  # type: ignore[arg-type]
+            await asyncio.sleep(0.01)
+            await queue.close(timeout=0.01)
+            await consuming
+            assert requeued == [True, True]
+            await consumer.on_message(message)  # type: ignore[arg-type]
+            assert requeued == [True, True, True]
+        finally:
+            del __queues__["default"]
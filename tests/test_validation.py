@@ -0,0 +1,98 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+from sanic import HTTPResponse, Request, Sanic, text
+
+from utils.validation import VALIDATION_LATENCY, Schema, serialize, validate
+
+
+class Tag(BaseModel):
+    name: str
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    created: datetime
+    tags: list[Tag] = []
+
+
+class Aliased(BaseModel):
+    item_id: int = Field(alias="itemId")
+
+
+class User(BaseModel):
+    name: str
+    token: str = Field("", exclude=True)
+
+
+class Account(User):
+    password: str
+
+
+class Page(BaseModel):
+    limit: int = 10
+    ids: list[int] = []
+    name: Optional[str]
+
+
+class TestSerialize:
+    def test_models(self) -> None:
+        item = Item(id=1, name="a", created=datetime(2022, 1, 1), tags=[Tag(name="x")])
+        assert json.loads(serialize(item)) == json.loads(item.json())
+        assert json.loads(serialize([item])) == [json.loads(item.json())]
+        assert json.loads(serialize(Aliased(itemId=1))) == {"itemId": 1}
+        assert json.loads(serialize(User(name="a", token="secret"))) == {"name": "a"}
+
+    def test_schema(self) -> None:
+        schema = Schema(list[Tag])
+        assert schema.validate([{"name": "x"}]) == [Tag(name="x")]
+        assert Schema(Page).repeated == {"ids"}
+
+
+class TestValidate:
+    def test_validate(self) -> None:
+        app = Sanic(name="test_validate")
+
+        @app.post("/items/<shop:int>")
+        @validate(Item, query=Page, response=Item, status=201)
+        async def create(request: Request, shop: int, body: Item, query: Page) -> dict:
+            assert shop == 1 and query.ids == [1, 2] and query.limit == 5
+            return {**body.dict(), "name": body.name.upper()}
+
+        @app.get("/plain")
+        @validate(query=Page)
+        async def plain(request: Request, query: Page) -> HTTPResponse:
+            return text(str(query.limit))
+
+        body = {"id": 1, "name": "a", "created": "2022-01-01T00:00:00"}
+        _, response = app.test_client.post("/items/1?ids=1&ids=2&limit=5", content=json.dumps(body))
+        assert response.status == 201
+        assert response.json["name"] == "A"
+        assert response.headers["content-type"] == "application/json"
+        assert ("test_validate.create", "serialize") in VALIDATION_LATENCY.values
+
+        _, response = app.test_client.post("/items/1", content=json.dumps({"id": "x"}))
+        assert response.status == 422
+        assert {error["loc"][0] for error in response.json["context"]["errors"]} == {"id", "name", "created"}
+
+        _, response = app.test_client.post("/items/1", content="{")
+        assert response.status == 400
+
+        _, response = app.test_client.get("/plain?limit=x")
+        assert response.status == 422
+        _, response = app.test_client.get("/plain?limit=3")
+        assert response.text == "3"
+
+    def test_response_subclass(self) -> None:
+        app = Sanic(name="test_response_subclass")
+
+        @app.get("/me")
+        @validate(response=User)
+        async def me(request: Request) -> User:
+            return Account(name="a", token="secret", password="secret")
+
+        _, response = app.test_client.get("/me")
+        assert response.json == {"name": "a"}
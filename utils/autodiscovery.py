@@ -1,51 +1,88 @@
-from glob import glob
-from importlib import import_module, util
-from inspect import getmembers
-from os.path import split
+import json
+from importlib import import_module
 from pathlib import Path
+from pkgutil import walk_packages
+from time import perf_counter
 from types import ModuleType
-from typing import Union
+from typing import Iterator, Optional, Union
 
 from sanic import Sanic
 from sanic.blueprints import Blueprint
+from sanic.log import logger
 
+Manifest = dict[str, list[str]]
+
+
+def _walk(module: ModuleType, recursive: bool) -> Iterator[ModuleType]:
+    # submodules are imported through the import system, so each one is executed once and shared with `sys.modules`
+    yield module
+    if recursive and hasattr(module, "__path__"):
+        for info in walk_packages(module.__path__, prefix=f"{module.__name__}."):
+            yield import_module(info.name)
 
-def autodiscover(app: Sanic, *module_names: Union[str, ModuleType], recursive: bool = False) -> None:
-    """
-    `autodiscover` will detect all blueprint defined in module_names and register to `app`.
-    """
-    mod = app.__module__
-    blueprints = set()
-    _imported = set()
 
-    def _find_bps(module: object) -> None:
-        nonlocal blueprints
+def _find_bps(module: ModuleType) -> list[str]:
+    return [name for name, member in vars(module).items() if isinstance(member, Blueprint)]
 
-        for _, member in getmembers(module):
-            if isinstance(member, Blueprint):
-                blueprints.add(member)
 
+def build_manifest(
+    *module_names: Union[str, ModuleType], recursive: bool = False, package: Optional[str] = None
+) -> Manifest:
+    """
+    `build_manifest` map every module of module_names defining blueprints to the names of its blueprints
+    """
+    manifest: Manifest = {}
     for module in module_names:
         if isinstance(module, str):
-            module = import_module(module, mod)
-            _imported.add(module.__file__)
-        _find_bps(module)
-
-        if recursive:
-            if module.__file__:
-                base = Path(module.__file__).parent
-                for path in glob(f"{base}/**/*.py", recursive=True):
-                    if path not in _imported:
-                        name = "module"
-                        if "__init__" in path:
-                            *_, name, __ = split(path)
-                        spec = util.spec_from_file_location(name, path)
-                        _imported.add(path)
-                        if spec:
-                            specmod = util.module_from_spec(spec)
-                            if spec.loader:
-                                spec.loader.exec_module(specmod)
-                        _find_bps(specmod)
-
-    for bp in blueprints:
+            module = import_module(module, package)
+        for submodule in _walk(module, recursive):
+            names = _find_bps(submodule)
+            if names:
+                manifest[submodule.__name__] = names
+    return manifest
+
+
+def write_manifest(path: Union[str, Path], *module_names: Union[str, ModuleType], recursive: bool = False) -> Manifest:
+    """
+    `write_manifest` build the manifest of module_names and save it to `path`, to be reused by `autodiscover`
+    """
+    manifest = build_manifest(*module_names, recursive=recursive)
+    Path(path).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def autodiscover(
+    app: Sanic,
+    *module_names: Union[str, ModuleType],
+    recursive: bool = False,
+    manifest: Optional[Union[str, Path]] = None,
+) -> None:
+    """
+    `autodiscover` will detect all blueprint defined in module_names and register to `app`.
+
+    if `manifest` is the path of an existing file written by `write_manifest`,
+    only the modules listed in it are imported, instead of walking module_names.
+    """
+    start = perf_counter()
+    if manifest and Path(manifest).exists():
+        found = json.loads(Path(manifest).read_text())
+        source = str(manifest)
+    else:
+        found = build_manifest(*module_names, recursive=recursive, package=app.__module__)
+        source = "scan"
+
+    # a blueprint may be imported by several modules, register it once and in discovery order
+    blueprints: dict[int, Blueprint] = {}
+    for module_name, names in found.items():
+        module = import_module(module_name)
+        for name in names:
+            bp = getattr(module, name)
+            blueprints.setdefault(id(bp), bp)
+
+    for bp in blueprints.values():
         app.blueprint(bp)
+
+    logger.info(
+        f"autodiscover registered {len(blueprints)} blueprints from {len(found)} modules "
+        f"({source}) in {(perf_counter() - start) * 1000:.1f}ms"
+    )
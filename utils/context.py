@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from sanic import Request as SanicRequest
+from sanic import Sanic
+
+LazyFactory = Callable[[SanicRequest], Any]
+
+
+def register_lazy(app: Sanic, name: str, factory: LazyFactory) -> None:
+    """
+    `register_lazy` register a factory for `request.ctx.{name}`
+
+    the factory is only called the first time the attribute is accessed within a request
+    """
+    if not hasattr(app.ctx, "lazy_factories"):
+        app.ctx.lazy_factories = {}
+    app.ctx.lazy_factories[name] = factory
+
+
+def is_resolved(ctx: Any, name: str) -> bool:
+    """
+    `is_resolved` tell whether `ctx.{name}` has been set, without triggering the lazy factory
+    """
+    return name in vars(ctx)
+
+
+class LazyContext(SimpleNamespace):
+    """
+    Request context resolving attributes registered with `register_lazy` on first access
+    """
+
+    def __init__(self, request: SanicRequest) -> None:
+        super().__init__()
+        self.__request = request
+
+    def __getattr__(self, name: str) -> Any:
+        # only called when the attribute is missing
+        if name.startswith("_"):
+            raise AttributeError(name)
+        factories: dict[str, LazyFactory] = getattr(self.__request.app.ctx, "lazy_factories", {})
+        if name not in factories:
+            raise AttributeError(name)
+        value = factories[name](self.__request)
+        setattr(self, name, value)
+        return value
+
+
+class Request(SanicRequest):
+    """
+    Request with a lazy `ctx`
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.ctx = LazyContext(self)
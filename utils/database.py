@@ -0,0 +1,118 @@
+try:
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+    from sqlalchemy.orm import Session
+    from sqlalchemy.sql import ClauseElement, Select
+except ImportError:
+    pass
+else:
+    from functools import wraps
+    from itertools import count
+    from time import monotonic
+    from typing import Any, Awaitable, Callable, Literal, Optional, Sequence, TypeVar
+
+    from sanic import Request
+    from sanic.log import logger
+
+    from utils.query_cache import CACHE, QueryCache
+
+    ReaderStrategy = Literal["round_robin", "least_connections"]
+    Handler = TypeVar("Handler", bound=Callable[..., Awaitable[Any]])
+
+    class ReaderSelector:
+        """
+        `ReaderSelector` pick one of the reader engines for each read
+        """
+
+        def __init__(self, readers: Sequence[AsyncEngine], strategy: ReaderStrategy = "round_robin") -> None:
+            self.readers = [reader.sync_engine for reader in readers]
+            self.strategy = strategy
+            self._counter = count()
+
+        def select(self) -> Optional[Engine]:
+            if not self.readers:
+                return None
+            if self.strategy == "least_connections":
+                return min(self.readers, key=lambda engine: engine.pool.checkedout())  # type: ignore[attr-defined]
+            return self.readers[next(self._counter) % len(self.readers)]
+
+    class RoutingSession(Session):
+        """
+        Session sending reads to a replica and everything else to the master
+
+        `SELECT` statements go to a reader unless the session has written within `sticky_window` seconds
+        (`None` means for the rest of the session), so a request always reads its own writes.
+        Setting `info["read_only"]` routes every read to a reader regardless of previous writes.
+        With the query cache, reads of a table invalidated within `QUERY_CACHE_REPLICA_LAG` seconds go to the master,
+        so a lagging replica does not cache the rows from before the write again.
+        """
+
+        def __init__(
+            self,
+            master: AsyncEngine,
+            readers: ReaderSelector,
+            sticky_window: Optional[float] = None,
+            **kwargs: Any,
+        ) -> None:
+            super().__init__(**kwargs)
+            self.master = master.sync_engine
+            self.readers = readers
+            self.sticky_window = sticky_window
+            self.wrote_at: Optional[float] = None
+
+        @staticmethod
+        def is_read(clause: Optional[ClauseElement]) -> bool:
+            return isinstance(clause, Select) and clause._for_update_arg is None
+
+        def is_sticky(self) -> bool:
+            if self.wrote_at is None:
+                return False
+            return self.sticky_window is None or monotonic() - self.wrote_at < self.sticky_window
+
+        def is_invalidated(self, clause: Optional[ClauseElement]) -> bool:
+            # the replicas may lag behind the writes which just invalidated the cached reads of a table
+            cache: Optional[QueryCache] = self.info.get(CACHE)
+            return cache is not None and clause is not None and cache.recently_invalidated(clause)
+
+        def get_bind(self, mapper: Any = None, clause: Optional[ClauseElement] = None, **kwargs: Any) -> Engine:
+            if self._flushing or not self.is_read(clause):
+                self.wrote_at = monotonic()
+                return self.master
+            if (self.info.get("read_only") or not self.is_sticky()) and not self.is_invalidated(clause):
+                reader = self.readers.select()
+                if reader is not None:
+                    return reader
+            return self.master
+
+    async def finalize_session(session: AsyncSession) -> None:
+        """
+        `finalize_session` commit the session if a transaction was begun, then close it
+
+        sessions that never talked to the database cost no round trip.
+        The cached reads of the tables the session wrote to are invalidated when it commits, see `utils.query_cache`.
+        """
+        try:
+            if session.in_transaction():
+                await session.commit()
+        except Exception as e:
+            logger.exception(e)
+            await session.rollback()
+        finally:
+            await session.close()
+
+    def transactional(handler: Handler) -> Handler:
+        """
+        `transactional` run the handler within an explicit transaction of `request.ctx.db_session`
+
+        the transaction is committed when the handler returns and rolled back if it raises,
+        a savepoint is used if the session is already in a transaction
+        """
+
+        @wraps(handler)
+        async def wrapper(request: Request, *args: Any, **kwargs: Any) -> Any:
+            session: AsyncSession = request.ctx.db_session
+            scope = session.begin_nested() if session.in_transaction() else session.begin()
+            async with scope:
+                return await handler(request, *args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
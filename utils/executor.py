@@ -0,0 +1,172 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial, wraps
+from importlib import import_module
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Literal, Optional, TypeVar, Union
+
+ExecutorKind = Literal["process", "thread"]
+Result = TypeVar("Result")
+
+
+class Offloader:
+    """
+    `Offloader` run functions on an executor and await their results from the event loop
+
+    at most `max_pending` calls are queued or running at once, timed out ones included, further callers wait for a slot
+    """
+
+    def __init__(self, executor: Executor, max_pending: int = 1000, timeout: Optional[float] = None) -> None:
+        self.executor = executor
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.run_time = 0.0
+        self.run_time_max = 0.0
+
+    async def run(
+        self, func: Callable[..., Result], *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> Result:
+        """
+        `run` call `func` on the executor, raise `asyncio.TimeoutError` if it takes longer than `timeout` seconds
+
+        a call timing out is no longer awaited, but a process or thread can not be interrupted,
+        so it keeps its worker busy, and its slot, until it returns
+        """
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self.submitted += 1
+        start = perf_counter()
+        try:
+            work = self.executor.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # released once the work is done, not when the caller stops waiting for it
+        work.add_done_callback(lambda _: _call_soon(loop, self._release))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(work), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            self.run_time += elapsed
+            self.run_time_max = max(self.run_time_max, elapsed)
+        self.completed += 1
+        return result
+
+    def _release(self) -> None:
+        self.pending -= 1
+        self._slots.release()
+
+    def stats(self) -> dict[str, Union[int, float]]:
+        """
+        `stats` call counters, run times are in seconds and include the time spent queued
+        """
+        return {
+            "pending": self.pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "run_time": self.run_time,
+            "run_time_max": self.run_time_max,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+    # the work may finish on another thread, or once the loop is closed
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass
+
+
+__offloaders__: dict[str, Offloader] = {}
+
+
+def get_offloader(kind: ExecutorKind) -> Offloader:
+    if kind not in __offloaders__:
+        raise RuntimeError(f"{kind} pool is not set up")
+    return __offloaders__[kind]
+
+
+async def offload(
+    func: Callable[..., Result],
+    *args: Any,
+    kind: ExecutorKind = "thread",
+    timeout: Optional[float] = None,
+    **kwargs: Any,
+) -> Result:
+    """
+    `offload` run `func` on the process or thread pool of the worker and await its result
+
+    functions run on the process pool, and their arguments, have to be picklable
+    """
+    return await get_offloader(kind).run(func, *args, timeout=timeout, **kwargs)
+
+
+def _call_offloaded(module: str, qualname: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+    # a decorated function is replaced by its wrapper in its module, so it is looked up by name in the child process
+    target: Any = import_module(module)
+    for name in qualname.split("."):
+        target = getattr(target, name)
+    return target.__offloaded__(*args, **kwargs)
+
+
+def _offloaded(
+    kind: ExecutorKind, timeout: Optional[float] = None
+) -> Callable[[Callable[..., Result]], Callable[..., Awaitable[Result]]]:
+    def decorator(func: Callable[..., Result]) -> Callable[..., Awaitable[Result]]:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Result:
+            if kind == "process":
+                return await offload(
+                    _call_offloaded, func.__module__, func.__qualname__, args, kwargs, kind=kind, timeout=timeout
+                )
+            return await offload(func, *args, kind=kind, timeout=timeout, **kwargs)
+
+        wrapper.__offloaded__ = func  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+def run_in_process(
+    timeout: Optional[float] = None,
+) -> Callable[[Callable[..., Result]], Callable[..., Awaitable[Result]]]:
+    """
+    `run_in_process` turn a CPU bound function into a coroutine function running it on the process pool
+
+    ```python
+    @run_in_process(timeout=5)
+    def render(data: bytes) -> bytes:
+        ...
+
+    await render(data)
+    ```
+
+    the function has to be defined at module level, its arguments and result have to be picklable
+    """
+    return _offloaded("process", timeout)
+
+
+def run_in_thread(
+    timeout: Optional[float] = None,
+) -> Callable[[Callable[..., Result]], Callable[..., Awaitable[Result]]]:
+    """
+    `run_in_thread` turn a blocking function into a coroutine function running it on the thread pool
+    """
+    return _offloaded("thread", timeout)
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Generic, Iterable, Optional, TypeVar
+
+Value = TypeVar("Value")
+
+
+class LRUCache(Generic[Value]):
+    """
+    `LRUCache` in-process cache with per entry expiry, bounded by entries and total size
+
+    entries can be tagged, to be invalidated together with `invalidate`
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[float, Value, int, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: str, count: bool = True) -> Optional[Value]:
+        item = self._data.get(key)
+        if item is None or item[0] <= monotonic():
+            if item is not None:
+                self.delete(key)
+            if count:
+                self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return item[1]
+
+    def set(self, key: str, value: Value, ttl: float, size: int = 0, tags: Iterable[str] = ()) -> None:
+        """
+        `set` store `value` for `ttl` seconds, `size` is accounted against `max_bytes`
+        """
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self.delete(key)
+        tags = tuple(tags)
+        self._data[key] = (monotonic() + ttl, value, size, tags)
+        self.bytes += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            self.delete(next(iter(self._data)))
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+        self.bytes -= item[2]
+        for tag in item[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """
+        `invalidate` delete every entry tagged with one of `tags`, return the number of entries deleted
+        """
+        keys = set().union(*(self._tags.get(tag, ()) for tag in tags))
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+        self.bytes = 0
@@ -0,0 +1,240 @@
+from typing import Any, Callable, Iterable, Optional, Sequence, Union
+
+try:
+    from orjson import dumps, loads
+except ImportError:
+    from json import dumps as json_dumps
+    from json import loads
+
+    def dumps(__obj: Any) -> bytes:  # type: ignore[misc]
+        return json_dumps(__obj).encode("utf-8")
+
+
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+Labels = tuple[str, ...]
+Snapshot = dict[str, dict[str, Any]]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    `Metric` a named family of values, one per combination of label values
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: dict[Labels, Any] = {}
+
+    def dump(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "help": self.help,
+            "labels": self.labels,
+            "values": [[key, value] for key, value in self.values.items()],
+        }
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, *labels: str, value: float) -> None:
+        """
+        `set` the total of a counter sampled from another source, such as a pool
+        """
+        self.values[labels] = value
+
+
+class Gauge(Metric):
+    """
+    `Gauge` a value that goes up and down, summed over the workers
+    """
+
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    `Histogram` count observations in buckets, each value is `[count per bucket..., sum]`
+
+    the last bucket is `+Inf`, buckets are made cumulative when rendered only
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels: str, value: float) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def dump(self) -> dict[str, Any]:
+        return {**super().dump(), "buckets": self.buckets}
+
+
+class Registry:
+    """
+    `Registry` the metrics of a worker
+
+    collectors are called before every snapshot, to sample values such as pool usage.
+    Workers write their snapshot in a shared directory, `collect` merges them: counters,
+    histograms and gauges are summed over the workers.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Any:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if existing.kind != metric.kind or existing.labels != metric.labels:
+                raise ValueError(f"metric {metric.name} is already registered with another type or labels")
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        self.collectors.append(func)
+        return func
+
+    def remove_collector(self, func: Optional[Callable[[], None]]) -> None:
+        if func in self.collectors:
+            self.collectors.remove(func)
+
+    def snapshot(self) -> Snapshot:
+        for collect in self.collectors:
+            collect()
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    def write(self, directory: Union[str, Path]) -> None:
+        """
+        `write` write the snapshot of this worker in `directory`
+        """
+        path = Path(directory, f"{os.getpid()}.json")
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(dumps(self.snapshot()))
+        # readers never see a partially written snapshot
+        os.replace(tmp, path)
+
+    def collect(self, directory: Optional[Union[str, Path]] = None, max_age: Optional[float] = None) -> Snapshot:
+        """
+        `collect` the snapshot of this worker merged with the ones the other workers wrote in `directory`
+
+        snapshots older than `max_age` seconds are of workers which died without removing theirs, they are deleted
+        """
+        snapshots = [self.snapshot()]
+        if directory is not None:
+            now = time.time()
+            for path in Path(directory).glob("*.json"):
+                if path.stem == str(os.getpid()):
+                    continue
+                try:
+                    if max_age is not None and now - path.stat().st_mtime > max_age:
+                        path.unlink(missing_ok=True)
+                        continue
+                    snapshots.append(loads(path.read_bytes()))
+                except (OSError, ValueError):
+                    # the worker is gone, or its snapshot is being replaced
+                    continue
+        return merge(snapshots)
+
+
+def merge(snapshots: Iterable[Snapshot]) -> Snapshot:
+    """
+    `merge` sum the values of the same metric and labels over several snapshots
+    """
+    merged: Snapshot = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            values: dict[Labels, Any] = target["values"]
+            for key, value in metric["values"]:
+                key = tuple(key)
+                if key not in values:
+                    values[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    values[key] = [a + b for a, b in zip(values[key], value)]
+                else:
+                    values[key] += value
+    for metric in merged.values():
+        metric["values"] = list(metric["values"].items())
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot: Snapshot) -> str:
+    """
+    `render` a snapshot in the prometheus text exposition format
+    """
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        kind, names = metric["kind"], metric["labels"]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(metric["values"], key=lambda item: tuple(item[0])):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                cumulative += count
+                le = f'le="{bound if bound == "+Inf" else _number(float(bound))}"'
+                lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency, from the request to the response", ("method", "route")
+)
@@ -0,0 +1,198 @@
+import asyncio
+import sys
+import threading
+from collections import Counter as Tally
+from cProfile import Profile
+from io import StringIO
+from os.path import basename
+from pstats import Stats
+from time import perf_counter, sleep
+from types import FrameType
+from typing import Optional
+
+from sanic import Request
+from sanic.log import logger
+
+from utils.metrics import REGISTRY
+
+SLOW_CALLBACKS = REGISTRY.counter(
+    "event_loop_slow_callbacks_total", "Event loop steps longer than the slow callback threshold", ("route",)
+)
+
+# one profile at a time per worker, profiles would measure each other
+_profiling = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame: Optional[FrameType], thread: str) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.append(thread)
+    return ";".join(reversed(names))
+
+
+def _sample(duration: float, interval: float) -> Tally[str]:
+    me = threading.get_ident()
+    stacks: Tally[str] = Tally()
+    deadline = perf_counter() + duration
+    while perf_counter() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                stacks[_collapse(frame, names.get(ident, str(ident)))] += 1
+        sleep(interval)
+    return stacks
+
+
+async def sample(duration: float, interval: float = 0.005) -> str:
+    """
+    `sample` the stacks of every thread of the worker, the event loop included, for `duration` seconds
+
+    stacks are returned collapsed, one `frame;frame;... count` line per stack, ready for flamegraph tools
+    """
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        # the sampler runs in its own thread, so it sees the loop busy or idle
+        loop = asyncio.get_running_loop()
+        result: asyncio.Future[Tally[str]] = loop.create_future()
+
+        def run() -> None:
+            try:
+                stacks = _sample(duration, interval)
+            except BaseException as e:
+                loop.call_soon_threadsafe(result.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(result.set_result, stacks)
+
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+        stacks = await result
+    finally:
+        _profiling.release()
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def profile(duration: float, sort: str = "cumulative", limit: int = 50) -> str:
+    """
+    `profile` every call made on the event loop for `duration` seconds, return the pstats report
+    """
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    profiler = Profile()
+    try:
+        profiler.enable()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            profiler.disable()
+    finally:
+        _profiling.release()
+    output = StringIO()
+    Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def _request(frame: Optional[FrameType]) -> Optional[Request]:
+    # the innermost sanic request found in the locals of the stack
+    while frame is not None:
+        if "request" in frame.f_code.co_varnames:
+            request = frame.f_locals.get("request")
+            if isinstance(request, Request):
+                return request
+        frame = frame.f_back
+    return None
+
+
+class SlowCallbackDetector:
+    """
+    `SlowCallbackDetector` log every event loop step longer than `threshold` seconds, with the request it ran for
+
+    the loop beats every `threshold / 4` seconds, a watchdog thread captures the stack of the loop when a beat is
+    late, and the step is logged with it once the loop is back. It works with uvloop too.
+    Nothing runs while the detector is disabled.
+    """
+
+    def __init__(self) -> None:
+        self.threshold: Optional[float] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._beat = 0.0
+        self._stalled: Optional[tuple[str, Optional[Request]]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._watchdog is not None
+
+    @property
+    def interval(self) -> float:
+        return max((self.threshold or 0) / 4, 0.001)
+
+    def enable(self, threshold: float) -> None:
+        """
+        `enable` watch the running loop, must be called from it
+        """
+        self.threshold = threshold
+        if self._watchdog is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._stalled = None
+        self._beat = perf_counter()
+        self._timer = self._loop.call_later(self.interval, self._tick)
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(threading.get_ident(),), name="slow-callbacks", daemon=True
+        )
+        self._watchdog.start()
+
+    def disable(self) -> None:
+        if self._watchdog is None:
+            return
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._watchdog.join(1)
+        self._watchdog = self._timer = self._loop = None
+
+    def _tick(self) -> None:
+        now = perf_counter()
+        stalled, self._stalled = self._stalled, None
+        if stalled is not None:
+            # the step ran from about the last beat to now
+            self.report(now - self._beat - self.interval, *stalled)
+        self._beat = now
+        if self._loop is not None and not self._stop.is_set():
+            self._timer = self._loop.call_later(self.interval, self._tick)
+
+    def _watch(self, loop_thread: int) -> None:
+        seen = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if beat == seen or perf_counter() - beat - self.interval < (self.threshold or 0):
+                continue
+            seen = beat
+            frame = sys._current_frames().get(loop_thread)
+            self._stalled = (_collapse(frame, "loop"), _request(frame))
+
+    def report(self, elapsed: float, stack: str, request: Optional[Request]) -> None:
+        route = "-"
+        where = ""
+        if request is not None:
+            route = request.route.name if request.route else "unmatched"
+            where = f" on {request.method} {request.path} ({route})"
+        SLOW_CALLBACKS.inc(route)
+        logger.warning(f"slow callback took {elapsed * 1000:.1f}ms{where}, blocked in {stack}")
+
+
+slow_callbacks = SlowCallbackDetector()
@@ -0,0 +1,286 @@
+try:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Dialect
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import ORMExecuteState, Session, UOWTransaction, object_mapper
+    from sqlalchemy.orm.loading import merge_frozen_result
+    from sqlalchemy.sql import ClauseElement
+    from sqlalchemy.sql.util import find_tables
+    from sqlalchemy.util import await_only
+except ImportError:
+    pass
+else:
+    import asyncio
+    import pickle
+    from hashlib import blake2b
+    from io import BytesIO
+    from time import monotonic
+    from typing import Any, Iterable, Optional
+    from uuid import uuid4
+
+    try:
+        from orjson import dumps, loads
+    except ImportError:
+        from json import dumps as json_dumps
+        from json import loads
+
+        def dumps(__obj: Any) -> bytes:  # type: ignore[misc]
+            return json_dumps(__obj).encode("utf-8")
+
+    try:
+        from redis.asyncio import ConnectionPool, Redis
+
+        from utils.redis import TAG_SCRIPT
+    except ImportError:
+        pass
+    from sanic.log import logger
+
+    from utils.lru import LRUCache
+
+    # `session.info` keys, the cache of the session and the tables it wrote to
+    CACHE = "query_cache"
+    WRITTEN = "written_tables"
+
+    def tables_of(statement: ClauseElement) -> set[str]:
+        """
+        `tables_of` the names of the tables `statement` reads from, subqueries and joins included
+        """
+        return {
+            str(table.fullname) for table in find_tables(statement, include_aliases=True) if hasattr(table, "fullname")
+        }
+
+    def mark_written(session: "Session | AsyncSession", *tables: str) -> None:
+        """
+        `mark_written` record writes the session cannot see, such as textual statements or `models.bulk`,
+        their cached reads are invalidated once the session is committed
+        """
+        info = session.info
+        info.setdefault(WRITTEN, set()).update(tables)
+
+    class QueryCache:
+        """
+        `QueryCache` two tier cache of query results, tagged with the tables they read
+
+        the first tier is a LRU in the worker, the second one is shared through redis.
+        Invalidations are published on `channel`, every worker subscribed drops its local entries of the tables.
+        Only statements with the `query_cache` execution option are cached, see `setup.setup_database`,
+        and not once the session wrote to one of their tables, until it is committed or rolled back.
+        The cached reads of the tables a session wrote to are invalidated when it commits.
+
+        ```python
+        items = await session.scalars(select(Item).where(Item.shop_id == shop_id).execution_options(query_cache=30))
+        ```
+        """
+
+        def __init__(
+            self,
+            dialect: Dialect,
+            ttl: float = 60,
+            max_entries: int = 1024,
+            max_bytes: Optional[int] = None,
+            replica_lag: float = 1.0,
+            redis: Optional["ConnectionPool"] = None,
+            prefix: str = "query:",
+            channel: Optional[str] = None,
+        ) -> None:
+            self.dialect = dialect
+            self.ttl = ttl
+            self.local: LRUCache[bytes] = LRUCache(max_entries, max_bytes)
+            self.replica_lag = replica_lag
+            # table: when it was last invalidated, by this worker or another one
+            self.invalidated: dict[str, float] = {}
+            self.redis = Redis(connection_pool=redis) if redis else None
+            self.tag_script = self.redis.register_script(TAG_SCRIPT) if self.redis else None
+            self.prefix = prefix
+            self.channel = channel or f"{prefix}invalidate"
+            # invalidations this worker published are already applied
+            self.origin = uuid4().hex
+            self._subscriber: Optional[asyncio.Task[None]] = None
+
+        def key(self, statement: ClauseElement, params: Optional[dict[str, Any]] = None) -> str:
+            """
+            `key` cache key of a statement, made of its compiled SQL and its parameters
+            """
+            compiled = statement.compile(dialect=self.dialect)
+            values = {**compiled.params, **(params or {})}
+            parts = f"{compiled}\0{sorted(values.items())!r}"
+            return blake2b(parts.encode(), digest_size=16).hexdigest()
+
+        def get(self, key: str) -> Optional[bytes]:
+            return self.local.get(key)
+
+        async def get_shared(self, key: str) -> Optional[bytes]:
+            if self.redis is None:
+                return None
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.get(self.prefix + key)
+                    pipe.pttl(self.prefix + key)
+                    data, pttl = await pipe.execute()
+            except Exception as e:
+                logger.warning(f"query cache unavailable: {e!r}")
+                return None
+            if data is not None:
+                # keep the local copy no longer than the shared one
+                self.local.set(key, data, max(pttl, 1) / 1000, size=len(data), tags=_tags(data))
+            return data
+
+        def set(self, key: str, data: bytes, ttl: float, tags: Iterable[str]) -> None:
+            self.local.set(key, data, ttl, size=len(data), tags=tags)
+
+        async def set_shared(self, key: str, data: bytes, ttl: float, tags: Iterable[str]) -> None:
+            if self.redis is None:
+                return
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.set(self.prefix + key, data, px=int(ttl * 1000))
+                    if tags:
+                        tag_keys = [f"{self.prefix}tag:{tag}" for tag in tags]
+                        await self.tag_script(keys=tag_keys, args=[key, int(ttl * 1000) + 1000], client=pipe)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"query cache unavailable: {e!r}")
+
+        async def invalidate(self, *tables: str) -> None:
+            """
+            `invalidate` drop the results read from one of `tables`, in redis and in every worker
+            """
+            if not tables:
+                return
+            self._invalidate_local(tables)
+            if self.redis is None:
+                return
+            tag_keys = [f"{self.prefix}tag:{table}" for table in tables]
+            try:
+                keys = await self.redis.sunion(tag_keys)
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    if keys:
+                        pipe.delete(*(self.prefix + key.decode() for key in keys))
+                    pipe.delete(*tag_keys)
+                    pipe.publish(self.channel, dumps({"origin": self.origin, "tables": list(tables)}))
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"query cache invalidation of {tables} failed: {e!r}")
+
+        def _invalidate_local(self, tables: Iterable[str]) -> None:
+            now = monotonic()
+            for table in tables:
+                self.local.invalidate(table)
+                self.invalidated[table] = now
+
+        def recently_invalidated(self, statement: ClauseElement) -> bool:
+            """
+            `recently_invalidated` whether a table `statement` reads was invalidated within `replica_lag` seconds,
+            a replica may not have the write yet, and the rows it returns would be cached again
+            """
+            since = monotonic() - self.replica_lag
+            recent = {table for table, at in self.invalidated.items() if at > since}
+            return bool(recent) and not recent.isdisjoint(tables_of(statement))
+
+        def start(self) -> None:
+            if self.redis is not None and self._subscriber is None:
+                self._subscriber = asyncio.create_task(self._subscribe(), name="query-cache-invalidations")
+
+        async def stop(self) -> None:
+            if self._subscriber is not None:
+                self._subscriber.cancel()
+                await asyncio.gather(self._subscriber, return_exceptions=True)
+                self._subscriber = None
+
+        async def _subscribe(self) -> None:
+            assert self.redis is not None
+            while True:
+                try:
+                    async with self.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        # the local entries may have missed invalidations while disconnected
+                        self.local.clear()
+                        async for message in pubsub.listen():
+                            invalidation = loads(message["data"])
+                            if invalidation["origin"] != self.origin:
+                                self._invalidate_local(invalidation["tables"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"query cache invalidations unavailable: {e!r}")
+                    self.local.clear()
+                    await asyncio.sleep(1)
+
+        def execute(self, state: "ORMExecuteState") -> Any:
+            """
+            `execute` serve a statement from the cache, or run it and cache its result
+
+            called within the greenlet of `AsyncSession`, the redis tier is awaited with `await_only`
+            """
+            statement = state.statement
+            key = self.key(statement, state.parameters)
+            data = self.get(key)
+            if data is None and self.redis is not None:
+                data = await_only(self.get_shared(key))
+            if data is not None:
+                frozen = _load(data)
+            else:
+                frozen = state.invoke_statement().freeze()
+                option = state.execution_options[CACHE]
+                ttl = self.ttl if option is True else float(option)
+                tags = tuple(state.execution_options.get("query_cache_tags") or tables_of(statement))
+                # the tags come first, so they can be read without loading the rows
+                data = pickle.dumps(tags) + pickle.dumps(frozen)
+                self.set(key, data, ttl, tags)
+                if self.redis is not None:
+                    await_only(self.set_shared(key, data, ttl, tags))
+            # orm entities are merged into the session, as if they were loaded
+            return merge_frozen_result(state.session, statement, frozen, load=False)()
+
+    def _tags(data: bytes) -> tuple[str, ...]:
+        return pickle.Unpickler(BytesIO(data)).load()
+
+    def _load(data: bytes) -> Any:
+        stream = BytesIO(data)
+        pickle.Unpickler(stream).load()
+        return pickle.Unpickler(stream).load()
+
+    def _pending(session: Session) -> set[str]:
+        return {
+            str(table.fullname)
+            for instance in (*session.new, *session.dirty, *session.deleted)
+            for table in object_mapper(instance).tables
+        }
+
+    def _reads_own_writes(state: "ORMExecuteState") -> bool:
+        # the uncommitted rows of the session must neither be served stale nor cached for the others
+        session = state.session
+        tables = tables_of(state.statement)
+        return not tables.isdisjoint(session.info.get(WRITTEN, ())) or not tables.isdisjoint(_pending(session))
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _do_orm_execute(state: "ORMExecuteState") -> Any:
+        if state.is_select:
+            cache: Optional[QueryCache] = state.session.info.get(CACHE)
+            if cache is not None and state.execution_options.get(CACHE) and not _reads_own_writes(state):
+                return cache.execute(state)
+        elif state.is_insert or state.is_update or state.is_delete:
+            mark_written(state.session, str(state.statement.table.fullname))
+        return None
+
+    @event.listens_for(Session, "after_flush")
+    def _after_flush(session: Session, flush_context: "UOWTransaction") -> None:
+        tables = _pending(session)
+        if tables:
+            mark_written(session, *tables)
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session: Session) -> None:
+        # every commit invalidates the tables it wrote to, the sessions of tasks and consumers as well as of requests
+        tables = session.info.pop(WRITTEN, None)
+        cache: Optional[QueryCache] = session.info.get(CACHE)
+        if tables and cache is not None:
+            if cache.redis is None:
+                cache._invalidate_local(sorted(tables))
+            else:
+                # within the greenlet of `AsyncSession.commit`
+                await_only(cache.invalidate(*sorted(tables)))
+
+    @event.listens_for(Session, "after_rollback")
+    def _after_rollback(session: Session) -> None:
+        session.info.pop(WRITTEN, None)
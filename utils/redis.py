@@ -0,0 +1,66 @@
+try:
+    from redis import asyncio as aioredis
+except ImportError:
+    pass
+else:
+    from time import perf_counter
+    from typing import Any, Union
+
+    class InstrumentedConnectionPool(aioredis.BlockingConnectionPool):
+        """
+        `BlockingConnectionPool` keeping track of checked out connections and the time spent acquiring them
+        """
+
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            self._checked_out: set[aioredis.Connection] = set()
+            self.waiting = 0
+            self.acquired = 0
+            self.wait_time = 0.0
+            self.wait_time_max = 0.0
+
+        async def get_connection(self, command_name: str, *keys: Any, **options: Any) -> aioredis.Connection:
+            start = perf_counter()
+            self.waiting += 1
+            try:
+                connection = await super().get_connection(command_name, *keys, **options)
+            finally:
+                self.waiting -= 1
+                elapsed = perf_counter() - start
+                self.wait_time += elapsed
+                self.wait_time_max = max(self.wait_time_max, elapsed)
+            self.acquired += 1
+            self._checked_out.add(connection)
+            return connection
+
+        async def release(self, connection: aioredis.Connection) -> None:
+            self._checked_out.discard(connection)
+            await super().release(connection)
+
+        def stats(self) -> dict[str, Union[int, float]]:
+            """
+            `stats` pool utilization, wait times are in seconds
+            """
+            created = len(self._connections)
+            in_use = len(self._checked_out)
+            return {
+                "max_connections": self.max_connections,
+                "created": created,
+                "in_use": in_use,
+                "idle": created - in_use,
+                "waiting": self.waiting,
+                "acquired": self.acquired,
+                "wait_time": self.wait_time,
+                "wait_time_max": self.wait_time_max,
+            }
+
+    # add ARGV[1] to the tag sets KEYS and extend their expiry to ARGV[2] milliseconds, never shorten it,
+    # so that a set outlives every entry it indexes and an invalidation finds them all
+    TAG_SCRIPT = """
+    for _, key in ipairs(KEYS) do
+        redis.call("SADD", key, ARGV[1])
+        if redis.call("PTTL", key) < tonumber(ARGV[2]) then
+            redis.call("PEXPIRE", key, ARGV[2])
+        end
+    end
+    """
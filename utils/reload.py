@@ -0,0 +1,102 @@
+import asyncio
+from os import stat
+from typing import Any, Callable, Iterable, Optional
+
+from sanic import Sanic
+from sanic.log import logger
+
+from settings import RELOADABLE, Settings, set_settings
+
+# `hook(app, conf)` applies the reloaded settings to the objects built from them
+ReloadHook = Callable[[Sanic, Settings], Any]
+
+
+def on_reload(app: Sanic, fields: Iterable[str], hook: ReloadHook) -> None:
+    """
+    `on_reload` call `hook` with the new settings when one of `fields` changed on reload
+    """
+    if not hasattr(app.ctx, "reload_hooks"):
+        app.ctx.reload_hooks = []
+    app.ctx.reload_hooks.append((frozenset(fields), hook))
+
+
+def changed_fields(old: Settings, new: Settings) -> list[str]:
+    return sorted(name for name in new.__fields__ if getattr(old, name) != getattr(new, name))
+
+
+def reload_settings(app: Sanic, new: Optional[Settings] = None) -> tuple[list[str], list[str]]:
+    """
+    `reload_settings` read the settings again and apply the fields of `RELOADABLE` which changed,
+    return the fields applied and the ones which need a restart
+
+    the settings are validated as a whole first, invalid ones raise `ValidationError` and nothing is applied.
+    The applied fields are swapped at once, in `app.ctx.settings` and `settings.get_settings`.
+    """
+    old: Settings = app.ctx.settings
+    new = new or type(old)()
+    changed = changed_fields(old, new)
+    applied = [name for name in changed if name in RELOADABLE]
+    ignored = [name for name in changed if name not in RELOADABLE]
+    if ignored:
+        logger.warning(f"settings {', '.join(ignored)} changed, they are applied on restart")
+    if not applied:
+        return applied, ignored
+    conf = old.copy(update={name: getattr(new, name) for name in applied})
+    app.ctx.settings = conf
+    set_settings(conf)
+    for fields, hook in getattr(app.ctx, "reload_hooks", ()):
+        if fields.isdisjoint(applied):
+            continue
+        try:
+            hook(app, conf)
+        except Exception as e:
+            logger.exception(e)
+    logger.info(f"settings {', '.join(applied)} reloaded")
+    return applied, ignored
+
+
+class ConfigWatcher:
+    """
+    `ConfigWatcher` reload the settings of a worker when the config file changes
+
+    the file is polled every `CONFIG_WATCH_INTERVAL` seconds, a rewrite is noticed from its modification time and size
+    """
+
+    def __init__(self, app: Sanic, file: str) -> None:
+        self.app = app
+        self.file = file
+        self._signature = self.signature()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def signature(self) -> Optional[tuple[int, int]]:
+        try:
+            result = stat(self.file)
+        except OSError:
+            return None
+        return result.st_mtime_ns, result.st_size
+
+    def check(self) -> None:
+        signature = self.signature()
+        if signature == self._signature:
+            return
+        self._signature = signature
+        try:
+            reload_settings(self.app)
+        except ValueError as e:
+            # invalid json or invalid settings, the running ones are kept
+            logger.error(f"{self.file} rejected: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(), name="config-watcher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.app.ctx.settings.CONFIG_WATCH_INTERVAL)
+            self.check()
@@ -0,0 +1,209 @@
+import mmap
+import struct
+from hashlib import blake2b
+from multiprocessing import get_context
+from multiprocessing.synchronize import Lock
+from time import monotonic
+from typing import Optional
+
+# hits, misses, evictions of a set
+SET = struct.Struct("<QQQ")
+# hash, expiry (0 for never), last use, key length, value length
+ENTRY = struct.Struct("<QddHI")
+# hash, value, name length
+COUNTER = struct.Struct("<QqB")
+COUNTER_NAME_MAX = 47
+
+
+def _hash(key: bytes) -> int:
+    # `hash` is salted per process, the workers must agree on the slot of a key
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class SharedStore:
+    """
+    `SharedStore` key/value cache and counters in memory shared by the workers forked from the main process
+
+    the cache is an array of `slots` slots of `slot_size` bytes, a key may only live in one of the `ways` slots
+    of its set, the least recently used of them is evicted. Counters are updated atomically.
+    Reads and writes take the lock of the set, one of `locks`, no redis round trip is involved.
+    Create it before the workers fork, see `setup.setup_shared`.
+
+    ```python
+    shared: SharedStore = request.app.ctx.shared
+    shared.set(f"user:{user_id}", dumps(user), ttl=30)
+    shared.incr("signups")
+    ```
+    """
+
+    def __init__(
+        self,
+        slots: int = 4096,
+        slot_size: int = 1024,
+        counters: int = 1024,
+        ways: int = 8,
+        locks: int = 64,
+    ) -> None:
+        self.ways = ways
+        self.sets = max(1, slots // ways)
+        self.counter_sets = max(1, counters // ways)
+        self.slot_size = slot_size
+        self._entry_stride = ENTRY.size + slot_size
+        self._set_stride = SET.size + ways * self._entry_stride
+        self._counter_stride = COUNTER.size + COUNTER_NAME_MAX
+        self._counters = self.sets * self._set_stride
+        size = self._counters + self.counter_sets * ways * self._counter_stride
+        # anonymous shared mapping, inherited by forked workers and released with the last of them
+        self._buffer = mmap.mmap(-1, size, flags=mmap.MAP_SHARED)
+        context = get_context("fork")
+        self._locks = [context.Lock() for _ in range(min(locks, max(self.sets, self.counter_sets)))]
+
+    @property
+    def capacity(self) -> int:
+        return self.sets * self.ways
+
+    def _lock(self, index: int) -> Lock:
+        return self._locks[index % len(self._locks)]
+
+    def _count(self, index: int, field: int) -> None:
+        # called with the lock of the set held
+        offset = index * self._set_stride
+        values = list(SET.unpack_from(self._buffer, offset))
+        values[field] += 1
+        SET.pack_into(self._buffer, offset, *values)
+
+    def _find(self, index: int, hashed: int, key: bytes) -> Optional[int]:
+        buffer = self._buffer
+        base = index * self._set_stride + SET.size
+        for way in range(self.ways):
+            offset = base + way * self._entry_stride
+            entry_hash, _, _, key_length, _ = ENTRY.unpack_from(buffer, offset)
+            start = offset + ENTRY.size
+            end = start + key_length
+            if entry_hash == hashed and buffer[start:end] == key:
+                return offset
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = key.encode()
+        hashed = _hash(encoded)
+        index = hashed % self.sets
+        with self._lock(index):
+            offset = self._find(index, hashed, encoded)
+            value = None
+            if offset is not None:
+                _, expires, _, key_length, value_length = ENTRY.unpack_from(self._buffer, offset)
+                if expires and expires <= monotonic():
+                    ENTRY.pack_into(self._buffer, offset, 0, 0, 0, 0, 0)
+                else:
+                    # the monotonic clock is the same in every process, it orders the uses of the workers
+                    ENTRY.pack_into(self._buffer, offset, hashed, expires, monotonic(), key_length, value_length)
+                    start = offset + ENTRY.size + key_length
+                    end = start + value_length
+                    value = self._buffer[start:end]
+            self._count(index, 0 if value is not None else 1)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """
+        `set` store `value` for `ttl` seconds, or until evicted, return `False` if it does not fit in a slot
+        """
+        encoded = key.encode()
+        if len(encoded) + len(value) > self.slot_size:
+            return False
+        hashed = _hash(encoded)
+        index = hashed % self.sets
+        now = monotonic()
+        expires = now + ttl if ttl is not None else 0.0
+        with self._lock(index):
+            offset = self._find(index, hashed, encoded)
+            if offset is None:
+                offset = self._victim(index)
+            ENTRY.pack_into(self._buffer, offset, hashed, expires, now, len(encoded), len(value))
+            data = encoded + value
+            start = offset + ENTRY.size
+            end = start + len(data)
+            self._buffer[start:end] = data
+        return True
+
+    def _victim(self, index: int) -> int:
+        # an empty or expired slot if any, otherwise the least recently used one
+        base = index * self._set_stride + SET.size
+        now = monotonic()
+        victim, oldest = base, None
+        for way in range(self.ways):
+            offset = base + way * self._entry_stride
+            entry_hash, expires, last_used, _, _ = ENTRY.unpack_from(self._buffer, offset)
+            if entry_hash == 0 or (expires and expires <= now):
+                return offset
+            if oldest is None or last_used < oldest:
+                victim, oldest = offset, last_used
+        self._count(index, 2)
+        return victim
+
+    def delete(self, key: str) -> None:
+        encoded = key.encode()
+        hashed = _hash(encoded)
+        index = hashed % self.sets
+        with self._lock(index):
+            offset = self._find(index, hashed, encoded)
+            if offset is not None:
+                ENTRY.pack_into(self._buffer, offset, 0, 0, 0, 0, 0)
+
+    def _counter(self, index: int, hashed: int, name: bytes, create: bool) -> Optional[int]:
+        buffer = self._buffer
+        base = self._counters + index * self.ways * self._counter_stride
+        empty = None
+        for way in range(self.ways):
+            offset = base + way * self._counter_stride
+            counter_hash, _, length = COUNTER.unpack_from(buffer, offset)
+            start = offset + COUNTER.size
+            end = start + length
+            if counter_hash == hashed and buffer[start:end] == name:
+                return offset
+            if counter_hash == 0 and empty is None:
+                empty = offset
+        if not create:
+            return None
+        if empty is None:
+            raise ValueError(f"no counter slot left for {name.decode()!r}, raise the number of counters")
+        COUNTER.pack_into(buffer, empty, hashed, 0, len(name))
+        start = empty + COUNTER.size
+        end = start + len(name)
+        buffer[start:end] = name
+        return empty
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        """
+        `incr` add `amount` to the counter `name` and return its new value, counters start at 0 and are never evicted
+        """
+        encoded = name.encode()
+        if len(encoded) > COUNTER_NAME_MAX:
+            raise ValueError(f"counter name {name!r} longer than {COUNTER_NAME_MAX} bytes")
+        hashed = _hash(encoded)
+        index = hashed % self.counter_sets
+        with self._lock(index):
+            offset = self._counter(index, hashed, encoded, create=True)
+            assert offset is not None
+            _, value, length = COUNTER.unpack_from(self._buffer, offset)
+            value += amount
+            COUNTER.pack_into(self._buffer, offset, hashed, value, length)
+        return value
+
+    def counter(self, name: str) -> int:
+        encoded = name.encode()
+        hashed = _hash(encoded)
+        index = hashed % self.counter_sets
+        with self._lock(index):
+            offset = self._counter(index, hashed, encoded, create=False)
+            return 0 if offset is None else COUNTER.unpack_from(self._buffer, offset)[1]
+
+    def stats(self) -> dict[str, int]:
+        totals = [0, 0, 0]
+        for index in range(self.sets):
+            for field, value in enumerate(SET.unpack_from(self._buffer, index * self._set_stride)):
+                totals[field] += value
+        return dict(zip(("hits", "misses", "evictions"), totals))
+
+    def close(self) -> None:
+        self._buffer.close()
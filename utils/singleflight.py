@@ -0,0 +1,162 @@
+try:
+    from redis.asyncio import ConnectionPool, Redis
+except ImportError:
+    pass
+import asyncio
+from functools import wraps
+from hashlib import blake2b
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Generic,
+    Hashable,
+    Optional,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
+
+from sanic import Request
+from sanic.log import logger
+
+Result = TypeVar("Result")
+
+# delete the lock only if it is still ours
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight(Generic[Result]):
+    """
+    `SingleFlight` share one in-flight call between the concurrent callers asking for the same key
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future[Result]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Result]]) -> Result:
+        """
+        `do` await `func` unless a call for `key` is already in flight, in which case its result is shared
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        # a caller being cancelled does not cancel the call shared with the others
+        return await asyncio.shield(call)
+
+
+async def _leased(
+    redis: "Redis", key: str, func: Callable[[], Awaitable[Result]], ttl: float, wait: float, poll: float
+) -> Result:
+    # one worker holds the lease and computes, the others wait for it to be released then call `func` themselves,
+    # by then they are expected to hit the cache the lease holder filled
+    # without redis, the calls are only coalesced within the worker
+    token = uuid4().hex
+    try:
+        leased = await redis.set(key, token, nx=True, px=int(ttl * 1000))
+    except Exception as e:
+        logger.warning(f"singleflight lease unavailable: {e!r}")
+        return await func()
+    if leased:
+        try:
+            return await func()
+        finally:
+            try:
+                await redis.eval(RELEASE_SCRIPT, 1, key, token)
+            except Exception as e:
+                # the lease expires after `ttl` anyway
+                logger.warning(f"singleflight lease not released: {e!r}")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    try:
+        while loop.time() < deadline and await redis.exists(key):
+            await asyncio.sleep(poll)
+    except Exception as e:
+        logger.warning(f"singleflight lease unavailable: {e!r}")
+    return await func()
+
+
+def _default_key(func: Callable[..., Any], args: tuple[Any, ...], kwargs: dict[str, Any]) -> Hashable:
+    # requests differ for every caller, they are not part of the key
+    key = (
+        func.__module__,
+        func.__qualname__,
+        tuple(arg for arg in args if not isinstance(arg, Request)),
+        tuple(sorted((name, value) for name, value in kwargs.items() if not isinstance(value, Request))),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        # unhashable arguments such as lists or dicts are keyed by their repr
+        return blake2b(repr(key).encode(), digest_size=16).hexdigest()
+    return key
+
+
+def singleflight(
+    key: Optional[Callable[..., Hashable]] = None,
+    *,
+    distributed: bool = False,
+    redis: Optional[Union["ConnectionPool", Callable[[], "ConnectionPool"]]] = None,
+    lock_ttl: float = 5,
+    lock_wait: float = 5,
+    poll: float = 0.01,
+    prefix: str = "singleflight:",
+) -> Callable[[Callable[..., Awaitable[Result]]], Callable[..., Awaitable[Result]]]:
+    """
+    `singleflight` coalesce concurrent calls of an async function with the same arguments into one call
+
+    `key` computes the key from the call arguments, it defaults to every argument but the `Request` ones,
+    unhashable arguments are compared by their `repr`.
+
+    With `distributed`, only the worker holding a short redis lease runs the function, the others wait for
+    the lease to be released (at most `lock_wait` seconds) before running it, so the function should read
+    through a cache. The redis pool is `redis`, or `request.app.ctx.redis` of a `Request` argument;
+    without any, or when redis fails, calls are only coalesced within the worker.
+
+    ```python
+    @singleflight(distributed=True)
+    async def popular_items(request: Request, category: str) -> list[Item]:
+        ...
+    ```
+    """
+
+    def decorator(func: Callable[..., Awaitable[Result]]) -> Callable[..., Awaitable[Result]]:
+        flight: SingleFlight[Result] = SingleFlight()
+
+        def _pool(args: tuple[Any, ...], kwargs: dict[str, Any]) -> Optional["ConnectionPool"]:
+            if redis is not None:
+                return redis() if callable(redis) else redis
+            for arg in (*args, *kwargs.values()):
+                if isinstance(arg, Request):
+                    return getattr(arg.app.ctx, "redis", None)
+            return None
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Result:
+            call_key = key(*args, **kwargs) if key else _default_key(func, args, kwargs)
+
+            def call() -> Awaitable[Result]:
+                pool = _pool(args, kwargs) if distributed else None
+                if pool is None:
+                    return func(*args, **kwargs)
+                lock_key = prefix + blake2b(repr(call_key).encode(), digest_size=16).hexdigest()
+                return _leased(
+                    Redis(connection_pool=pool), lock_key, lambda: func(*args, **kwargs), lock_ttl, lock_wait, poll
+                )
+
+            return await flight.do(call_key, call)
+
+        wrapper.flight = flight  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
@@ -0,0 +1,159 @@
+import mimetypes
+from dataclasses import dataclass, field
+from os import stat_result
+from pathlib import Path
+from typing import Iterator, Mapping, Optional
+
+from sanic import Request
+from sanic.exceptions import NotFound
+from sanic.response import BaseHTTPResponse, HTTPResponse, file_stream, raw
+
+from middleware.compression import (
+    COMPRESSIBLE_TYPES,
+    ENCODERS,
+    EXTENSIONS,
+    Encoder,
+    negotiate,
+)
+
+# the highest levels, assets are compressed once at build time
+BUILD_LEVELS = {"br": 11, "zstd": 19, "gzip": 9}
+
+
+@dataclass
+class Variant:
+    path: Path
+    size: int
+    etag: str
+    # the content of the files small enough to be kept in memory
+    body: Optional[bytes] = None
+
+
+@dataclass
+class Asset:
+    content_type: str
+    # encoding: variant, `identity` is the file itself
+    variants: dict[str, Variant] = field(default_factory=dict)
+
+
+def etag_of(stat: stat_result, encoding: str = "identity") -> str:
+    # every encoding is a representation of its own, with its own strong etag
+    suffix = "" if encoding == "identity" else f"-{encoding}"
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}{suffix}"'
+
+
+def content_type_of(path: Path) -> str:
+    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def is_compressible(path: Path) -> bool:
+    return content_type_of(path).split(";", 1)[0] in COMPRESSIBLE_TYPES
+
+
+def sources(root: Path) -> Iterator[Path]:
+    """
+    `sources` the files of `root`, without the precompressed variants of the others
+    """
+    extensions = set(EXTENSIONS.values())
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        if path.suffix in extensions and path.with_suffix("").is_file():
+            continue
+        yield path
+
+
+def precompress(
+    root: Path,
+    encoders: Optional[Mapping[str, Encoder]] = None,
+    levels: Mapping[str, int] = BUILD_LEVELS,
+) -> dict[str, int]:
+    """
+    `precompress` write the compressed variants of the compressible files of `root` next to them,
+    return the number of variants written per encoding
+
+    a variant is rewritten only when its file changed since, and not kept unless it is smaller than the file
+    """
+    encoders = {name: encoder for name, encoder in (encoders or ENCODERS).items() if name in EXTENSIONS}
+    written = dict.fromkeys(encoders, 0)
+    for path in sources(root):
+        if not is_compressible(path):
+            continue
+        mtime = path.stat().st_mtime_ns
+        body: Optional[bytes] = None
+        for encoding, encoder in encoders.items():
+            target = path.with_name(path.name + EXTENSIONS[encoding])
+            if target.is_file() and target.stat().st_mtime_ns >= mtime:
+                continue
+            body = path.read_bytes() if body is None else body
+            compressed = encoder(body, levels.get(encoding, 9))
+            if len(compressed) < len(body):
+                target.write_bytes(compressed)
+                written[encoding] += 1
+            else:
+                target.unlink(missing_ok=True)
+    return written
+
+
+class Statics:
+    """
+    `Statics` serve the files of `root` with their precompressed variants, see `scripts/precompress.py`
+
+    the files are indexed once when the worker starts, files up to `memory_max` bytes are kept in memory,
+    larger ones are streamed from disk. Responses carry an etag and are cached by clients for `max_age` seconds,
+    so the assets should have versioned names.
+    """
+
+    def __init__(self, root: str | Path, max_age: int = 31536000, memory_max: int = 256 * 1024) -> None:
+        self.root = Path(root)
+        self.max_age = max_age
+        self.memory_max = memory_max
+        self.assets: dict[str, Asset] = {}
+
+    def scan(self) -> None:
+        assets: dict[str, Asset] = {}
+        for path in sources(self.root):
+            asset = Asset(content_type_of(path))
+            stat = path.stat()
+            asset.variants["identity"] = self._variant(path, stat, etag_of(stat))
+            for encoding, extension in EXTENSIONS.items():
+                variant = path.with_name(path.name + extension)
+                # a variant older than its file is stale, `scripts/precompress.py` was not run again
+                if variant.is_file() and variant.stat().st_mtime_ns >= stat.st_mtime_ns:
+                    asset.variants[encoding] = self._variant(variant, variant.stat(), etag_of(stat, encoding))
+            assets[path.relative_to(self.root).as_posix()] = asset
+        self.assets = assets
+
+    def _variant(self, path: Path, stat: stat_result, etag: str) -> Variant:
+        body = path.read_bytes() if stat.st_size <= self.memory_max else None
+        return Variant(path, stat.st_size, etag, body)
+
+    async def serve(self, request: Request, path: str) -> BaseHTTPResponse:
+        asset = self.assets.get(path)
+        if asset is None:
+            raise NotFound(f"Requested URL {request.path} not found")
+        encodings = [encoding for encoding in asset.variants if encoding != "identity"]
+        encoding = negotiate(request.headers.get("accept-encoding", ""), encodings) or "identity"
+        variant = asset.variants[encoding]
+
+        headers = {
+            "etag": variant.etag,
+            "cache-control": f"public, max-age={self.max_age}",
+        }
+        if encodings:
+            headers["vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or variant.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+        ):
+            return HTTPResponse(status=304, headers=headers)
+        if variant.body is not None:
+            return raw(variant.body, headers=headers, content_type=asset.content_type)
+        headers["content-length"] = str(variant.size)
+        return await file_stream(variant.path, chunk_size=64 * 1024, mime_type=asset.content_type, headers=headers)
@@ -0,0 +1,133 @@
+from typing import Any, AsyncIterable, Callable, Literal, Optional, Union
+
+try:
+    from orjson import dumps
+except ImportError:
+    from json import dumps as json_dumps
+
+    def dumps(__obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:  # type: ignore[misc]
+        return json_dumps(__obj, default=default).encode("utf-8")
+
+
+from sanic import Request
+from sanic.response import BaseHTTPResponse
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+    from sqlalchemy.sql import Executable
+
+    from utils.database import finalize_session
+except ImportError:
+    pass
+
+Format = Literal["ndjson", "json"]
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def row_to_dict(row: Any) -> Any:
+    """
+    `row_to_dict` the default serialization of a row, sqlalchemy rows and asyncpg records become dicts
+    """
+    mapping = getattr(row, "_mapping", None)
+    if mapping is not None:
+        return dict(mapping)
+    return dict(row)
+
+
+def hold_session(request: Request) -> None:
+    """
+    `hold_session` keep `close_session` from finalizing `request.ctx.db_session` when the response is sent,
+    the caller finalizes it
+    """
+    request.ctx.db_session_held = True
+
+
+async def _rows(result: Union["AsyncResult", AsyncIterable[Any]], partition: int) -> AsyncIterable[list[Any]]:
+    if hasattr(result, "partitions"):
+        async for rows in result.partitions(partition):  # type: ignore[union-attr]
+            yield rows
+        return
+    rows = []
+    async for row in result:  # type: ignore[union-attr]
+        rows.append(row)
+        if len(rows) >= partition:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+async def stream_rows(
+    request: Request,
+    result: Union["AsyncResult", AsyncIterable[Any]],
+    *,
+    format: Format = "ndjson",
+    serialize: Callable[[Any], Any] = row_to_dict,
+    default: Optional[Callable[[Any], Any]] = None,
+    partition: int = 1000,
+    buffer_size: int = 64 * 1024,
+    status: int = 200,
+    headers: Optional[dict[str, str]] = None,
+) -> BaseHTTPResponse:
+    """
+    `stream_rows` send rows as they are fetched, as newline delimited JSON or as a JSON array
+
+    rows are fetched `partition` at a time and written once `buffer_size` bytes are serialized,
+    the next rows are only fetched once the client has read the previous ones, so memory does not grow
+    with the size of the result. `result` is an `AsyncSession.stream()` result, or any async iterable of rows
+    such as an asyncpg cursor.
+    """
+    response = await request.respond(status=status, headers=headers, content_type=CONTENT_TYPES[format])
+    array = format == "json"
+    separator = b"," if array else b"\n"
+    buffer = bytearray(b"[" if array else b"")
+    first = True
+    async for rows in _rows(result, partition):
+        for row in rows:
+            if array and not first:
+                buffer += separator
+            buffer += dumps(serialize(row), default=default)
+            if not array:
+                buffer += separator
+            first = False
+        if len(buffer) >= buffer_size:
+            # waits for the transport to drain
+            await response.send(bytes(buffer))
+            buffer.clear()
+    if array:
+        buffer += b"]"
+    if buffer:
+        await response.send(bytes(buffer))
+    await response.eof()
+    return response
+
+
+async def stream_query(
+    request: Request,
+    statement: "Executable",
+    params: Optional[dict[str, Any]] = None,
+    **kwargs: Any,
+) -> BaseHTTPResponse:
+    """
+    `stream_query` run `statement` on a server side cursor of `request.ctx.db_session` and stream its rows,
+    see `stream_rows` for the options
+
+    the session is finalized once the last row is sent, rather than when the response starts
+
+    ```python
+    @bp.get("/items/export", ctx_read_only=True)
+    async def export(request: Request) -> HTTPResponse:
+        return await stream_query(request, select(Item.__table__))
+    ```
+    """
+    session: AsyncSession = request.ctx.db_session
+    hold_session(request)
+    try:
+        # errors of the query itself are still answered with an error response
+        result = await session.stream(statement, params)
+        return await stream_rows(request, result, **kwargs)
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        await finalize_session(session)
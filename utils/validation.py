@@ -0,0 +1,163 @@
+from functools import wraps
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+try:
+    from orjson import dumps, loads
+except ImportError:
+    from json import dumps as json_dumps
+    from json import loads
+
+    def dumps(__obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:  # type: ignore[misc]
+        return json_dumps(__obj, default=default).encode("utf-8")
+
+
+from pydantic import BaseModel, ValidationError, create_model
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.json import pydantic_encoder
+from sanic import HTTPResponse, Request
+from sanic.exceptions import InvalidUsage
+from sanic.response import BaseHTTPResponse, raw
+
+from exceptions import ValidationFailed
+from utils.metrics import REGISTRY
+
+Handler = TypeVar("Handler", bound=Callable[..., Awaitable[Any]])
+
+VALIDATION_LATENCY = REGISTRY.histogram(
+    "request_validation_seconds",
+    "Time spent parsing, validating and serializing the bodies of a route",
+    ("route", "stage"),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# models whose `__dict__` is their JSON, see `encode`
+_plain: dict[type[BaseModel], bool] = {}
+
+
+def _is_plain(model: type[BaseModel]) -> bool:
+    plain = _plain.get(model)
+    if plain is None:
+        plain = _plain[model] = (
+            not model.__config__.json_encoders
+            and not model.__exclude_fields__
+            and not model.__include_fields__
+            and all(field.alias == field.name for field in model.__fields__.values())
+        )
+    return plain
+
+
+def encode(obj: Any) -> Any:
+    """
+    `encode` the `default` of `dumps` for pydantic models and the types pydantic knows
+
+    a model is serialized from its `__dict__`, nested models included, rather than from a `.dict()` copy.
+    Models with aliases, `json_encoders` or excluded fields go through `.dict(by_alias=True)`.
+    """
+    if isinstance(obj, BaseModel):
+        if obj.__custom_root_type__:
+            return obj.__root__
+        if _is_plain(type(obj)):
+            return obj.__dict__
+        return obj.dict(by_alias=True)
+    return pydantic_encoder(obj)
+
+
+def serialize(value: Any) -> bytes:
+    return dumps(value, default=encode)
+
+
+class Schema:
+    """
+    `Schema` validate data against a model, or any type pydantic knows such as `list[Item]`
+
+    the model of a type is created once, when the route is declared
+    """
+
+    def __init__(self, annotation: Any) -> None:
+        self.root = not (isinstance(annotation, type) and issubclass(annotation, BaseModel))
+        self.model: type[BaseModel] = (
+            create_model(f"{getattr(annotation, '__name__', 'Root')}Schema", __root__=(annotation, ...))
+            if self.root
+            else annotation
+        )
+        # query arguments may repeat for the fields holding several values
+        self.repeated = {field.alias for field in self.model.__fields__.values() if field.shape != SHAPE_SINGLETON}
+
+    def validate(self, data: Any) -> Any:
+        value = self.model.parse_obj(data)
+        return value.__root__ if self.root else value
+
+    def args(self, request: Request) -> dict[str, Any]:
+        args = request.args
+        return {name: args.getlist(name) if name in self.repeated else args.get(name) for name in args}
+
+
+def _validate(schema: Schema, data: Any, what: str) -> Any:
+    try:
+        return schema.validate(data)
+    except ValidationError as e:
+        raise ValidationFailed(f"Invalid {what}", e.errors())
+
+
+def validate(
+    body: Any = None,
+    *,
+    query: Any = None,
+    response: Any = None,
+    status: int = 200,
+) -> Callable[[Handler], Handler]:
+    """
+    `validate` parse and validate the JSON body and the query arguments of a handler, and serialize what it returns
+
+    the validated body and query are passed to the handler as the `body` and `query` keyword arguments,
+    invalid ones are answered with a 422 listing the errors. A handler may return a model, a list of models
+    or anything `orjson` serializes, it is validated against `response` if given, and sent with `status`.
+    The time spent in each stage is recorded in the `request_validation_seconds` histogram per route.
+
+    ```python
+    @bp.post("/items")
+    @validate(ItemIn, response=ItemOut, status=201)
+    async def create_item(request: Request, body: ItemIn) -> ItemOut:
+        ...
+    ```
+    """
+    body_schema = Schema(body) if body is not None else None
+    query_schema = Schema(query) if query is not None else None
+    response_schema = Schema(response) if response is not None else None
+
+    def decorator(handler: Handler) -> Handler:
+        @wraps(handler)
+        async def wrapper(request: Request, *args: Any, **kwargs: Any) -> HTTPResponse:
+            route = request.route.name if request.route else handler.__qualname__
+            if query_schema is not None:
+                start = perf_counter()
+                kwargs["query"] = _validate(query_schema, query_schema.args(request), "query")
+                VALIDATION_LATENCY.observe(route, "query", value=perf_counter() - start)
+            if body_schema is not None:
+                start = perf_counter()
+                try:
+                    data = loads(request.body)
+                except ValueError:
+                    raise InvalidUsage("Invalid JSON body")
+                parsed = perf_counter()
+                kwargs["body"] = _validate(body_schema, data, "body")
+                VALIDATION_LATENCY.observe(route, "parse", value=parsed - start)
+                VALIDATION_LATENCY.observe(route, "validate", value=perf_counter() - parsed)
+
+            result = await handler(request, *args, **kwargs)
+            if isinstance(result, BaseHTTPResponse):
+                return result
+
+            start = perf_counter()
+            # a subclass of the model may hold fields the response must not expose
+            if response_schema is not None and type(result) is not response_schema.model:
+                # an invalid response is a bug of the handler, answered with a 500
+                result = response_schema.validate(result)
+            response = raw(serialize(result), status=status, content_type="application/json")
+            VALIDATION_LATENCY.observe(route, "serialize", value=perf_counter() - start)
+            return response
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,93 @@
+import asyncio
+from time import perf_counter
+from typing import Any, Awaitable
+
+from sanic import Sanic
+from sanic.log import logger
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+except ImportError:
+    pass
+try:
+    from redis.asyncio import ConnectionPool
+except ImportError:
+    pass
+
+
+async def warm_engine(engine: "AsyncEngine", size: int) -> int:
+    """
+    `warm_engine` open `size` connections of the pool of `engine` at once, they stay in the pool once closed
+    """
+    size = min(size, engine.pool.size())
+    results = await asyncio.gather(*(engine.connect().start() for _ in range(size)), return_exceptions=True)
+    connections: list[AsyncConnection] = [result for result in results if not isinstance(result, BaseException)]
+    await asyncio.gather(*(connection.close() for connection in connections))
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return len(connections)
+
+
+async def warm_redis(pool: "ConnectionPool", size: int) -> int:
+    """
+    `warm_redis` open `size` connections of `pool` at once, they stay in the pool once released
+    """
+    size = min(size, pool.max_connections)
+    results = await asyncio.gather(*(pool.get_connection("PING") for _ in range(size)), return_exceptions=True)
+    connections = [result for result in results if not isinstance(result, BaseException)]
+    await asyncio.gather(*(pool.release(connection) for connection in connections))
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return len(connections)
+
+
+async def warm_rabbitmq(publisher: Any, channels: int) -> int:
+    """
+    `warm_rabbitmq` open the `channels` confirm channels of the publisher
+    """
+    await asyncio.gather(*(publisher.channel(slot) for slot in range(channels)))
+    return channels
+
+
+async def _timed(name: str, warm: Awaitable[Any]) -> None:
+    start = perf_counter()
+    try:
+        opened = await warm
+    except Exception as e:
+        # the readiness probes report the dependency as unavailable
+        logger.warning(f"warmup of {name} failed: {e!r}")
+    else:
+        logger.info(f"warmup of {name}: {opened} connections in {(perf_counter() - start) * 1000:.1f}ms")
+
+
+async def warmup(app: Sanic) -> None:
+    """
+    `warmup` open the first connections of the database, redis and rabbitmq pools concurrently,
+    so that the first requests do not pay for the connection setup
+
+    run as `app.ctx.warmup` when the worker starts, the worker is not ready until it is done, see `services.health`
+    """
+    conf = app.ctx.settings
+    ctx: Any = app.ctx
+    warms: dict[str, Awaitable[Any]] = {}
+    if getattr(ctx, "db_engine", None) and conf.DATABASE_POOL_WARMUP:
+        for index, engine in enumerate([ctx.db_engine, *ctx.db_readers]):
+            name = "database" if index == 0 else f"database_reader_{index - 1}"
+            warms[name] = warm_engine(engine, conf.DATABASE_POOL_WARMUP)
+    if getattr(ctx, "redis", None) and conf.REDIS_POOL_WARMUP:
+        warms["redis"] = warm_redis(ctx.redis, conf.REDIS_POOL_WARMUP)
+    if getattr(ctx, "rabbitmq_publisher", None):
+        warms["rabbitmq"] = warm_rabbitmq(ctx.rabbitmq_publisher, conf.RABBITMQ_PUBLISHER_CHANNELS)
+    if not warms:
+        return
+    start = perf_counter()
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(_timed(name, warm) for name, warm in warms.items())), conf.WARMUP_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"warmup timed out after {conf.WARMUP_TIMEOUT}s")
+    else:
+        logger.info(f"warmup done in {(perf_counter() - start) * 1000:.1f}ms")